@@ -2,7 +2,6 @@ import asyncio
 import json
 import logging
 import os
-import random
 import re
 import time
 from typing import Optional, Union
@@ -17,10 +16,15 @@ from open_webui.config import (
     ENABLE_OLLAMA_API,
     MODEL_FILTER_LIST,
     OLLAMA_BASE_URLS,
+    OLLAMA_ROUTING_STRATEGY,
     UPLOAD_DIR,
     AppConfig,
 )
-from open_webui.env import AIOHTTP_CLIENT_TIMEOUT
+from open_webui.env import (
+    AIOHTTP_CLIENT_TIMEOUT,
+    OLLAMA_EMBEDDING_BATCH_SIZE,
+    OLLAMA_EMBEDDING_CONCURRENCY,
+)
 
 
 from open_webui.constants import ERROR_MESSAGES
@@ -29,9 +33,10 @@ from fastapi import Depends, FastAPI, File, HTTPException, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, ConfigDict
-from starlette.background import BackgroundTask
 
 
+from open_webui.utils.cache import MODELS_CACHE
+from open_webui.utils.middleware import LoadModelsMiddleware
 from open_webui.utils.misc import (
     calculate_sha256,
 )
@@ -40,6 +45,9 @@ from open_webui.utils.payload import (
     apply_model_params_to_body_openai,
     apply_model_system_prompt_to_body,
 )
+from open_webui.utils.circuit_breaker import UPSTREAM_BREAKERS
+from open_webui.utils.routing import RequestTracker, UpstreamRouter
+from open_webui.utils.session_pool import CLIENT_SESSION_POOL
 from open_webui.utils.utils import get_admin_user, get_verified_user
 
 log = logging.getLogger(__name__)
@@ -61,23 +69,19 @@ app.state.config.MODEL_FILTER_LIST = MODEL_FILTER_LIST
 
 app.state.config.ENABLE_OLLAMA_API = ENABLE_OLLAMA_API
 app.state.config.OLLAMA_BASE_URLS = OLLAMA_BASE_URLS
+app.state.config.OLLAMA_ROUTING_STRATEGY = OLLAMA_ROUTING_STRATEGY
 app.state.MODELS = {}
 
-
-# TODO: Implement a more intelligent load balancing mechanism for distributing requests among multiple backend instances.
-# Current implementation uses a simple round-robin approach (random.choice). Consider incorporating algorithms like weighted round-robin,
-# least connections, or least response time for better resource utilization and performance optimization.
+# Spreads requests for a model across the URLs serving it, based on the load
+# and latency observed by this worker.
+app.state.ROUTER = UpstreamRouter(breakers=UPSTREAM_BREAKERS)
 
 
-@app.middleware("http")
-async def check_url(request: Request, call_next):
-    if len(app.state.MODELS) == 0:
-        await get_all_models()
-    else:
-        pass
-
-    response = await call_next(request)
-    return response
+app.add_middleware(
+    LoadModelsMiddleware,
+    get_models=lambda: app.state.MODELS,
+    load_models=lambda: get_all_models(),
+)
 
 
 @app.head("/")
@@ -88,17 +92,45 @@ async def get_status():
 
 @app.get("/config")
 async def get_config(user=Depends(get_admin_user)):
-    return {"ENABLE_OLLAMA_API": app.state.config.ENABLE_OLLAMA_API}
+    return {
+        "ENABLE_OLLAMA_API": app.state.config.ENABLE_OLLAMA_API,
+        "OLLAMA_ROUTING_STRATEGY": app.state.config.OLLAMA_ROUTING_STRATEGY,
+    }
 
 
 class OllamaConfigForm(BaseModel):
     enable_ollama_api: Optional[bool] = None
+    routing_strategy: Optional[str] = None
 
 
 @app.post("/config/update")
 async def update_config(form_data: OllamaConfigForm, user=Depends(get_admin_user)):
-    app.state.config.ENABLE_OLLAMA_API = form_data.enable_ollama_api
-    return {"ENABLE_OLLAMA_API": app.state.config.ENABLE_OLLAMA_API}
+    if form_data.routing_strategy is not None:
+        if form_data.routing_strategy not in app.state.ROUTER.strategies:
+            raise HTTPException(
+                status_code=400,
+                detail=ERROR_MESSAGES.INVALID_ROUTING_STRATEGY(
+                    form_data.routing_strategy
+                ),
+            )
+        app.state.config.OLLAMA_ROUTING_STRATEGY = form_data.routing_strategy
+
+    if form_data.enable_ollama_api is not None:
+        app.state.config.ENABLE_OLLAMA_API = form_data.enable_ollama_api
+    MODELS_CACHE.invalidate()
+    return {
+        "ENABLE_OLLAMA_API": app.state.config.ENABLE_OLLAMA_API,
+        "OLLAMA_ROUTING_STRATEGY": app.state.config.OLLAMA_ROUTING_STRATEGY,
+    }
+
+
+@app.get("/routing")
+async def get_routing_table(user=Depends(get_admin_user)):
+    return {
+        "strategy": app.state.config.OLLAMA_ROUTING_STRATEGY,
+        "strategies": list(app.state.ROUTER.strategies.keys()),
+        "urls": app.state.ROUTER.get_table(app.state.config.OLLAMA_BASE_URLS),
+    }
 
 
 @app.get("/urls")
@@ -113,6 +145,7 @@ class UrlUpdateForm(BaseModel):
 @app.post("/urls/update")
 async def update_ollama_api_url(form_data: UrlUpdateForm, user=Depends(get_admin_user)):
     app.state.config.OLLAMA_BASE_URLS = form_data.urls
+    MODELS_CACHE.invalidate()
 
     log.info(f"app.state.config.OLLAMA_BASE_URLS: {app.state.config.OLLAMA_BASE_URLS}")
     return {"OLLAMA_BASE_URLS": app.state.config.OLLAMA_BASE_URLS}
@@ -121,58 +154,104 @@ async def update_ollama_api_url(form_data: UrlUpdateForm, user=Depends(get_admin
 async def fetch_url(url):
     timeout = aiohttp.ClientTimeout(total=3)
     try:
-        async with aiohttp.ClientSession(timeout=timeout, trust_env=True) as session:
-            async with session.get(url) as response:
-                return await response.json()
+        session = CLIENT_SESSION_POOL.get(url)
+        async with session.get(url, timeout=timeout) as response:
+            return await response.json()
     except Exception as e:
         # Handle connection error here
         log.error(f"Connection error: {e}")
         return None
 
 
-async def cleanup_response(
-    response: Optional[aiohttp.ClientResponse],
-    session: Optional[aiohttp.ClientSession],
-):
+async def fetch_base_url(url: str, path: str):
+    # Skip upstreams whose circuit breaker is open rather than waiting for
+    # them to time out, and report the outcome otherwise.
+    if not UPSTREAM_BREAKERS.allow(url):
+        return None
+
+    response = await fetch_url(f"{url}{path}")
+    if response is None:
+        UPSTREAM_BREAKERS.record_failure(url, "Connection error")
+    else:
+        UPSTREAM_BREAKERS.record_success(url)
+    return response
+
+
+async def probe_upstreams():
+    if app.state.config.ENABLE_OLLAMA_API:
+        await asyncio.gather(
+            *[
+                UPSTREAM_BREAKERS.probe(url, f"{url}/api/version")
+                for url in set(app.state.config.OLLAMA_BASE_URLS)
+            ]
+        )
+
+
+async def cleanup_response(response: Optional[aiohttp.ClientResponse]):
+    # Release rather than close so the connection goes back to the pool
     if response:
-        response.close()
-    if session:
-        await session.close()
+        response.release()
+
+
+async def stream_content(
+    r: aiohttp.ClientResponse, tracker: Optional[RequestTracker] = None
+):
+    # The request stays in flight until the stream is over. A background task
+    # would not run when the stream fails midway or the client disconnects.
+    error = False
+    try:
+        async for chunk in r.content:
+            yield chunk
+    except Exception:
+        error = True
+        raise
+    finally:
+        if tracker:
+            tracker.finish(error=error)
+        r.release()
 
 
 async def post_streaming_url(
-    url: str, payload: Union[str, bytes], stream: bool = True, content_type=None
+    url: str,
+    payload: Union[str, bytes],
+    stream: bool = True,
+    content_type=None,
+    tracker: Optional[RequestTracker] = None,
 ):
     r = None
     try:
-        session = aiohttp.ClientSession(
-            trust_env=True, timeout=aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT)
-        )
+        session = CLIENT_SESSION_POOL.get(url)
         r = await session.post(
             url,
             data=payload,
             headers={"Content-Type": "application/json"},
+            timeout=aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT),
         )
+        if tracker:
+            tracker.first_byte()
         r.raise_for_status()
 
         if stream:
             headers = dict(r.headers)
             if content_type:
                 headers["Content-Type"] = content_type
+
             return StreamingResponse(
-                r.content,
+                stream_content(r, tracker),
                 status_code=r.status,
                 headers=headers,
-                background=BackgroundTask(
-                    cleanup_response, response=r, session=session
-                ),
             )
         else:
             res = await r.json()
-            await cleanup_response(r, session)
+            await cleanup_response(r)
+            if tracker:
+                tracker.finish()
             return res
 
     except Exception as e:
+        if tracker:
+            tracker.finish(error=r is None or r.status >= 500)
+
         error_detail = "Open WebUI: Server Connection Error"
         if r is not None:
             try:
@@ -181,6 +260,7 @@ async def post_streaming_url(
                     error_detail = f"Ollama: {res['error']}"
             except Exception:
                 error_detail = f"Ollama: {e}"
+            await cleanup_response(r)
 
         raise HTTPException(
             status_code=r.status if r else 500,
@@ -209,7 +289,8 @@ async def get_all_models():
 
     if app.state.config.ENABLE_OLLAMA_API:
         tasks = [
-            fetch_url(f"{url}/api/tags") for url in app.state.config.OLLAMA_BASE_URLS
+            fetch_base_url(url, "/api/tags")
+            for url in app.state.config.OLLAMA_BASE_URLS
         ]
         responses = await asyncio.gather(*tasks)
 
@@ -229,6 +310,31 @@ async def get_all_models():
     return models
 
 
+def pick_url_idx(model: str) -> int:
+    return app.state.ROUTER.pick(
+        app.state.MODELS[model]["urls"],
+        app.state.config.OLLAMA_BASE_URLS,
+        model,
+        strategy=app.state.config.OLLAMA_ROUTING_STRATEGY,
+    )
+
+
+def get_model_name(name: str) -> str:
+    return name if ":" in name else f"{name}:latest"
+
+
+def get_model_url_idx(name: str) -> int:
+    model = get_model_name(name)
+
+    if model in app.state.MODELS:
+        return pick_url_idx(model)
+    else:
+        raise HTTPException(
+            status_code=400,
+            detail=ERROR_MESSAGES.MODEL_NOT_FOUND(name),
+        )
+
+
 @app.get("/api/tags")
 @app.get("/api/tags/{url_idx}")
 async def get_ollama_tags(
@@ -281,7 +387,7 @@ async def get_ollama_versions(url_idx: Optional[int] = None):
         if url_idx is None:
             # returns lowest version
             tasks = [
-                fetch_url(f"{url}/api/version")
+                fetch_base_url(url, "/api/version")
                 for url in app.state.config.OLLAMA_BASE_URLS
             ]
             responses = await asyncio.gather(*tasks)
@@ -344,7 +450,10 @@ async def pull_model(
     # Admin should be able to pull models from any source
     payload = {**form_data.model_dump(exclude_none=True), "insecure": True}
 
-    return await post_streaming_url(f"{url}/api/pull", json.dumps(payload))
+    response = await post_streaming_url(f"{url}/api/pull", json.dumps(payload))
+    # The pulled model only shows up in the model list once the stream is done
+    response.background.add_task(MODELS_CACHE.invalidate)
+    return response
 
 
 class PushModelForm(BaseModel):
@@ -393,9 +502,11 @@ async def create_model(
     url = app.state.config.OLLAMA_BASE_URLS[url_idx]
     log.info(f"url: {url}")
 
-    return await post_streaming_url(
+    response = await post_streaming_url(
         f"{url}/api/create", form_data.model_dump_json(exclude_none=True).encode()
     )
+    response.background.add_task(MODELS_CACHE.invalidate)
+    return response
 
 
 class CopyModelForm(BaseModel):
@@ -433,6 +544,7 @@ async def copy_model(
 
         log.debug(f"r.text: {r.text}")
 
+        MODELS_CACHE.invalidate()
         return True
     except Exception as e:
         log.exception(e)
@@ -481,6 +593,7 @@ async def delete_model(
 
         log.debug(f"r.text: {r.text}")
 
+        MODELS_CACHE.invalidate()
         return True
     except Exception as e:
         log.exception(e)
@@ -507,7 +620,7 @@ async def show_model_info(form_data: ModelNameForm, user=Depends(get_verified_us
             detail=ERROR_MESSAGES.MODEL_NOT_FOUND(form_data.name),
         )
 
-    url_idx = random.choice(app.state.MODELS[form_data.name]["urls"])
+    url_idx = pick_url_idx(form_data.name)
     url = app.state.config.OLLAMA_BASE_URLS[url_idx]
     log.info(f"url: {url}")
 
@@ -560,7 +673,7 @@ async def generate_embeddings(
     url_idx: Optional[int] = None,
     user=Depends(get_verified_user),
 ):
-    return generate_ollama_batch_embeddings(form_data, url_idx)
+    return await generate_ollama_batch_embeddings(form_data, url_idx)
 
 
 @app.post("/api/embeddings")
@@ -570,118 +683,126 @@ async def generate_embeddings(
     url_idx: Optional[int] = None,
     user=Depends(get_verified_user),
 ):
-    return generate_ollama_embeddings(form_data=form_data, url_idx=url_idx)
+    return await generate_ollama_embeddings(form_data=form_data, url_idx=url_idx)
 
 
-def generate_ollama_embeddings(
-    form_data: GenerateEmbeddingsForm,
-    url_idx: Optional[int] = None,
-):
-    log.info(f"generate_ollama_embeddings {form_data}")
+# Bounds the embedding requests in flight across all callers, so a large
+# document upload cannot monopolise the Ollama servers.
+embedding_semaphore = asyncio.Semaphore(OLLAMA_EMBEDDING_CONCURRENCY)
 
-    if url_idx is None:
-        model = form_data.model
-
-        if ":" not in model:
-            model = f"{model}:latest"
-
-        if model in app.state.MODELS:
-            url_idx = random.choice(app.state.MODELS[model]["urls"])
-        else:
-            raise HTTPException(
-                status_code=400,
-                detail=ERROR_MESSAGES.MODEL_NOT_FOUND(form_data.model),
-            )
 
+async def send_embedding_request(url_idx: int, path: str, payload: dict) -> dict:
     url = app.state.config.OLLAMA_BASE_URLS[url_idx]
     log.info(f"url: {url}")
 
-    r = requests.request(
-        method="POST",
-        url=f"{url}/api/embeddings",
-        headers={"Content-Type": "application/json"},
-        data=form_data.model_dump_json(exclude_none=True).encode(),
-    )
+    r = None
+    model = payload.get("model")
+    tracker = app.state.ROUTER.track(url, get_model_name(model) if model else None)
     try:
-        r.raise_for_status()
-
-        data = r.json()
-
-        log.info(f"generate_ollama_embeddings {data}")
-
-        if "embedding" in data:
-            return data
-        else:
-            raise Exception("Something went wrong :/")
+        async with embedding_semaphore:
+            session = CLIENT_SESSION_POOL.get(url)
+            async with session.post(
+                f"{url}{path}",
+                json=payload,
+                timeout=aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT),
+            ) as r:
+                data = await r.json(content_type=None)
+                if isinstance(data, dict) and "error" in data:
+                    raise HTTPException(
+                        status_code=r.status if r.status >= 400 else 500,
+                        detail=f"Ollama: {data['error']}",
+                    )
+                r.raise_for_status()
+                tracker.finish()
+                return data
+    except HTTPException as e:
+        tracker.finish(error=e.status_code >= 500)
+        raise
     except Exception as e:
+        tracker.finish(error=r is None or r.status >= 500)
         log.exception(e)
         error_detail = "Open WebUI: Server Connection Error"
         if r is not None:
-            try:
-                res = r.json()
-                if "error" in res:
-                    error_detail = f"Ollama: {res['error']}"
-            except Exception:
-                error_detail = f"Ollama: {e}"
+            error_detail = f"Ollama: {e}"
 
         raise HTTPException(
-            status_code=r.status_code if r else 500,
+            status_code=r.status if r is not None else 500,
             detail=error_detail,
         )
 
 
-def generate_ollama_batch_embeddings(
-    form_data: GenerateEmbedForm,
+async def generate_ollama_embeddings(
+    form_data: GenerateEmbeddingsForm,
     url_idx: Optional[int] = None,
 ):
-    log.info(f"generate_ollama_batch_embeddings {form_data}")
+    log.info(f"generate_ollama_embeddings {form_data}")
 
     if url_idx is None:
-        model = form_data.model
+        url_idx = get_model_url_idx(form_data.model)
 
-        if ":" not in model:
-            model = f"{model}:latest"
+    data = await send_embedding_request(
+        url_idx, "/api/embeddings", form_data.model_dump(exclude_none=True)
+    )
+    log.info(f"generate_ollama_embeddings {data}")
 
-        if model in app.state.MODELS:
-            url_idx = random.choice(app.state.MODELS[model]["urls"])
-        else:
-            raise HTTPException(
-                status_code=400,
-                detail=ERROR_MESSAGES.MODEL_NOT_FOUND(form_data.model),
-            )
+    if "embedding" in data:
+        return data
+    else:
+        raise HTTPException(
+            status_code=500,
+            detail="Open WebUI: Server Connection Error",
+        )
 
-    url = app.state.config.OLLAMA_BASE_URLS[url_idx]
-    log.info(f"url: {url}")
 
-    r = requests.request(
-        method="POST",
-        url=f"{url}/api/embed",
-        headers={"Content-Type": "application/json"},
-        data=form_data.model_dump_json(exclude_none=True).encode(),
-    )
-    try:
-        r.raise_for_status()
+async def generate_ollama_batch_embeddings(
+    form_data: GenerateEmbedForm,
+    url_idx: Optional[int] = None,
+    batch_size: Optional[int] = None,
+):
+    log.info(f"generate_ollama_batch_embeddings {form_data}")
 
-        data = r.json()
+    payload = form_data.model_dump(exclude_none=True)
+    batch_size = batch_size or OLLAMA_EMBEDDING_BATCH_SIZE
 
-        log.info(f"generate_ollama_batch_embeddings {data}")
+    # Split large inputs into batches which are embedded concurrently, each
+    # one routed to any of the servers hosting the model.
+    if isinstance(form_data.input, list) and len(form_data.input) > batch_size:
+        batches = [
+            form_data.input[i : i + batch_size]
+            for i in range(0, len(form_data.input), batch_size)
+        ]
+    else:
+        batches = [form_data.input]
 
-        if "embeddings" in data:
-            return data
-        else:
-            raise Exception("Something went wrong :/")
-    except Exception as e:
-        log.exception(e)
-        error_detail = "Open WebUI: Server Connection Error"
-        if r is not None:
-            try:
-                res = r.json()
-                if "error" in res:
-                    error_detail = f"Ollama: {res['error']}"
-            except Exception:
-                error_detail = f"Ollama: {e}"
+    async def embed(batch: Union[list[str], str]) -> dict:
+        idx = url_idx if url_idx is not None else get_model_url_idx(form_data.model)
+        try:
+            data = await send_embedding_request(
+                idx, "/api/embed", {**payload, "input": batch}
+            )
+        except HTTPException as e:
+            raise Exception(e.detail)
+
+        if "embeddings" not in data:
+            raise Exception("Open WebUI: Server Connection Error")
+        return data
 
-        raise Exception(error_detail)
+    results = await asyncio.gather(*[embed(batch) for batch in batches])
+    log.info(f"generate_ollama_batch_embeddings {len(results)} batch(es)")
+
+    if len(results) == 1:
+        return results[0]
+
+    data = {
+        **results[0],
+        "embeddings": [
+            embedding for result in results for embedding in result["embeddings"]
+        ],
+    }
+    for key in ["total_duration", "load_duration", "prompt_eval_count"]:
+        if all(key in result for result in results):
+            data[key] = sum(result[key] for result in results)
+    return data
 
 
 class GenerateCompletionForm(BaseModel):
@@ -706,24 +827,15 @@ async def generate_completion(
     user=Depends(get_verified_user),
 ):
     if url_idx is None:
-        model = form_data.model
-
-        if ":" not in model:
-            model = f"{model}:latest"
-
-        if model in app.state.MODELS:
-            url_idx = random.choice(app.state.MODELS[model]["urls"])
-        else:
-            raise HTTPException(
-                status_code=400,
-                detail=ERROR_MESSAGES.MODEL_NOT_FOUND(form_data.model),
-            )
+        url_idx = get_model_url_idx(form_data.model)
 
     url = app.state.config.OLLAMA_BASE_URLS[url_idx]
     log.info(f"url: {url}")
 
     return await post_streaming_url(
-        f"{url}/api/generate", form_data.model_dump_json(exclude_none=True).encode()
+        f"{url}/api/generate",
+        form_data.model_dump_json(exclude_none=True).encode(),
+        tracker=app.state.ROUTER.track(url, get_model_name(form_data.model)),
     )
 
 
@@ -750,7 +862,7 @@ def get_ollama_url(url_idx: Optional[int], model: str):
                 status_code=400,
                 detail=ERROR_MESSAGES.MODEL_NOT_FOUND(model),
             )
-        url_idx = random.choice(app.state.MODELS[model]["urls"])
+        url_idx = pick_url_idx(model)
     url = app.state.config.OLLAMA_BASE_URLS[url_idx]
     return url
 
@@ -806,6 +918,7 @@ async def generate_chat_completion(
         json.dumps(payload),
         stream=form_data.stream,
         content_type="application/x-ndjson",
+        tracker=app.state.ROUTER.track(url, payload["model"]),
     )
 
 
@@ -872,6 +985,7 @@ async def generate_openai_chat_completion(
         f"{url}/v1/chat/completions",
         json.dumps(payload),
         stream=payload.get("stream", False),
+        tracker=app.state.ROUTER.track(url, payload["model"]),
     )
 
 
@@ -36,6 +36,10 @@ from open_webui.utils.payload import (
     apply_model_system_prompt_to_body,
 )
 
+from open_webui.utils.cache import MODELS_CACHE
+from open_webui.utils.middleware import LoadModelsMiddleware
+from open_webui.utils.circuit_breaker import UPSTREAM_BREAKERS
+from open_webui.utils.session_pool import CLIENT_SESSION_POOL
 from open_webui.utils.utils import get_admin_user, get_verified_user
 
 log = logging.getLogger(__name__)
@@ -62,13 +66,11 @@ app.state.config.OPENAI_API_KEYS = OPENAI_API_KEYS
 app.state.MODELS = {}
 
 
-@app.middleware("http")
-async def check_url(request: Request, call_next):
-    if len(app.state.MODELS) == 0:
-        await get_all_models()
-
-    response = await call_next(request)
-    return response
+app.add_middleware(
+    LoadModelsMiddleware,
+    get_models=lambda: app.state.MODELS,
+    load_models=lambda: get_all_models(),
+)
 
 
 @app.get("/config")
@@ -83,6 +85,7 @@ class OpenAIConfigForm(BaseModel):
 @app.post("/config/update")
 async def update_config(form_data: OpenAIConfigForm, user=Depends(get_admin_user)):
     app.state.config.ENABLE_OPENAI_API = form_data.enable_openai_api
+    MODELS_CACHE.invalidate()
     return {"ENABLE_OPENAI_API": app.state.config.ENABLE_OPENAI_API}
 
 
@@ -103,6 +106,7 @@ async def get_openai_urls(user=Depends(get_admin_user)):
 async def update_openai_urls(form_data: UrlsUpdateForm, user=Depends(get_admin_user)):
     await get_all_models()
     app.state.config.OPENAI_API_BASE_URLS = form_data.urls
+    MODELS_CACHE.invalidate()
     return {"OPENAI_API_BASE_URLS": app.state.config.OPENAI_API_BASE_URLS}
 
 
@@ -114,6 +118,7 @@ async def get_openai_keys(user=Depends(get_admin_user)):
 @app.post("/keys/update")
 async def update_openai_key(form_data: KeysUpdateForm, user=Depends(get_admin_user)):
     app.state.config.OPENAI_API_KEYS = form_data.keys
+    MODELS_CACHE.invalidate()
     return {"OPENAI_API_KEYS": app.state.config.OPENAI_API_KEYS}
 
 
@@ -185,23 +190,51 @@ async def fetch_url(url, key):
     timeout = aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT_OPENAI_MODEL_LIST)
     try:
         headers = {"Authorization": f"Bearer {key}"}
-        async with aiohttp.ClientSession(timeout=timeout, trust_env=True) as session:
-            async with session.get(url, headers=headers) as response:
-                return await response.json()
+        session = CLIENT_SESSION_POOL.get(url)
+        async with session.get(url, headers=headers, timeout=timeout) as response:
+            return await response.json()
     except Exception as e:
         # Handle connection error here
         log.error(f"Connection error: {e}")
         return None
 
 
-async def cleanup_response(
-    response: Optional[aiohttp.ClientResponse],
-    session: Optional[aiohttp.ClientSession],
-):
+async def fetch_base_url(url: str, path: str, key: str):
+    # Skip upstreams whose circuit breaker is open rather than waiting for
+    # them to time out, and report the outcome otherwise.
+    if not UPSTREAM_BREAKERS.allow(url):
+        return None
+
+    response = await fetch_url(f"{url}{path}", key)
+    if response is None:
+        UPSTREAM_BREAKERS.record_failure(url, "Connection error")
+    else:
+        UPSTREAM_BREAKERS.record_success(url)
+    return response
+
+
+async def probe_upstreams():
+    if is_openai_api_disabled():
+        return
+
+    await asyncio.gather(
+        *[
+            UPSTREAM_BREAKERS.probe(
+                url,
+                f"{url}/models",
+                headers={"Authorization": f"Bearer {key}"},
+            )
+            for url, key in zip(
+                app.state.config.OPENAI_API_BASE_URLS, app.state.config.OPENAI_API_KEYS
+            )
+        ]
+    )
+
+
+async def cleanup_response(response: Optional[aiohttp.ClientResponse]):
+    # Release rather than close so the connection goes back to the pool
     if response:
-        response.close()
-    if session:
-        await session.close()
+        response.release()
 
 
 def merge_models_lists(model_lists):
@@ -261,7 +294,7 @@ async def get_all_models_raw() -> list:
             app.state.config.OPENAI_API_KEYS += [""] * (num_urls - num_keys)
 
     tasks = [
-        fetch_url(f"{url}/models", app.state.config.OPENAI_API_KEYS[idx])
+        fetch_base_url(url, "/models", app.state.config.OPENAI_API_KEYS[idx])
         for idx, url in enumerate(app.state.config.OPENAI_API_BASE_URLS)
     ]
 
@@ -438,22 +471,31 @@ async def generate_chat_completion(
         headers["HTTP-Referer"] = "https://openwebui.com/"
         headers["X-Title"] = "Open WebUI"
 
+    if not UPSTREAM_BREAKERS.allow(url):
+        raise HTTPException(
+            status_code=503,
+            detail=ERROR_MESSAGES.UPSTREAM_UNAVAILABLE,
+        )
+
     r = None
-    session = None
     streaming = False
     response = None
 
     try:
-        session = aiohttp.ClientSession(
-            trust_env=True, timeout=aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT)
-        )
+        session = CLIENT_SESSION_POOL.get(url)
         r = await session.request(
             method="POST",
             url=f"{url}/chat/completions",
             data=payload,
             headers=headers,
+            timeout=aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT),
         )
 
+        if r.status >= 500:
+            UPSTREAM_BREAKERS.record_failure(url, f"HTTP {r.status}")
+        else:
+            UPSTREAM_BREAKERS.record_success(url)
+
         # Check if response is SSE
         if "text/event-stream" in r.headers.get("Content-Type", ""):
             streaming = True
@@ -461,9 +503,7 @@ async def generate_chat_completion(
                 r.content,
                 status_code=r.status,
                 headers=dict(r.headers),
-                background=BackgroundTask(
-                    cleanup_response, response=r, session=session
-                ),
+                background=BackgroundTask(cleanup_response, response=r),
             )
         else:
             try:
@@ -476,6 +516,9 @@ async def generate_chat_completion(
             return response
     except Exception as e:
         log.exception(e)
+        if r is None:
+            UPSTREAM_BREAKERS.record_failure(url, str(e) or type(e).__name__)
+
         error_detail = "Open WebUI: Server Connection Error"
         if isinstance(response, dict):
             if "error" in response:
@@ -485,10 +528,8 @@ async def generate_chat_completion(
 
         raise HTTPException(status_code=r.status if r else 500, detail=error_detail)
     finally:
-        if not streaming and session:
-            if r:
-                r.close()
-            await session.close()
+        if not streaming:
+            await cleanup_response(r)
 
 
 @app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "DELETE"])
@@ -507,16 +548,16 @@ async def proxy(path: str, request: Request, user=Depends(get_verified_user)):
     headers["Content-Type"] = "application/json"
 
     r = None
-    session = None
     streaming = False
 
     try:
-        session = aiohttp.ClientSession(trust_env=True)
+        session = CLIENT_SESSION_POOL.get(target_url)
         r = await session.request(
             method=request.method,
             url=target_url,
             data=body,
             headers=headers,
+            timeout=aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT),
         )
 
         r.raise_for_status()
@@ -528,9 +569,7 @@ async def proxy(path: str, request: Request, user=Depends(get_verified_user)):
                 r.content,
                 status_code=r.status,
                 headers=dict(r.headers),
-                background=BackgroundTask(
-                    cleanup_response, response=r, session=session
-                ),
+                background=BackgroundTask(cleanup_response, response=r),
             )
         else:
             response_data = await r.json()
@@ -548,7 +587,5 @@ async def proxy(path: str, request: Request, user=Depends(get_verified_user)):
                 error_detail = f"External: {e}"
         raise HTTPException(status_code=r.status if r else 500, detail=error_detail)
     finally:
-        if not streaming and session:
-            if r:
-                r.close()
-            await session.close()
+        if not streaming:
+            await cleanup_response(r)
@@ -0,0 +1,430 @@
+import hashlib
+import heapq
+import json
+import logging
+import math
+import os
+import pickle
+import re
+import shutil
+import threading
+import uuid
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from operator import itemgetter
+from typing import Callable, Optional
+
+try:
+    import fcntl
+except ImportError:
+    # Windows, where only the in-process lock applies
+    fcntl = None
+
+from open_webui.config import BM25_INDEX_DIR, BM25_INDEX_MAX_LOADED
+from open_webui.env import SRC_LOG_LEVELS
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+SNAPSHOT_FILE = "index.pkl"
+LOG_FILE = "log.jsonl"
+LOCK_FILE = "lock"
+
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def matches_filter(metadata: dict, filter: dict) -> bool:
+    return all(metadata.get(key) == value for key, value in filter.items())
+
+
+class BM25Index:
+    """
+    Okapi BM25 over the chunks of one collection, with an inverted index that
+    can be updated in place as chunks are added and removed.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        # Chunk id -> (text, metadata)
+        self.docs: dict[str, tuple[str, dict]] = {}
+        # Chunk id -> number of tokens
+        self.lengths: dict[str, int] = {}
+        # Term -> {chunk id: term frequency}
+        self.postings: dict[str, dict[str, int]] = {}
+        self.total_length = 0
+
+    def add(self, items: list[dict]):
+        for item in items:
+            if item["id"] in self.docs:
+                self._remove(item["id"])
+
+            frequencies = Counter(tokenize(item["text"]))
+            for term, frequency in frequencies.items():
+                self.postings.setdefault(term, {})[item["id"]] = frequency
+
+            length = sum(frequencies.values())
+            self.docs[item["id"]] = (item["text"], item.get("metadata") or {})
+            self.lengths[item["id"]] = length
+            self.total_length += length
+
+    def _remove(self, id: str):
+        text, _ = self.docs.pop(id)
+        self.total_length -= self.lengths.pop(id)
+        for term in set(tokenize(text)):
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(id, None)
+                if not postings:
+                    del self.postings[term]
+
+    def delete(self, ids: Optional[list[str]] = None, filter: Optional[dict] = None):
+        if filter:
+            ids = [
+                id
+                for id, (_, metadata) in self.docs.items()
+                if matches_filter(metadata, filter)
+            ]
+        for id in ids or []:
+            if id in self.docs:
+                self._remove(id)
+
+    def search(self, query: str, k: int) -> list[tuple[str, float]]:
+        """Returns up to `k` (chunk id, score) pairs, best first."""
+        count = len(self.docs)
+        if count == 0:
+            return []
+
+        avg_length = self.total_length / count
+        norm = self.k1 * (1 - self.b)
+        norm_per_token = self.k1 * self.b / avg_length
+        lengths = self.lengths
+
+        scores: dict[str, float] = {}
+        for term, query_frequency in Counter(tokenize(query)).items():
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            weight = query_frequency * idf * (self.k1 + 1)
+            for id, frequency in postings.items():
+                scores[id] = scores.get(id, 0.0) + weight * frequency / (
+                    frequency + norm + norm_per_token * lengths[id]
+                )
+
+        return heapq.nlargest(k, scores.items(), key=itemgetter(1))
+
+    def get_state(self) -> dict:
+        return {
+            "k1": self.k1,
+            "b": self.b,
+            "docs": self.docs,
+            "lengths": self.lengths,
+            "postings": self.postings,
+            "total_length": self.total_length,
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> "BM25Index":
+        index = cls(k1=state["k1"], b=state["b"])
+        index.docs = state["docs"]
+        index.lengths = state["lengths"]
+        index.postings = state["postings"]
+        index.total_length = state["total_length"]
+        return index
+
+
+class LoadedIndex:
+    def __init__(self):
+        self.index = BM25Index()
+        # (inode, mtime, size) of the snapshot the index was loaded from
+        self.snapshot_key: Optional[tuple] = None
+        # How far into the change log the index has been brought up to date
+        self.log_offset = 0
+        self.lock = threading.Lock()
+
+
+class BM25IndexStore:
+    """
+    Persistent BM25 indexes, one directory per collection under `path`.
+
+    Each directory holds a pickled snapshot of the index and an append-only
+    log of the changes made since, which is folded into a new snapshot once
+    it grows past half the snapshot's size. Searches keep up to `max_loaded`
+    indexes in memory and replay any changes other workers appended to the
+    log before scoring, so there is no need to re-read the collection from the
+    vector database per query.
+
+    Writes to a collection are serialized by a lock per collection, held
+    across processes through a lock file. Indexes are built and searched
+    without holding it.
+
+    An index only exists for collections created through `create()`; for other
+    collections `add()` and `delete()` are no-ops and the index is built from
+    the vector database on the first search instead.
+    """
+
+    def __init__(self, path: str, max_loaded: int = 64):
+        self.path = path
+        self.max_loaded = max_loaded
+        self._loaded: OrderedDict[str, LoadedIndex] = OrderedDict()
+        # Collection name -> [write lock, number of threads using it]
+        self._write_locks: dict[str, list] = {}
+        # Guards the two dicts above only
+        self._lock = threading.Lock()
+
+    def _dir(self, collection_name: str) -> str:
+        # Collection names come from users, so never use them as paths as is
+        return os.path.join(
+            self.path, hashlib.sha256(collection_name.encode()).hexdigest()
+        )
+
+    @contextmanager
+    def _write_lock(self, collection_name: str):
+        with self._lock:
+            entry = self._write_locks.setdefault(collection_name, [threading.Lock(), 0])
+            entry[1] += 1
+
+        try:
+            with entry[0]:
+                path = self._dir(collection_name)
+                os.makedirs(path, exist_ok=True)
+                with open(os.path.join(path, LOCK_FILE), "a") as f:
+                    if fcntl is not None:
+                        fcntl.flock(f, fcntl.LOCK_EX)
+                    yield path
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._write_locks[collection_name]
+
+    def _get_loaded(self, collection_name: str) -> LoadedIndex:
+        with self._lock:
+            loaded = self._loaded.get(collection_name)
+            if loaded is None:
+                loaded = self._loaded[collection_name] = LoadedIndex()
+                while len(self._loaded) > self.max_loaded:
+                    self._loaded.popitem(last=False)
+            else:
+                self._loaded.move_to_end(collection_name)
+            return loaded
+
+    def _sync(self, loaded: LoadedIndex, path: str) -> bool:
+        """
+        Brings `loaded` up to date with the files on disk, with `loaded.lock`
+        held. Returns False if the collection has no index.
+        """
+        try:
+            with open(os.path.join(path, SNAPSHOT_FILE), "rb") as f:
+                stat = os.fstat(f.fileno())
+                snapshot_key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+                if snapshot_key != loaded.snapshot_key:
+                    loaded.index = BM25Index.from_state(pickle.load(f))
+                    loaded.snapshot_key = snapshot_key
+                    loaded.log_offset = 0
+        except FileNotFoundError:
+            return False
+
+        try:
+            with open(os.path.join(path, LOG_FILE), "rb") as f:
+                if os.fstat(f.fileno()).st_size < loaded.log_offset:
+                    # Compacted since the snapshot was read, so start over
+                    loaded.snapshot_key = None
+                    return self._sync(loaded, path)
+
+                f.seek(loaded.log_offset)
+                data = f.read()
+        except FileNotFoundError:
+            return True
+
+        # A writer may be in the middle of appending the last line
+        end = data.rfind(b"\n") + 1
+        self._replay(loaded.index, data[:end])
+        loaded.log_offset += end
+        return True
+
+    def _replay(self, index: BM25Index, data: bytes):
+        for line in data.splitlines():
+            change = json.loads(line)
+            if "add" in change:
+                index.add(change["add"])
+            else:
+                index.delete(**change["delete"])
+
+    def _write_snapshot(self, path: str, index: BM25Index) -> tuple:
+        snapshot_path = os.path.join(path, SNAPSHOT_FILE)
+        temp_path = f"{snapshot_path}.{uuid.uuid4()}.tmp"
+        with open(temp_path, "wb") as f:
+            pickle.dump(index.get_state(), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, snapshot_path)
+        # Replaying changes already in the snapshot is harmless, so a reader
+        # catching the log before it is truncated is fine.
+        open(os.path.join(path, LOG_FILE), "wb").close()
+
+        stat = os.stat(snapshot_path)
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _has_index(self, path: str) -> bool:
+        # While an index is being built only its log exists
+        return os.path.exists(os.path.join(path, SNAPSHOT_FILE)) or os.path.exists(
+            os.path.join(path, LOG_FILE)
+        )
+
+    def _append(self, collection_name: str, change: dict):
+        if not self._has_index(self._dir(collection_name)):
+            return
+
+        line = (json.dumps(change, default=str) + "\n").encode()
+        with self._write_lock(collection_name) as path:
+            if not self._has_index(path):
+                return
+
+            log_path = os.path.join(path, LOG_FILE)
+            with open(log_path, "ab") as f:
+                f.write(line)
+
+            snapshot_path = os.path.join(path, SNAPSHOT_FILE)
+            if not os.path.exists(snapshot_path):
+                return
+
+            if os.path.getsize(log_path) > os.path.getsize(snapshot_path) // 2:
+                loaded = self._get_loaded(collection_name)
+                with loaded.lock:
+                    found = self._sync(loaded, path)
+
+                if found:
+                    # Searches only replay the log, which cannot grow while the
+                    # write lock is held, so the index stays unchanged while
+                    # it is written.
+                    snapshot_key = self._write_snapshot(path, loaded.index)
+                    with loaded.lock:
+                        loaded.snapshot_key = snapshot_key
+                        loaded.log_offset = 0
+
+    def create(self, collection_name: str, items: list[dict]):
+        """(Re)creates the index of a collection from `items`."""
+        index = BM25Index()
+        index.add(items)
+        with self._write_lock(collection_name) as path:
+            self._write_snapshot(path, index)
+
+    def add(self, collection_name: str, items: list[dict]):
+        self._append(
+            collection_name,
+            {
+                "add": [
+                    {
+                        "id": item["id"],
+                        "text": item["text"],
+                        "metadata": item.get("metadata"),
+                    }
+                    for item in items
+                ]
+            },
+        )
+
+    def delete(
+        self,
+        collection_name: str,
+        ids: Optional[list[str]] = None,
+        filter: Optional[dict] = None,
+    ):
+        self._append(collection_name, {"delete": {"ids": ids, "filter": filter}})
+
+    def delete_collection(self, collection_name: str):
+        with self._write_lock(collection_name) as path:
+            with self._lock:
+                self._loaded.pop(collection_name, None)
+            shutil.rmtree(path, ignore_errors=True)
+
+    def reset(self):
+        with self._lock:
+            self._loaded.clear()
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def _build(
+        self,
+        collection_name: str,
+        loader: Callable[[], Optional[list[dict]]],
+    ) -> bool:
+        """
+        Builds the index of a collection from the items returned by `loader`,
+        unless another thread or worker did already. Changes made to the
+        collection while it is read are logged and replayed onto the new
+        index. Returns False if the collection does not exist.
+        """
+        with self._write_lock(collection_name) as path:
+            if os.path.exists(os.path.join(path, SNAPSHOT_FILE)):
+                return True
+
+            # From here on changes to the collection are logged
+            with open(os.path.join(path, LOG_FILE), "ab") as f:
+                log_offset = f.tell()
+
+        items = loader()
+        if items is not None:
+            log.info(f"Building BM25 index for {collection_name}")
+            index = BM25Index()
+            index.add(items)
+
+        with self._write_lock(collection_name) as path:
+            if os.path.exists(os.path.join(path, SNAPSHOT_FILE)):
+                return True
+
+            log_path = os.path.join(path, LOG_FILE)
+            if items is None or not os.path.exists(log_path):
+                # The collection does not exist, or was deleted while read
+                shutil.rmtree(path, ignore_errors=True)
+                return False
+
+            with open(log_path, "rb") as f:
+                f.seek(log_offset)
+                self._replay(index, f.read())
+            self._write_snapshot(path, index)
+            return True
+
+    def search(
+        self,
+        collection_name: str,
+        query: str,
+        k: int,
+        loader: Callable[[], Optional[list[dict]]],
+    ) -> list[dict]:
+        """
+        Returns up to `k` chunks of the collection as dicts with the id, text,
+        metadata and score of each. If the collection has no index yet it is
+        built from the items returned by `loader`, or None if the collection
+        does not exist.
+        """
+        path = self._dir(collection_name)
+        loaded = self._get_loaded(collection_name)
+
+        with loaded.lock:
+            found = self._sync(loaded, path)
+
+        if not found and not self._build(collection_name, loader):
+            return []
+
+        with loaded.lock:
+            if not self._sync(loaded, path):
+                return []
+
+            return [
+                {
+                    "id": id,
+                    "text": loaded.index.docs[id][0],
+                    "metadata": {**loaded.index.docs[id][1]},
+                    "score": score,
+                }
+                for id, score in loaded.index.search(query, k)
+            ]
+
+
+BM25_INDEXES = BM25IndexStore(path=BM25_INDEX_DIR, max_loaded=BM25_INDEX_MAX_LOADED)
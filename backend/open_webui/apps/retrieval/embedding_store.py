@@ -0,0 +1,155 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable
+
+import numpy as np
+from open_webui.apps.retrieval.vector.main import as_matrix
+from open_webui.config import (
+    CHUNK_EMBEDDING_STORE_MAX_ENTRIES,
+    CHUNK_EMBEDDING_STORE_PATH,
+)
+from open_webui.env import SRC_LOG_LEVELS
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+
+# SQLite limits the number of parameters of a single statement
+BATCH_SIZE = 500
+
+
+class EmbeddingStore:
+    """
+    Content-addressed store of chunk embeddings, keyed by a hash of the
+    embedding engine, model and chunk text, so identical chunks are embedded
+    only once no matter how many files or collections they appear in.
+
+    Vectors are kept as float32 in a SQLite database shared by all workers.
+    Once it holds more than `max_entries` vectors, the least recently used
+    ones are dropped.
+    """
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self._initialized = False
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=30)
+        try:
+            if not self._initialized:
+                with self._lock:
+                    connection.execute("PRAGMA journal_mode=WAL")
+                    connection.execute(
+                        "CREATE TABLE IF NOT EXISTS embedding ("
+                        "key TEXT PRIMARY KEY, vector BLOB NOT NULL, "
+                        "used_at REAL NOT NULL)"
+                    )
+                    connection.execute(
+                        "CREATE INDEX IF NOT EXISTS embedding_used_at "
+                        "ON embedding (used_at)"
+                    )
+                    self._initialized = True
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    @staticmethod
+    def get_key(engine: str, model: str, text: str) -> str:
+        return hashlib.sha256(f"{engine}\0{model}\0{text}".encode()).hexdigest()
+
+    def get_many(self, keys: list[str]) -> dict[str, np.ndarray]:
+        vectors = {}
+        now = time.time()
+        with self._connect() as connection:
+            for i in range(0, len(keys), BATCH_SIZE):
+                batch = keys[i : i + BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows = connection.execute(
+                    f"SELECT key, vector FROM embedding WHERE key IN ({placeholders})",
+                    batch,
+                ).fetchall()
+                for key, vector in rows:
+                    vectors[key] = np.frombuffer(vector, dtype=np.float32)
+
+                if rows:
+                    connection.execute(
+                        f"UPDATE embedding SET used_at = ? WHERE key IN ({placeholders})",
+                        [now, *batch],
+                    )
+        return vectors
+
+    def set_many(self, vectors: dict[str, np.ndarray]):
+        now = time.time()
+        with self._connect() as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO embedding (key, vector, used_at) VALUES (?, ?, ?)",
+                [
+                    (key, np.asarray(vector, dtype=np.float32).tobytes(), now)
+                    for key, vector in vectors.items()
+                ],
+            )
+
+            count = connection.execute("SELECT COUNT(*) FROM embedding").fetchone()[0]
+            if count > self.max_entries:
+                connection.execute(
+                    "DELETE FROM embedding WHERE key IN "
+                    "(SELECT key FROM embedding ORDER BY used_at LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+
+    def embed(
+        self,
+        texts: list[str],
+        engine: str,
+        model: str,
+        embedding_function: Callable[[list[str]], list[list[float]] | np.ndarray],
+    ) -> np.ndarray:
+        """
+        Embeds `texts` with `embedding_function`, reusing stored vectors of
+        texts embedded before with the same engine and model. Duplicate texts
+        within `texts` are embedded once. Returns a float32 matrix with a row
+        per text.
+        """
+        if self.max_entries <= 0:
+            return as_matrix(embedding_function(texts))
+
+        keys = [self.get_key(engine, model, text) for text in texts]
+        try:
+            vectors = self.get_many(list(set(keys)))
+        except Exception as e:
+            log.error(f"Failed to read stored embeddings: {e}")
+            vectors = {}
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing[key] = text
+
+        log.info(
+            f"Embedding {len(missing)} of {len(texts)} chunks, "
+            f"{len(texts) - len(missing)} reused"
+        )
+        if missing:
+            embeddings = as_matrix(embedding_function(list(missing.values())))
+            new_vectors = dict(zip(missing.keys(), embeddings))
+            try:
+                self.set_many(new_vectors)
+            except Exception as e:
+                log.error(f"Failed to store embeddings: {e}")
+            vectors.update(new_vectors)
+
+        return as_matrix([vectors[key] for key in keys])
+
+
+EMBEDDING_STORE = EmbeddingStore(
+    path=CHUNK_EMBEDDING_STORE_PATH,
+    max_entries=CHUNK_EMBEDDING_STORE_MAX_ENTRIES,
+)
@@ -1,6 +1,10 @@
 import requests
 import logging
+import multiprocessing
+import sys
+import threading
 import ftfy
+from typing import Optional
 
 from langchain_community.document_loaders import (
     BSHTMLLoader,
@@ -113,14 +117,151 @@ class TikaLoader:
             raise Exception(f"Error calling Tika: {r.reason}")
 
 
+class DocumentLoadError(Exception):
+    """
+    Raised when parsing a document ran over the time or memory limit, or
+    crashed the worker. Parsing the same file again would fail the same way.
+    """
+
+
+class LoaderProcessPool:
+    """
+    Parses documents in separate processes, so CPU-bound parsing of several
+    files at once is spread over all cores instead of contending for the GIL.
+
+    Every file is parsed in a fresh process forked from a forkserver that
+    has the loaders imported already, with at most `max_workers` running at
+    a time. This way a worker that runs over `timeout` seconds or over
+    `max_memory` megabytes can be killed without affecting other files.
+    """
+
+    def __init__(self, max_workers: int, timeout: int, max_memory: int = 0):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.max_memory = max_memory
+
+        if sys.platform == "linux":
+            self._context = multiprocessing.get_context("forkserver")
+            self._context.set_forkserver_preload([__name__])
+        else:
+            self._context = multiprocessing.get_context("spawn")
+        self._semaphore = threading.BoundedSemaphore(max(max_workers, 1))
+
+    def load(
+        self,
+        engine: str,
+        kwargs: dict,
+        filename: str,
+        file_content_type: str,
+        file_path: str,
+    ) -> list[Document]:
+        with self._semaphore:
+            parent_conn, child_conn = self._context.Pipe(duplex=False)
+            process = self._context.Process(
+                target=_load_in_process,
+                args=(
+                    child_conn,
+                    engine,
+                    kwargs,
+                    filename,
+                    file_content_type,
+                    file_path,
+                    self.max_memory,
+                ),
+                daemon=True,
+            )
+            process.start()
+            child_conn.close()
+
+            try:
+                if not parent_conn.poll(self.timeout):
+                    process.kill()
+                    raise DocumentLoadError(
+                        f"Parsing {filename} took longer than {self.timeout} seconds"
+                    )
+
+                try:
+                    docs, error, out_of_memory = parent_conn.recv()
+                except EOFError:
+                    process.join()
+                    raise DocumentLoadError(
+                        f"Parsing {filename} failed, the worker exited with code {process.exitcode}"
+                    )
+            finally:
+                process.join(5)
+                if process.is_alive():
+                    process.kill()
+                    process.join()
+                parent_conn.close()
+
+        if out_of_memory:
+            raise DocumentLoadError(
+                f"Parsing {filename} used more than {self.max_memory} MB of memory"
+            )
+        if error is not None:
+            raise Exception(error)
+        return docs
+
+
+def _is_out_of_memory(e: Optional[BaseException]) -> bool:
+    # Loaders wrap the errors of the libraries they call, e.g. TextLoader
+    # raises a RuntimeError from the MemoryError of reading the file
+    while e is not None:
+        if isinstance(e, MemoryError):
+            return True
+        e = e.__cause__ or e.__context__
+    return False
+
+
+def _load_in_process(
+    conn,
+    engine: str,
+    kwargs: dict,
+    filename: str,
+    file_content_type: str,
+    file_path: str,
+    max_memory: int,
+):
+    try:
+        if max_memory > 0:
+            import resource
+
+            limit = max_memory * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+        docs = Loader(engine, **kwargs).load(filename, file_content_type, file_path)
+        conn.send((docs, None, False))
+    except BaseException as e:
+        conn.send(
+            (
+                None,
+                f"{type(e).__name__}: {e}" if str(e) else type(e).__name__,
+                _is_out_of_memory(e),
+            )
+        )
+    finally:
+        conn.close()
+
+
 class Loader:
-    def __init__(self, engine: str = "", **kwargs):
+    def __init__(
+        self,
+        engine: str = "",
+        pool: Optional[LoaderProcessPool] = None,
+        **kwargs,
+    ):
         self.engine = engine
+        self.pool = pool
         self.kwargs = kwargs
 
     def load(
         self, filename: str, file_content_type: str, file_path: str
     ) -> list[Document]:
+        if self.pool is not None:
+            return self.pool.load(
+                self.engine, self.kwargs, filename, file_content_type, file_path
+            )
+
         loader = self._get_loader(filename, file_content_type, file_path)
         docs = loader.load()
 
@@ -1,15 +1,19 @@
 # TODO: Merge this with the webui_app and make it a single app
 
+import asyncio
 import json
 import logging
 import mimetypes
 import os
+import random
 import shutil
 
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from itertools import chain, islice
 from pathlib import Path
-from typing import Iterator, Optional, Sequence, Union
+from typing import Iterable, Iterator, Optional, Sequence, Union
 
 from fastapi import Depends, FastAPI, File, Form, HTTPException, UploadFile, status
 from fastapi.middleware.cors import CORSMiddleware
@@ -19,10 +23,13 @@ import tiktoken
 
 from open_webui.storage.provider import Storage
 from open_webui.apps.webui.models.knowledge import Knowledges
+from open_webui.apps.retrieval.bm25 import BM25_INDEXES
+from open_webui.apps.retrieval.embedding_store import EMBEDDING_STORE
 from open_webui.apps.retrieval.vector.connector import VECTOR_DB_CLIENT
+from open_webui.apps.retrieval.vector.quantization import measure_recall
 
 # Document loaders
-from open_webui.apps.retrieval.loaders.main import Loader
+from open_webui.apps.retrieval.loaders.main import Loader, LoaderProcessPool
 
 # Web search engines
 from open_webui.apps.retrieval.web.main import SearchResult
@@ -72,6 +79,7 @@ from open_webui.config import (
     RAG_EMBEDDING_BATCH_SIZE,
     RAG_FILE_MAX_COUNT,
     RAG_FILE_MAX_SIZE,
+    RAG_FILE_PROCESSING_MAX_CONCURRENCY,
     RAG_OPENAI_API_BASE_URL,
     RAG_OPENAI_API_KEY,
     RAG_RELEVANCE_THRESHOLD,
@@ -81,6 +89,7 @@ from open_webui.config import (
     DEFAULT_RAG_TEMPLATE,
     RAG_TEMPLATE,
     RAG_TOP_K,
+    VECTOR_DB_QUANTIZATION,
     RAG_WEB_SEARCH_CONCURRENT_REQUESTS,
     RAG_WEB_SEARCH_DOMAIN_FILTER_LIST,
     RAG_WEB_SEARCH_ENGINE,
@@ -94,12 +103,17 @@ from open_webui.config import (
     SERPSTACK_HTTPS,
     TAVILY_API_KEY,
     TIKA_SERVER_URL,
+    CONTENT_EXTRACTION_WORKERS,
+    CONTENT_EXTRACTION_TIMEOUT,
+    CONTENT_EXTRACTION_MAX_MEMORY,
     UPLOAD_DIR,
+    RAG_INGESTION_MIN_BATCH_SIZE,
     YOUTUBE_LOADER_LANGUAGE,
     AppConfig,
 )
 from open_webui.constants import ERROR_MESSAGES
 from open_webui.env import SRC_LOG_LEVELS, DEVICE_TYPE, DOCKER
+from open_webui.utils.cache import EMBEDDING_CACHE, RERANK_SCORE_CACHE
 from open_webui.utils.misc import (
     calculate_sha256,
     calculate_sha256_string,
@@ -126,6 +140,7 @@ app.state.config.TOP_K = RAG_TOP_K
 app.state.config.RELEVANCE_THRESHOLD = RAG_RELEVANCE_THRESHOLD
 app.state.config.FILE_MAX_SIZE = RAG_FILE_MAX_SIZE
 app.state.config.FILE_MAX_COUNT = RAG_FILE_MAX_COUNT
+app.state.config.FILE_PROCESSING_MAX_CONCURRENCY = RAG_FILE_PROCESSING_MAX_CONCURRENCY
 
 app.state.config.ENABLE_RAG_HYBRID_SEARCH = ENABLE_RAG_HYBRID_SEARCH
 app.state.config.ENABLE_RAG_WEB_LOADER_SSL_VERIFICATION = (
@@ -135,6 +150,16 @@ app.state.config.ENABLE_RAG_WEB_LOADER_SSL_VERIFICATION = (
 app.state.config.CONTENT_EXTRACTION_ENGINE = CONTENT_EXTRACTION_ENGINE
 app.state.config.TIKA_SERVER_URL = TIKA_SERVER_URL
 
+app.state.loader_pool = (
+    LoaderProcessPool(
+        max_workers=CONTENT_EXTRACTION_WORKERS,
+        timeout=CONTENT_EXTRACTION_TIMEOUT,
+        max_memory=CONTENT_EXTRACTION_MAX_MEMORY,
+    )
+    if CONTENT_EXTRACTION_WORKERS > 0
+    else None
+)
+
 app.state.config.TEXT_SPLITTER = RAG_TEXT_SPLITTER
 app.state.config.TIKTOKEN_ENCODING_NAME = TIKTOKEN_ENCODING_NAME
 
@@ -195,6 +220,8 @@ def update_reranking_model(
     reranking_model: str,
     auto_update: bool = False,
 ):
+    RERANK_SCORE_CACHE.clear()
+
     if reranking_model:
         if any(model in reranking_model for model in ["jinaai/jina-colbert-v2"]):
             try:
@@ -294,6 +321,11 @@ async def get_embedding_config(user=Depends(get_admin_user)):
     }
 
 
+@app.get("/embedding/cache")
+async def get_embedding_cache_metrics(user=Depends(get_admin_user)):
+    return EMBEDDING_CACHE.get_metrics()
+
+
 @app.get("/reranking")
 async def get_reraanking_config(user=Depends(get_admin_user)):
     return {
@@ -405,6 +437,7 @@ async def get_rag_config(user=Depends(get_admin_user)):
         "file": {
             "max_size": app.state.config.FILE_MAX_SIZE,
             "max_count": app.state.config.FILE_MAX_COUNT,
+            "max_concurrent_jobs": app.state.config.FILE_PROCESSING_MAX_CONCURRENCY,
         },
         "youtube": {
             "language": app.state.config.YOUTUBE_LOADER_LANGUAGE,
@@ -436,6 +469,7 @@ async def get_rag_config(user=Depends(get_admin_user)):
 class FileConfig(BaseModel):
     max_size: Optional[int] = None
     max_count: Optional[int] = None
+    max_concurrent_jobs: Optional[int] = None
 
 
 class ContentExtractionConfig(BaseModel):
@@ -497,6 +531,10 @@ async def update_rag_config(form_data: ConfigUpdateForm, user=Depends(get_admin_
     if form_data.file is not None:
         app.state.config.FILE_MAX_SIZE = form_data.file.max_size
         app.state.config.FILE_MAX_COUNT = form_data.file.max_count
+        if form_data.file.max_concurrent_jobs is not None:
+            app.state.config.FILE_PROCESSING_MAX_CONCURRENCY = max(
+                form_data.file.max_concurrent_jobs, 1
+            )
 
     if form_data.content_extraction is not None:
         log.info(f"Updating text settings: {form_data.content_extraction}")
@@ -545,6 +583,7 @@ async def update_rag_config(form_data: ConfigUpdateForm, user=Depends(get_admin_
         "file": {
             "max_size": app.state.config.FILE_MAX_SIZE,
             "max_count": app.state.config.FILE_MAX_COUNT,
+            "max_concurrent_jobs": app.state.config.FILE_PROCESSING_MAX_CONCURRENCY,
         },
         "content_extraction": {
             "engine": app.state.config.CONTENT_EXTRACTION_ENGINE,
@@ -637,14 +676,14 @@ async def update_query_settings(
 
 
 def save_docs_to_vector_db(
-    docs,
+    docs: Iterable[Document],
     collection_name,
     metadata: Optional[dict] = None,
     overwrite: bool = False,
     split: bool = True,
     add: bool = False,
 ) -> bool:
-    log.info(f"save_docs_to_vector_db {docs} {collection_name}")
+    log.info(f"save_docs_to_vector_db {collection_name}")
 
     # Check if entries with the same hash (metadata.hash) already exist
     if metadata and "hash" in metadata:
@@ -681,45 +720,56 @@ def save_docs_to_vector_db(
         else:
             raise ValueError(ERROR_MESSAGES.DEFAULT("Invalid text splitter"))
 
-        docs = text_splitter.split_documents(docs)
+        # Split one document (page) at a time, so chunks are only produced as
+        # fast as they are embedded
+        chunks = (
+            chunk for doc in docs for chunk in text_splitter.split_documents([doc])
+        )
+    else:
+        chunks = iter(docs)
 
-    if len(docs) == 0:
+    first_chunk = next(chunks, None)
+    if first_chunk is None:
         raise ValueError(ERROR_MESSAGES.EMPTY_CONTENT)
+    chunks = chain([first_chunk], chunks)
 
-    texts = [doc.page_content for doc in docs]
-    metadatas = [
+    embedding_config = json.dumps(
         {
+            "engine": app.state.config.RAG_EMBEDDING_ENGINE,
+            "model": app.state.config.RAG_EMBEDDING_MODEL,
+        }
+    )
+
+    def get_chunk_metadata(doc: Document) -> dict:
+        chunk_metadata = {
             **doc.metadata,
             **(metadata if metadata else {}),
-            "embedding_config": json.dumps(
-                {
-                    "engine": app.state.config.RAG_EMBEDDING_ENGINE,
-                    "model": app.state.config.RAG_EMBEDDING_MODEL,
-                }
-            ),
+            "embedding_config": embedding_config,
         }
-        for doc in docs
-    ]
 
-    # ChromaDB does not like datetime formats
-    # for meta-data so convert them to string.
-    for metadata in metadatas:
-        for key, value in metadata.items():
+        # ChromaDB does not like datetime formats
+        # for meta-data so convert them to string.
+        for key, value in chunk_metadata.items():
             if isinstance(value, datetime):
-                metadata[key] = str(value)
+                chunk_metadata[key] = str(value)
+        return chunk_metadata
 
     try:
+        new_collection = True
         if VECTOR_DB_CLIENT.has_collection(collection_name=collection_name):
             log.info(f"collection {collection_name} already exists")
 
             if overwrite:
                 VECTOR_DB_CLIENT.delete_collection(collection_name=collection_name)
+                BM25_INDEXES.delete_collection(collection_name=collection_name)
                 log.info(f"deleting existing collection {collection_name}")
             elif add is False:
                 log.info(
                     f"collection {collection_name} already exists, overwrite is False and add is False"
                 )
                 return True
+            else:
+                new_collection = False
 
         log.info(f"adding to collection {collection_name}")
         embedding_function = get_embedding_function(
@@ -730,29 +780,74 @@ def save_docs_to_vector_db(
             app.state.config.OPENAI_API_BASE_URL,
             app.state.config.RAG_EMBEDDING_BATCH_SIZE,
         )
+    except Exception as e:
+        log.exception(e)
+        return False
 
-        embeddings = embedding_function(
-            list(map(lambda x: x.replace("\n", " "), texts))
-        )
+    batch_size = max(
+        app.state.config.RAG_EMBEDDING_BATCH_SIZE, RAG_INGESTION_MIN_BATCH_SIZE
+    )
+    inserted_ids = []
 
-        items = [
-            {
-                "id": str(uuid.uuid4()),
-                "text": text,
-                "vector": embeddings[idx],
-                "metadata": metadatas[idx],
-            }
-            for idx, text in enumerate(texts)
-        ]
-
-        VECTOR_DB_CLIENT.insert(
-            collection_name=collection_name,
-            items=items,
-        )
+    def insert_batch(items: list[dict], first: bool):
+        VECTOR_DB_CLIENT.insert(collection_name=collection_name, items=items)
+        inserted_ids.extend(item["id"] for item in items)
+
+        if first and new_collection:
+            BM25_INDEXES.create(collection_name=collection_name, items=items)
+        else:
+            BM25_INDEXES.add(collection_name=collection_name, items=items)
+
+    # Chunks are embedded one batch at a time while the previous batch is
+    # inserted in the background, so only two batches are held in memory.
+    pending = None
+    try:
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            while batch := list(islice(chunks, batch_size)):
+                texts = [doc.page_content for doc in batch]
+                embeddings = EMBEDDING_STORE.embed(
+                    list(map(lambda x: x.replace("\n", " "), texts)),
+                    engine=app.state.config.RAG_EMBEDDING_ENGINE,
+                    model=app.state.config.RAG_EMBEDDING_MODEL,
+                    embedding_function=embedding_function,
+                )
+
+                items = [
+                    {
+                        "id": str(uuid.uuid4()),
+                        "text": text,
+                        "vector": embeddings[idx],
+                        "metadata": get_chunk_metadata(batch[idx]),
+                    }
+                    for idx, text in enumerate(texts)
+                ]
+
+                first = pending is None
+                if pending is not None:
+                    pending.result()
+                pending = executor.submit(insert_batch, items, first)
+
+            pending.result()
 
         return True
     except Exception as e:
         log.exception(e)
+
+        # Don't leave a partially ingested document behind
+        if pending is not None:
+            try:
+                if new_collection:
+                    VECTOR_DB_CLIENT.delete_collection(collection_name=collection_name)
+                    BM25_INDEXES.delete_collection(collection_name=collection_name)
+                elif inserted_ids:
+                    VECTOR_DB_CLIENT.delete(
+                        collection_name=collection_name, ids=inserted_ids
+                    )
+                    BM25_INDEXES.delete(
+                        collection_name=collection_name, ids=inserted_ids
+                    )
+            except Exception as e:
+                log.exception(f"Error cleaning up collection {collection_name}: {e}")
         return False
 
 
@@ -783,6 +878,10 @@ def process_file(
                 collection_name=f"file-{file.id}",
                 filter={"file_id": file.id},
             )
+            BM25_INDEXES.delete(
+                collection_name=f"file-{file.id}",
+                filter={"file_id": file.id},
+            )
 
             docs = [
                 Document(
@@ -835,6 +934,7 @@ def process_file(
                 file_path = Storage.get_file(file_path)
                 loader = Loader(
                     engine=app.state.config.CONTENT_EXTRACTION_ENGINE,
+                    pool=app.state.loader_pool,
                     TIKA_SERVER_URL=app.state.config.TIKA_SERVER_URL,
                     PDF_EXTRACT_IMAGES=app.state.config.PDF_EXTRACT_IMAGES,
                 )
@@ -898,12 +998,12 @@ def process_file(
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=ERROR_MESSAGES.PANDOC_NOT_INSTALLED,
-            )
+            ) from e
         else:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=str(e),
-            )
+            ) from e
 
 
 class ProcessTextForm(BaseModel):
@@ -1268,6 +1368,62 @@ def query_collection_handler(
 ####################################
 
 
+class QuantizationRecallForm(BaseModel):
+    collection_name: str
+    k: Optional[int] = None
+    sample_size: int = 2000
+    query_count: int = 100
+
+
+@app.post("/quantization/recall")
+def get_quantization_recall(
+    form_data: QuantizationRecallForm, user=Depends(get_admin_user)
+):
+    """
+    Estimates the recall@k each VECTOR_DB_QUANTIZATION mode would have on a
+    collection, by embedding a sample of its chunks at full precision and
+    searching them with chunks not in the sample as queries. Larger
+    collections have closer neighbours, so their recall tends to be lower.
+    """
+    result = VECTOR_DB_CLIENT.get(collection_name=form_data.collection_name)
+    texts = result.documents[0] if result is not None and result.documents else []
+    if len(texts) < 2:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=ERROR_MESSAGES.NOT_FOUND,
+        )
+
+    texts = random.sample(
+        texts, min(len(texts), form_data.sample_size + form_data.query_count)
+    )
+    query_count = min(form_data.query_count, len(texts) // 2)
+    k = form_data.k if form_data.k else app.state.config.TOP_K
+
+    try:
+        embeddings = EMBEDDING_STORE.embed(
+            [text.replace("\n", " ") for text in texts],
+            engine=app.state.config.RAG_EMBEDDING_ENGINE,
+            model=app.state.config.RAG_EMBEDDING_MODEL,
+            embedding_function=app.state.EMBEDDING_FUNCTION,
+        )
+        results = measure_recall(embeddings[query_count:], embeddings[:query_count], k)
+    except Exception as e:
+        log.exception(e)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=ERROR_MESSAGES.DEFAULT(e),
+        )
+
+    return {
+        "collection_name": form_data.collection_name,
+        "k": k,
+        "sample_size": len(texts) - query_count,
+        "query_count": query_count,
+        "quantization": VECTOR_DB_QUANTIZATION or "float32",
+        "results": results,
+    }
+
+
 class DeleteForm(BaseModel):
     collection_name: str
     file_id: str
@@ -1282,7 +1438,11 @@ def delete_entries_from_collection(form_data: DeleteForm, user=Depends(get_admin
 
             VECTOR_DB_CLIENT.delete(
                 collection_name=form_data.collection_name,
-                metadata={"hash": hash},
+                filter={"hash": hash},
+            )
+            BM25_INDEXES.delete(
+                collection_name=form_data.collection_name,
+                filter={"hash": hash},
             )
             return {"status": True}
         else:
@@ -1295,6 +1455,7 @@ def delete_entries_from_collection(form_data: DeleteForm, user=Depends(get_admin
 @app.post("/reset/db")
 def reset_vector_db(user=Depends(get_admin_user)):
     VECTOR_DB_CLIENT.reset()
+    BM25_INDEXES.reset()
     Knowledges.delete_all_knowledge()
 
 
@@ -1325,8 +1486,12 @@ if ENV == "dev":
 
     @app.get("/ef")
     async def get_embeddings():
-        return {"result": app.state.EMBEDDING_FUNCTION("hello world")}
+        return {
+            "result": await asyncio.to_thread(
+                app.state.EMBEDDING_FUNCTION, "hello world"
+            )
+        }
 
     @app.get("/ef/{text}")
     async def get_embeddings_text(text: str):
-        return {"result": app.state.EMBEDDING_FUNCTION(text)}
+        return {"result": await asyncio.to_thread(app.state.EMBEDDING_FUNCTION, text)}
@@ -6,6 +6,10 @@ from colbert.modeling.checkpoint import Checkpoint
 
 
 class ColBERT:
+    # Scores are normalized over all documents of a call, so a document's
+    # score depends on the others and can't be cached on its own
+    independent_scores = False
+
     def __init__(self, name, **kwargs) -> None:
         print("ColBERT: Loading model", name)
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
@@ -62,13 +66,13 @@ class ColBERT:
 
         return normalized_scores.detach().cpu().numpy().astype(np.float32)
 
-    def predict(self, sentences):
+    def predict(self, sentences, batch_size: int = 32):
 
         query = sentences[0][0]
         docs = [i[1] for i in sentences]
 
         # Embedding the documents
-        embedded_docs = self.ckpt.docFromText(docs, bsize=32)[0]
+        embedded_docs = self.ckpt.docFromText(docs, bsize=batch_size)[0]
         # Embedding the queries
         embedded_queries = self.ckpt.queryFromText([query], bsize=32)
         embedded_query = embedded_queries[0]
@@ -1,13 +1,17 @@
+import hashlib
 import logging
 import os
+import time
 import uuid
-from typing import Optional, Union
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from typing import Callable, Optional, Union
 
+import numpy as np
 import requests
 
 from huggingface_hub import snapshot_download
 from langchain.retrievers import ContextualCompressionRetriever, EnsembleRetriever
-from langchain_community.retrievers import BM25Retriever
 from langchain_core.documents import Document
 
 
@@ -15,16 +19,30 @@ from open_webui.apps.ollama.main import (
     GenerateEmbedForm,
     generate_ollama_batch_embeddings,
 )
+from open_webui.apps.retrieval.bm25 import BM25_INDEXES
 from open_webui.apps.retrieval.vector.connector import VECTOR_DB_CLIENT
+from open_webui.apps.retrieval.vector.main import as_lists
+from open_webui.utils.cache import EMBEDDING_CACHE, RERANK_SCORE_CACHE
 from open_webui.utils.misc import get_last_user_message
+from open_webui.utils.session_pool import CLIENT_SESSION_POOL
 
 from open_webui.env import SRC_LOG_LEVELS
-from open_webui.config import DEFAULT_RAG_TEMPLATE
+from open_webui.config import (
+    DEFAULT_RAG_TEMPLATE,
+    RAG_QUERY_CONCURRENCY,
+    RAG_RERANKING_BATCH_SIZE,
+)
 
 
 log = logging.getLogger(__name__)
 log.setLevel(SRC_LOG_LEVELS["RAG"])
 
+# Searches of the collections attached to a chat run concurrently here. Tasks
+# must not submit further tasks to it, or a full pool would deadlock.
+query_executor = ThreadPoolExecutor(
+    max_workers=RAG_QUERY_CONCURRENCY, thread_name_prefix="rag_query"
+)
+
 
 from typing import Any
 
@@ -36,6 +54,7 @@ class VectorSearchRetriever(BaseRetriever):
     collection_name: Any
     embedding_function: Any
     top_k: int
+    query_embedding: Optional[list[float]] = None
 
     def _get_relevant_documents(
         self,
@@ -45,7 +64,13 @@ class VectorSearchRetriever(BaseRetriever):
     ) -> list[Document]:
         result = VECTOR_DB_CLIENT.search(
             collection_name=self.collection_name,
-            vectors=[self.embedding_function(query)],
+            vectors=[
+                (
+                    self.query_embedding
+                    if self.query_embedding is not None
+                    else self.embedding_function(query)
+                )
+            ],
             limit=self.top_k,
         )
 
@@ -64,6 +89,44 @@ class VectorSearchRetriever(BaseRetriever):
         return results
 
 
+class BM25IndexRetriever(BaseRetriever):
+    collection_name: Any
+    top_k: int
+
+    def load_collection(self) -> Optional[list[dict]]:
+        result = VECTOR_DB_CLIENT.get(collection_name=self.collection_name)
+        if result is None:
+            return None
+
+        return [
+            {"id": id, "text": text, "metadata": metadata}
+            for id, text, metadata in zip(
+                result.ids[0], result.documents[0], result.metadatas[0]
+            )
+        ]
+
+    def _get_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: CallbackManagerForRetrieverRun,
+    ) -> list[Document]:
+        results = BM25_INDEXES.search(
+            collection_name=self.collection_name,
+            query=query,
+            k=self.top_k,
+            loader=self.load_collection,
+        )
+
+        return [
+            Document(
+                metadata=result["metadata"],
+                page_content=result["text"],
+            )
+            for result in results
+        ]
+
+
 def query_doc(
     collection_name: str,
     query_embedding: list[float],
@@ -90,20 +153,19 @@ def query_doc_with_hybrid_search(
     k: int,
     reranking_function,
     r: float,
+    query_embedding: Optional[list[float]] = None,
 ) -> dict:
     try:
-        result = VECTOR_DB_CLIENT.get(collection_name=collection_name)
-
-        bm25_retriever = BM25Retriever.from_texts(
-            texts=result.documents[0],
-            metadatas=result.metadatas[0],
+        bm25_retriever = BM25IndexRetriever(
+            collection_name=collection_name,
+            top_k=k,
         )
-        bm25_retriever.k = k
 
         vector_search_retriever = VectorSearchRetriever(
             collection_name=collection_name,
             embedding_function=embedding_function,
             top_k=k,
+            query_embedding=query_embedding,
         )
 
         ensemble_retriever = EnsembleRetriever(
@@ -114,6 +176,7 @@ def query_doc_with_hybrid_search(
             top_n=k,
             reranking_function=reranking_function,
             r_score=r,
+            query_embedding=query_embedding,
         )
 
         compression_retriever = ContextualCompressionRetriever(
@@ -135,45 +198,139 @@ def query_doc_with_hybrid_search(
 
 def merge_and_sort_query_results(
     query_results: list[dict], k: int, reverse: bool = False
-) -> list[dict]:
-    # Initialize lists to store combined data
-    combined_distances = []
-    combined_documents = []
-    combined_metadatas = []
-
-    for data in query_results:
-        combined_distances.extend(data["distances"][0])
-        combined_documents.extend(data["documents"][0])
-        combined_metadatas.extend(data["metadatas"][0])
-
-    # Create a list of tuples (distance, document, metadata)
-    combined = list(zip(combined_distances, combined_documents, combined_metadatas))
-
-    # Sort the list based on distances
-    combined.sort(key=lambda x: x[0], reverse=reverse)
-
-    # We don't have anything :-(
-    if not combined:
-        sorted_distances = []
-        sorted_documents = []
-        sorted_metadatas = []
-    else:
-        # Unzip the sorted list
-        sorted_distances, sorted_documents, sorted_metadatas = zip(*combined)
-
-        # Slicing the lists to include only k elements
-        sorted_distances = list(sorted_distances)[:k]
-        sorted_documents = list(sorted_documents)[:k]
-        sorted_metadatas = list(sorted_metadatas)[:k]
-
-    # Create the output dictionary
-    result = {
-        "distances": [sorted_distances],
-        "documents": [sorted_documents],
-        "metadatas": [sorted_metadatas],
+) -> dict:
+    """
+    Merges the results of several collections into the `k` best chunks,
+    lowest distance first, or highest score first with `reverse`. A chunk
+    found in several collections is kept once, with its best distance.
+    """
+    distances = np.fromiter(
+        chain.from_iterable(data["distances"][0] for data in query_results),
+        dtype=np.float64,
+    )
+    documents = list(
+        chain.from_iterable(data["documents"][0] for data in query_results)
+    )
+    metadatas = list(
+        chain.from_iterable(data["metadatas"][0] for data in query_results)
+    )
+    keys = -distances if reverse else distances
+
+    # Select the best candidates without sorting everything, then drop the
+    # chunks already taken from a better ranked collection. Only if that
+    # leaves fewer than k chunks are more candidates selected.
+    n = k
+    while True:
+        if n < len(keys):
+            candidates = np.argpartition(keys, n - 1)[:n]
+        else:
+            candidates = np.arange(len(keys))
+        candidates = candidates[np.argsort(keys[candidates], kind="stable")]
+
+        top = []
+        seen = set()
+        for idx in candidates.tolist():
+            if documents[idx] not in seen:
+                seen.add(documents[idx])
+                top.append(idx)
+                if len(top) == k:
+                    break
+
+        if len(top) == k or n >= len(keys):
+            break
+        n *= 2
+
+    return {
+        "distances": [[distances[idx].item() for idx in top]],
+        "documents": [[documents[idx] for idx in top]],
+        "metadatas": [[metadatas[idx] for idx in top]],
     }
 
-    return result
+
+def search_collections(
+    collection_names: list[str], search: Callable[[str], Optional[dict]]
+) -> dict[str, Union[dict, Exception, None]]:
+    """
+    Runs `search` for every collection concurrently and returns its result, or
+    the exception it raised, by collection name. Each returned chunk's metadata
+    is tagged with the collection it came from and the time in milliseconds
+    the search of that collection took (`search_time_ms`).
+    """
+
+    def run(collection_name: str) -> Optional[dict]:
+        start = time.perf_counter()
+        result = search(collection_name)
+        search_time_ms = round((time.perf_counter() - start) * 1000, 1)
+
+        if result is not None:
+            for metadata in result["metadatas"][0]:
+                if metadata is not None:
+                    metadata["collection_name"] = collection_name
+                    metadata["search_time_ms"] = search_time_ms
+        return result
+
+    futures = {
+        collection_name: query_executor.submit(run, collection_name)
+        for collection_name in collection_names
+    }
+
+    results = {}
+    for collection_name, future in futures.items():
+        try:
+            results[collection_name] = future.result()
+        except Exception as e:
+            results[collection_name] = e
+    return results
+
+
+def get_query_doc_search(
+    query_embeddings: list[list[float]], k: int
+) -> Callable[[str], Optional[dict]]:
+    # All queries are searched in one request per collection, and their
+    # results merged.
+    def search(collection_name: str) -> Optional[dict]:
+        results = VECTOR_DB_CLIENT.search_many(
+            collection_name=collection_name,
+            vectors=query_embeddings,
+            limit=k,
+        )
+        if results is None:
+            return None
+        if len(results) == 1:
+            return results[0].model_dump()
+        return merge_and_sort_query_results(
+            [result.model_dump() for result in results], k=k
+        )
+
+    return search
+
+
+def get_hybrid_search(
+    queries: list[str],
+    query_embeddings: list[list[float]],
+    embedding_function,
+    k: int,
+    reranking_function,
+    r: float,
+) -> Callable[[str], dict]:
+    def search(collection_name: str) -> dict:
+        results = [
+            query_doc_with_hybrid_search(
+                collection_name=collection_name,
+                query=query,
+                embedding_function=embedding_function,
+                k=k,
+                reranking_function=reranking_function,
+                r=r,
+                query_embedding=query_embedding,
+            )
+            for query, query_embedding in zip(queries, query_embeddings)
+        ]
+        if len(results) == 1:
+            return results[0]
+        return merge_and_sort_query_results(results, k=k, reverse=True)
+
+    return search
 
 
 def query_collection(
@@ -181,25 +338,23 @@ def query_collection(
     query: str,
     embedding_function,
     k: int,
+    query_embedding: Optional[list[float]] = None,
 ) -> dict:
+    if query_embedding is None:
+        query_embedding = embedding_function(query)
 
     results = []
-    query_embedding = embedding_function(query)
-
-    for collection_name in collection_names:
-        if collection_name:
-            try:
-                result = query_doc(
-                    collection_name=collection_name,
-                    k=k,
-                    query_embedding=query_embedding,
-                )
-                if result is not None:
-                    results.append(result.model_dump())
-            except Exception as e:
-                log.exception(f"Error when querying the collection: {e}")
-        else:
-            pass
+    for collection_name, result in search_collections(
+        [collection_name for collection_name in collection_names if collection_name],
+        get_query_doc_search([query_embedding], k),
+    ).items():
+        if isinstance(result, Exception):
+            log.error(
+                f"Error when querying the collection {collection_name}: {result}",
+                exc_info=result,
+            )
+        elif result is not None:
+            results.append(result)
 
     return merge_and_sort_query_results(results, k=k)
 
@@ -211,25 +366,27 @@ def query_collection_with_hybrid_search(
     k: int,
     reranking_function,
     r: float,
+    query_embedding: Optional[list[float]] = None,
 ) -> dict:
+    if query_embedding is None:
+        query_embedding = embedding_function(query)
+
     results = []
     error = False
-    for collection_name in collection_names:
-        try:
-            result = query_doc_with_hybrid_search(
-                collection_name=collection_name,
-                query=query,
-                embedding_function=embedding_function,
-                k=k,
-                reranking_function=reranking_function,
-                r=r,
-            )
-            results.append(result)
-        except Exception as e:
-            log.exception(
-                "Error when querying the collection with " f"hybrid_search: {e}"
+    for collection_name, result in search_collections(
+        collection_names,
+        get_hybrid_search(
+            [query], [query_embedding], embedding_function, k, reranking_function, r
+        ),
+    ).items():
+        if isinstance(result, Exception):
+            log.error(
+                "Error when querying the collection with " f"hybrid_search: {result}",
+                exc_info=result,
             )
             error = True
+        else:
+            results.append(result)
 
     if error:
         raise Exception(
@@ -286,14 +443,29 @@ def get_embedding_function(
     embedding_batch_size,
 ):
     if embedding_engine == "":
-        return lambda query: embedding_function.encode(query).tolist()
-    elif embedding_engine in ["ollama", "openai"]:
+        # Lists of documents are returned as the float32 matrix the model
+        # computes, which is passed on to the vector database as it is
+        func = lambda query: (
+            embedding_function.encode(query).tolist()
+            if isinstance(query, str)
+            else embedding_function.encode(query)
+        )
+    elif embedding_engine == "ollama":
+        # The Ollama client splits large inputs itself and embeds the batches
+        # concurrently, so hand lists over as they are.
         func = lambda query: generate_embeddings(
             engine=embedding_engine,
             model=embedding_model,
             text=query,
-            key=openai_key if embedding_engine == "openai" else "",
-            url=openai_url if embedding_engine == "openai" else "",
+            batch_size=embedding_batch_size,
+        )
+    elif embedding_engine == "openai":
+        openai_func = lambda query: generate_embeddings(
+            engine=embedding_engine,
+            model=embedding_model,
+            text=query,
+            key=openai_key,
+            url=openai_url,
         )
 
         def generate_multiple(query, func):
@@ -305,7 +477,30 @@ def get_embedding_function(
             else:
                 return func(query)
 
-        return lambda query: generate_multiple(query, func)
+        func = lambda query: generate_multiple(query, openai_func)
+    else:
+        return None
+
+    # Single texts are queries, which repeat across requests and retrievers,
+    # so they go through the embedding cache. Lists are documents being
+    # ingested and are embedded as they are.
+    def generate_cached(query):
+        if not isinstance(query, str):
+            return func(query)
+
+        key = (embedding_engine, embedding_model, " ".join(query.split()))
+        embedding = EMBEDDING_CACHE.get(key)
+        if embedding is None:
+            embedding = func(query)
+            if embedding is not None:
+                EMBEDDING_CACHE.set(key, embedding)
+        return embedding
+
+    # Lets callers look up the stored embeddings of ingested chunks, which
+    # were made with the same engine and model
+    generate_cached.engine = embedding_engine
+    generate_cached.model = embedding_model
+    return generate_cached
 
 
 def get_rag_context(
@@ -316,12 +511,17 @@ def get_rag_context(
     reranking_function,
     r,
     hybrid_search,
+    queries: Optional[list[str]] = None,
 ):
     log.debug(f"files: {files} {messages} {embedding_function} {reranking_function}")
-    query = get_last_user_message(messages)
+    # Several search queries can be given for one turn, otherwise the last
+    # user message is searched for
+    if not queries:
+        queries = [get_last_user_message(messages)]
 
     extracted_collections = []
-    relevant_contexts = []
+    # [file, context, collection names still to be searched]
+    file_contexts = []
 
     for file in files:
         if file.get("context") == "full":
@@ -329,9 +529,8 @@ def get_rag_context(
                 "documents": [[file.get("file").get("data", {}).get("content")]],
                 "metadatas": [[{"file_id": file.get("id"), "name": file.get("name")}]],
             }
+            file_contexts.append([file, context, None])
         else:
-            context = None
-
             collection_names = []
             if file.get("type") == "collection":
                 if file.get("legacy"):
@@ -351,39 +550,68 @@ def get_rag_context(
                 log.debug(f"skipping {file} as it has already been extracted")
                 continue
 
-            try:
-                context = None
-                if file.get("type") == "text":
-                    context = file["content"]
-                else:
-                    if hybrid_search:
-                        try:
-                            context = query_collection_with_hybrid_search(
-                                collection_names=collection_names,
-                                query=query,
-                                embedding_function=embedding_function,
-                                k=k,
-                                reranking_function=reranking_function,
-                                r=r,
-                            )
-                        except Exception as e:
-                            log.debug(
-                                "Error when using hybrid search, using"
-                                " non hybrid search as fallback."
-                            )
-
-                    if (not hybrid_search) or (context is None):
-                        context = query_collection(
-                            collection_names=collection_names,
-                            query=query,
-                            embedding_function=embedding_function,
-                            k=k,
-                        )
-            except Exception as e:
-                log.exception(e)
+            if file.get("type") == "text":
+                file_contexts.append([file, file.get("content"), None])
+            else:
+                file_contexts.append([file, None, list(collection_names)])
 
             extracted_collections.extend(collection_names)
 
+    # The collections of all files are searched at once, sharing the query
+    # embeddings, then merged back per file.
+    pending = [entry for entry in file_contexts if entry[2]]
+    if pending:
+        try:
+            query_embeddings = [embedding_function(query) for query in queries]
+        except Exception as e:
+            log.exception(e)
+            pending = []
+
+    if pending and hybrid_search:
+        results = search_collections(
+            [name for entry in pending for name in entry[2]],
+            get_hybrid_search(
+                queries,
+                query_embeddings,
+                embedding_function,
+                k,
+                reranking_function,
+                r,
+            ),
+        )
+        for entry in pending:
+            entry_results = [results[name] for name in entry[2]]
+            if any(isinstance(result, Exception) for result in entry_results):
+                log.debug(
+                    "Error when using hybrid search, using"
+                    " non hybrid search as fallback."
+                )
+            else:
+                entry[1] = merge_and_sort_query_results(
+                    entry_results, k=k, reverse=True
+                )
+                entry[2] = None
+        pending = [entry for entry in pending if entry[2]]
+
+    if pending:
+        results = search_collections(
+            [name for entry in pending for name in entry[2]],
+            get_query_doc_search(query_embeddings, k),
+        )
+        for entry in pending:
+            entry_results = []
+            for name in entry[2]:
+                if isinstance(results[name], Exception):
+                    log.error(
+                        f"Error when querying the collection {name}: {results[name]}",
+                        exc_info=results[name],
+                    )
+                elif results[name] is not None:
+                    entry_results.append(results[name])
+            entry[1] = merge_and_sort_query_results(entry_results, k=k)
+
+    relevant_contexts = []
+    for file, context, _ in file_contexts:
         if context:
             if "data" in file:
                 del file["data"]
@@ -491,14 +719,19 @@ def generate_openai_batch_embeddings(
 
 def generate_embeddings(engine: str, model: str, text: Union[str, list[str]], **kwargs):
     if engine == "ollama":
-        if isinstance(text, list):
-            embeddings = generate_ollama_batch_embeddings(
-                GenerateEmbedForm(**{"model": model, "input": text})
-            )
-        else:
-            embeddings = generate_ollama_batch_embeddings(
-                GenerateEmbedForm(**{"model": model, "input": [text]})
+        # Called from synchronous code (worker threads), so run the async
+        # client on the application loop, where its pooled sessions live.
+        embeddings = CLIENT_SESSION_POOL.run(
+            generate_ollama_batch_embeddings(
+                GenerateEmbedForm(
+                    **{
+                        "model": model,
+                        "input": text if isinstance(text, list) else [text],
+                    }
+                ),
+                batch_size=kwargs.get("batch_size"),
             )
+        )
         return (
             embeddings["embeddings"][0]
             if isinstance(text, str)
@@ -516,7 +749,6 @@ def generate_embeddings(engine: str, model: str, text: Union[str, list[str]], **
         return embeddings[0] if isinstance(text, str) else embeddings
 
 
-import operator
 from typing import Optional, Sequence
 
 from langchain_core.callbacks import Callbacks
@@ -528,46 +760,108 @@ class RerankCompressor(BaseDocumentCompressor):
     top_n: int
     reranking_function: Any
     r_score: float
+    query_embedding: Optional[list[float]] = None
 
     class Config:
         extra = "forbid"
         arbitrary_types_allowed = True
 
+    def get_rerank_scores(self, documents: Sequence[Document], query: str):
+        # Scores of chunks seen before with the same query come from the
+        # cache, keyed by the chunk text so chunks shared by several files
+        # or collections are scored once.
+        cacheable = getattr(self.reranking_function, "independent_scores", True)
+        keys = [
+            (query, hashlib.sha256(doc.page_content.encode()).hexdigest())
+            for doc in documents
+        ]
+
+        scores = np.empty(len(documents), dtype=np.float32)
+        missing = []
+        for idx, key in enumerate(keys):
+            score = RERANK_SCORE_CACHE.get(key) if cacheable else None
+            if score is None:
+                missing.append(idx)
+            else:
+                scores[idx] = score
+
+        if missing:
+            predicted = self.reranking_function.predict(
+                [(query, documents[idx].page_content) for idx in missing],
+                batch_size=RAG_RERANKING_BATCH_SIZE,
+            )
+            scores[missing] = np.asarray(predicted, dtype=np.float32).reshape(-1)
+
+            if cacheable:
+                for idx in missing:
+                    RERANK_SCORE_CACHE.set(keys[idx], float(scores[idx]))
+        return scores
+
+    def get_similarity_scores(self, documents: Sequence[Document], query: str):
+        query_embedding = (
+            self.query_embedding
+            if self.query_embedding is not None
+            else self.embedding_function(query)
+        )
+
+        # Chunks retrieved again by later queries are taken from the
+        # embedding cache. The embedding store is left to ingestion, so
+        # queries don't write to it.
+        texts = [doc.page_content.replace("\n", " ") for doc in documents]
+        engine = getattr(self.embedding_function, "engine", None)
+        if engine is not None:
+            keys = [(engine, self.embedding_function.model, text) for text in texts]
+            document_embeddings = [EMBEDDING_CACHE.get(key) for key in keys]
+            missing = [
+                idx
+                for idx, embedding in enumerate(document_embeddings)
+                if embedding is None
+            ]
+            if missing:
+                embeddings = as_lists(
+                    self.embedding_function([texts[idx] for idx in missing])
+                )
+                for idx, embedding in zip(missing, embeddings):
+                    document_embeddings[idx] = embedding
+                    EMBEDDING_CACHE.set(keys[idx], embedding)
+        else:
+            document_embeddings = self.embedding_function(texts)
+
+        query_embedding = np.asarray(query_embedding, dtype=np.float32)
+        document_embeddings = np.asarray(document_embeddings, dtype=np.float32)
+
+        norms = np.linalg.norm(document_embeddings, axis=1) * np.linalg.norm(
+            query_embedding
+        )
+        return document_embeddings @ query_embedding / np.maximum(norms, 1e-12)
+
     def compress_documents(
         self,
         documents: Sequence[Document],
         query: str,
         callbacks: Optional[Callbacks] = None,
     ) -> Sequence[Document]:
-        reranking = self.reranking_function is not None
+        if not documents or self.top_n <= 0:
+            return []
 
-        if reranking:
-            scores = self.reranking_function.predict(
-                [(query, doc.page_content) for doc in documents]
-            )
+        if self.reranking_function is not None:
+            scores = self.get_rerank_scores(documents, query)
         else:
-            from sentence_transformers import util
+            scores = self.get_similarity_scores(documents, query)
 
-            query_embedding = self.embedding_function(query)
-            document_embedding = self.embedding_function(
-                [doc.page_content for doc in documents]
-            )
-            scores = util.cos_sim(query_embedding, document_embedding)[0]
-
-        docs_with_scores = list(zip(documents, scores.tolist()))
+        indices = np.arange(len(documents))
         if self.r_score:
-            docs_with_scores = [
-                (d, s) for d, s in docs_with_scores if s >= self.r_score
+            indices = indices[scores >= self.r_score]
+
+        if len(indices) > self.top_n:
+            indices = indices[
+                np.argpartition(-scores[indices], self.top_n - 1)[: self.top_n]
             ]
+        indices = indices[np.argsort(-scores[indices], kind="stable")]
 
-        result = sorted(docs_with_scores, key=operator.itemgetter(1), reverse=True)
         final_results = []
-        for doc, doc_score in result[: self.top_n]:
-            metadata = doc.metadata
-            metadata["score"] = doc_score
-            doc = Document(
-                page_content=doc.page_content,
-                metadata=metadata,
-            )
+        for idx in indices:
+            doc = documents[idx]
+            doc.metadata["score"] = float(scores[idx])
             final_results.append(doc)
         return final_results
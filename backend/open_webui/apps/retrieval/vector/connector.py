@@ -8,6 +8,10 @@ elif VECTOR_DB == "qdrant":
     from open_webui.apps.retrieval.vector.dbs.qdrant import QdrantClient
 
     VECTOR_DB_CLIENT = QdrantClient()
+elif VECTOR_DB == "local":
+    from open_webui.apps.retrieval.vector.dbs.local import LocalClient
+
+    VECTOR_DB_CLIENT = LocalClient()
 else:
     from open_webui.apps.retrieval.vector.dbs.chroma import ChromaClient
 
@@ -1,11 +1,17 @@
 import chromadb
 from chromadb import Settings
-from chromadb.utils.batch_utils import create_batches
 
 from typing import Optional
 
-from open_webui.apps.retrieval.vector.main import VectorItem, SearchResult, GetResult
+from open_webui.apps.retrieval.vector.main import (
+    VectorItem,
+    SearchResult,
+    GetResult,
+    as_matrix,
+)
+from open_webui.utils.cache import TTLCache
 from open_webui.config import (
+    VECTOR_DB_COLLECTION_CACHE_TTL,
     CHROMA_DATA_PATH,
     CHROMA_HTTP_HOST,
     CHROMA_HTTP_PORT,
@@ -36,13 +42,25 @@ class ChromaClient:
                 database=CHROMA_DATABASE,
             )
 
+        # Names of collections known to exist
+        self.collections = TTLCache(ttl=VECTOR_DB_COLLECTION_CACHE_TTL)
+
     def has_collection(self, collection_name: str) -> bool:
         # Check if the collection exists based on the collection name.
-        collections = self.client.list_collections()
-        return collection_name in [collection.name for collection in collections]
+        if self.collections.get(collection_name):
+            return True
+
+        try:
+            self.client.get_collection(name=collection_name)
+        except Exception:
+            return False
+
+        self.collections.set(collection_name, True)
+        return True
 
     def delete_collection(self, collection_name: str):
         # Delete the collection based on the collection name.
+        self.collections.delete(collection_name)
         return self.client.delete_collection(name=collection_name)
 
     def search(
@@ -69,6 +87,15 @@ class ChromaClient:
         except Exception as e:
             return None
 
+    def search_many(
+        self, collection_name: str, vectors: list[list[float | int]], limit: int
+    ) -> Optional[list[SearchResult]]:
+        # Search for the nearest neighbor items of all the vectors in a single request and return a result per vector.
+        result = self.search(
+            collection_name=collection_name, vectors=vectors, limit=limit
+        )
+        return result.split() if result is not None else None
+
     def query(
         self, collection_name: str, filter: dict, limit: Optional[int] = None
     ) -> Optional[GetResult]:
@@ -112,30 +139,35 @@ class ChromaClient:
         collection = self.client.get_or_create_collection(
             name=collection_name, metadata={"hnsw:space": "cosine"}
         )
+        self.collections.set(collection_name, True)
 
         ids = [item["id"] for item in items]
         documents = [item["text"] for item in items]
-        embeddings = [item["vector"] for item in items]
+        embeddings = as_matrix([item["vector"] for item in items])
         metadatas = [item["metadata"] for item in items]
 
-        for batch in create_batches(
-            api=self.client,
-            documents=documents,
-            embeddings=embeddings,
-            ids=ids,
-            metadatas=metadatas,
-        ):
-            collection.add(*batch)
+        # Sliced here rather than with chromadb's create_batches, which tests
+        # the embeddings for truthiness and so fails on a matrix
+        batch_size = self.client.get_max_batch_size()
+        for start in range(0, len(ids), batch_size):
+            end = start + batch_size
+            collection.add(
+                ids=ids[start:end],
+                documents=documents[start:end],
+                embeddings=embeddings[start:end],
+                metadatas=metadatas[start:end],
+            )
 
     def upsert(self, collection_name: str, items: list[VectorItem]):
         # Update the items in the collection, if the items are not present, insert them. If the collection does not exist, it will be created.
         collection = self.client.get_or_create_collection(
             name=collection_name, metadata={"hnsw:space": "cosine"}
         )
+        self.collections.set(collection_name, True)
 
         ids = [item["id"] for item in items]
         documents = [item["text"] for item in items]
-        embeddings = [item["vector"] for item in items]
+        embeddings = as_matrix([item["vector"] for item in items])
         metadatas = [item["metadata"] for item in items]
 
         collection.upsert(
@@ -158,4 +190,5 @@ class ChromaClient:
 
     def reset(self):
         # Resets the database. This will delete all collections and item entries.
+        self.collections.clear()
         return self.client.reset()
@@ -0,0 +1,739 @@
+import hashlib
+import json
+import logging
+import math
+import os
+import shutil
+import sqlite3
+import threading
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from open_webui.apps.retrieval.vector.main import (
+    VectorItem,
+    SearchResult,
+    GetResult,
+    as_matrix,
+)
+from open_webui.apps.retrieval.vector.quantization import (
+    QUANTIZATION_DTYPES,
+    dequantize,
+    get_int8_scale,
+    normalize,
+    quantize,
+)
+from open_webui.config import (
+    LOCAL_VECTOR_DB_IVF_NPROBE,
+    LOCAL_VECTOR_DB_IVF_THRESHOLD,
+    LOCAL_VECTOR_DB_PATH,
+    VECTOR_DB_QUANTIZATION,
+)
+from open_webui.env import SRC_LOG_LEVELS
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+
+DB_FILE = "rows.db"
+
+# Rows scored at once when scanning a collection
+BLOCK_SIZE = 65536
+# Rows of a float16 or int8 block converted to float32 at once, small enough
+# for the converted rows to still be in the CPU cache when they are scored
+CONVERSION_SIZE = 1024
+# SQLite limits the number of parameters of a single statement
+SQL_BATCH_SIZE = 500
+# Collections whose views are kept loaded per worker
+MAX_LOADED_VIEWS = 256
+
+IVF_TRAINING_ITERATIONS = 10
+IVF_SAMPLES_PER_LIST = 64
+
+
+@dataclass
+class CollectionView:
+    """
+    What a worker has loaded of a collection at one version: its vectors,
+    which rows are still alive and, once trained, its IVF index.
+    """
+
+    uid: str
+    version: int
+    generation: int
+    deletes: int
+    count: int
+    vectors: Optional[np.ndarray]
+    alive: np.ndarray
+    centroids: Optional[np.ndarray] = None
+    lists: Optional[np.ndarray] = None
+    # Stored int8 components are the vector's components times `scale`
+    scale: float = 1.0
+
+
+class LocalClient:
+    """
+    Embedded vector store for single-node deployments.
+
+    Each collection is a directory holding its vectors, normalized, as a
+    row-major float32, float16 or int8 matrix (see VECTOR_DB_QUANTIZATION)
+    that is memory-mapped for searching,
+    and a SQLite sidecar with the id, text and metadata of every row. Rows are
+    only ever appended: deleting marks them dead by removing their sidecar
+    entry, and once more than half of the rows are dead the matrix is
+    rewritten without them. Large collections get an IVF index (spherical
+    k-means over the vectors) so only the lists closest to a query are scored.
+
+    Writes hold the SQLite write lock for their whole duration, which
+    serializes them across workers. Files that are rewritten get a new
+    generation number, so a reader never sees a matrix that doesn't match the
+    snapshot of the sidecar it read.
+    """
+
+    def __init__(self):
+        self.path = LOCAL_VECTOR_DB_PATH
+        self.quantization = VECTOR_DB_QUANTIZATION
+        self.ivf_threshold = LOCAL_VECTOR_DB_IVF_THRESHOLD
+        self.nprobe = LOCAL_VECTOR_DB_IVF_NPROBE
+
+        self._views: OrderedDict[str, CollectionView] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_dir(self, collection_name: str) -> str:
+        return os.path.join(
+            self.path, hashlib.sha256(collection_name.encode()).hexdigest()
+        )
+
+    @staticmethod
+    def _get_file(directory: str, name: str, generation: int) -> str:
+        return os.path.join(directory, f"{name}.{generation}")
+
+    @contextmanager
+    def _transaction(self, collection_name: str, write: bool = False):
+        # Yields a connection in a transaction on the collection's sidecar, or
+        # None when reading a collection that doesn't exist or has no rows
+        # yet. Write transactions create the collection.
+        directory = self._get_dir(collection_name)
+        db_path = os.path.join(directory, DB_FILE)
+        if not write and not os.path.exists(db_path):
+            yield None
+            return
+
+        os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(db_path, timeout=60, isolation_level=None)
+        try:
+            if write:
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.execute("BEGIN IMMEDIATE")
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS row ("
+                    "idx INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE, "
+                    "text TEXT, metadata TEXT)"
+                )
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value)"
+                )
+            else:
+                connection.execute("BEGIN")
+                try:
+                    created = connection.execute(
+                        "SELECT 1 FROM state WHERE key = 'uid'"
+                    ).fetchone()
+                except sqlite3.OperationalError:
+                    created = None
+
+                if created is None:
+                    connection.execute("ROLLBACK")
+                    yield None
+                    return
+
+            try:
+                yield connection
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _get_state(connection: sqlite3.Connection) -> dict:
+        return dict(connection.execute("SELECT key, value FROM state").fetchall())
+
+    @staticmethod
+    def _set_state(connection: sqlite3.Connection, state: dict):
+        connection.executemany(
+            "INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)",
+            state.items(),
+        )
+
+    def _load_vectors(
+        self, directory: str, state: dict, count: Optional[int] = None
+    ) -> Optional[np.ndarray]:
+        count = state["count"] if count is None else count
+        if count == 0:
+            return None
+        return np.memmap(
+            self._get_file(directory, "vectors", state["generation"]),
+            dtype=state["dtype"],
+            mode="r",
+            shape=(count, state["dim"]),
+        )
+
+    def _load_alive(
+        self, connection: sqlite3.Connection, count: int, start: int = 0
+    ) -> np.ndarray:
+        alive = np.zeros(count - start, dtype=bool)
+        rows = connection.execute(
+            "SELECT idx FROM row WHERE idx >= ?", (start,)
+        ).fetchall()
+        if rows:
+            alive[np.array(rows, dtype=np.int64)[:, 0] - start] = True
+        return alive
+
+    def _get_view(
+        self, collection_name: str, connection: sqlite3.Connection
+    ) -> CollectionView:
+        state = self._get_state(connection)
+        with self._lock:
+            view = self._views.get(collection_name)
+            if view is not None:
+                self._views.move_to_end(collection_name)
+
+        if view is not None and (view.uid, view.version) == (
+            state["uid"],
+            state["version"],
+        ):
+            return view
+
+        directory = self._get_dir(collection_name)
+        if (
+            view is not None
+            and (view.uid, view.generation, view.deletes)
+            == (state["uid"], state["generation"], state["deletes"])
+            and view.count <= state["count"]
+        ):
+            # Rows were only appended since, so only those have to be read
+            alive = np.concatenate(
+                [
+                    view.alive,
+                    self._load_alive(connection, state["count"], start=view.count),
+                ]
+            )
+        else:
+            alive = self._load_alive(connection, state["count"])
+
+        view = CollectionView(
+            uid=state["uid"],
+            version=state["version"],
+            generation=state["generation"],
+            deletes=state["deletes"],
+            count=state["count"],
+            vectors=self._load_vectors(directory, state),
+            alive=alive,
+            scale=state.get("scale", 1.0),
+        )
+        if state["ivf_rows"] and state["count"]:
+            view.centroids = np.load(
+                self._get_file(directory, "centroids", state["generation"])
+            )
+            view.lists = np.memmap(
+                self._get_file(directory, "lists", state["generation"]),
+                dtype=np.int32,
+                mode="r",
+                shape=(state["count"],),
+            )
+
+        with self._lock:
+            self._views[collection_name] = view
+            self._views.move_to_end(collection_name)
+            while len(self._views) > MAX_LOADED_VIEWS:
+                self._views.popitem(last=False)
+        return view
+
+    def _get_rows(
+        self, connection: sqlite3.Connection, indices: list[int]
+    ) -> dict[int, tuple]:
+        rows = {}
+        for i in range(0, len(indices), SQL_BATCH_SIZE):
+            batch = indices[i : i + SQL_BATCH_SIZE]
+            placeholders = ",".join("?" * len(batch))
+            for idx, id, text, metadata in connection.execute(
+                f"SELECT idx, id, text, metadata FROM row WHERE idx IN ({placeholders})",
+                batch,
+            ):
+                rows[idx] = (id, text, json.loads(metadata))
+        return rows
+
+    @staticmethod
+    def _get_filter_clause(filter: dict) -> tuple[str, list]:
+        conditions = []
+        params = []
+        for key, value in filter.items():
+            conditions.append("json_extract(metadata, ?) = ?")
+            params.extend([f'$."{key}"', value])
+        return " AND ".join(conditions) or "1", params
+
+    def _top_k(
+        self,
+        vectors: np.ndarray,
+        alive: np.ndarray,
+        queries: np.ndarray,
+        limit: int,
+        rows: Optional[np.ndarray] = None,
+        scale: float = 1.0,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        # Scores `queries` against the given rows (all of them by default)
+        # one block at a time, keeping the `limit` best of each query.
+        total = len(vectors) if rows is None else len(rows)
+        top_scores = np.empty((len(queries), 0), dtype=np.float32)
+        top_indices = np.empty((len(queries), 0), dtype=np.int64)
+
+        for start in range(0, total, BLOCK_SIZE):
+            end = min(start + BLOCK_SIZE, total)
+            if rows is None:
+                indices = np.arange(start, end)
+                block = vectors[start:end]
+            else:
+                indices = rows[start:end]
+                block = vectors[indices]
+
+            scores = self._score(queries, block)
+            if scale != 1.0:
+                scores *= 1 / scale
+            scores[:, ~alive[indices]] = -np.inf
+
+            if scores.shape[1] > limit:
+                best = np.argpartition(-scores, limit - 1, axis=1)[:, :limit]
+                scores = np.take_along_axis(scores, best, axis=1)
+                block_indices = indices[best]
+            else:
+                block_indices = np.broadcast_to(indices, scores.shape)
+
+            top_scores = np.concatenate([top_scores, scores], axis=1)
+            top_indices = np.concatenate([top_indices, block_indices], axis=1)
+            if top_scores.shape[1] > limit:
+                best = np.argpartition(-top_scores, limit - 1, axis=1)[:, :limit]
+                top_scores = np.take_along_axis(top_scores, best, axis=1)
+                top_indices = np.take_along_axis(top_indices, best, axis=1)
+
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        return (
+            np.take_along_axis(top_scores, order, axis=1),
+            np.take_along_axis(top_indices, order, axis=1),
+        )
+
+    @staticmethod
+    def _score(queries: np.ndarray, block: np.ndarray) -> np.ndarray:
+        if block.dtype == np.float32:
+            return queries @ block.T
+
+        scores = np.empty((len(queries), len(block)), dtype=np.float32)
+        buffer = np.empty(
+            (min(len(block), CONVERSION_SIZE), block.shape[1]), np.float32
+        )
+        for start in range(0, len(block), CONVERSION_SIZE):
+            rows = block[start : start + CONVERSION_SIZE]
+            np.copyto(buffer[: len(rows)], rows, casting="unsafe")
+            scores[:, start : start + len(rows)] = queries @ buffer[: len(rows)].T
+        return scores
+
+    def _search_view(
+        self, view: CollectionView, queries: np.ndarray, limit: int
+    ) -> tuple[np.ndarray, np.ndarray]:
+        if view.centroids is None:
+            return self._top_k(
+                view.vectors, view.alive, queries, limit, scale=view.scale
+            )
+
+        # Only score the rows in the lists whose centroids are closest to the
+        # query, which differ per query.
+        nprobe = min(self.nprobe, len(view.centroids))
+        results = []
+        for query in queries:
+            similarity = view.centroids @ query
+            probes = np.argpartition(-similarity, nprobe - 1)[:nprobe]
+            rows = np.flatnonzero(np.isin(view.lists, probes) & view.alive)
+            results.append(
+                self._top_k(
+                    view.vectors,
+                    view.alive,
+                    query[None],
+                    limit,
+                    rows=rows,
+                    scale=view.scale,
+                )
+            )
+
+        width = max(scores.shape[1] for scores, _ in results)
+        scores = np.full((len(queries), width), -np.inf, dtype=np.float32)
+        indices = np.zeros((len(queries), width), dtype=np.int64)
+        for i, (query_scores, query_indices) in enumerate(results):
+            scores[i, : query_scores.shape[1]] = query_scores[0]
+            indices[i, : query_indices.shape[1]] = query_indices[0]
+        return scores, indices
+
+    def has_collection(self, collection_name: str) -> bool:
+        # Check if the collection exists based on the collection name.
+        return os.path.exists(os.path.join(self._get_dir(collection_name), DB_FILE))
+
+    def delete_collection(self, collection_name: str):
+        # Delete the collection based on the collection name.
+        with self._lock:
+            self._views.pop(collection_name, None)
+        shutil.rmtree(self._get_dir(collection_name), ignore_errors=True)
+
+    def search(
+        self, collection_name: str, vectors: list[list[float | int]], limit: int
+    ) -> Optional[SearchResult]:
+        # Search for the nearest neighbor items based on the vectors and return 'limit' number of results.
+        queries = normalize(as_matrix(vectors))
+
+        for attempt in range(2):
+            try:
+                with self._transaction(collection_name) as connection:
+                    if connection is None:
+                        return None
+
+                    view = self._get_view(collection_name, connection)
+                    if view.vectors is None:
+                        scores = np.empty((len(queries), 0), dtype=np.float32)
+                        indices = np.empty((len(queries), 0), dtype=np.int64)
+                    else:
+                        scores, indices = self._search_view(
+                            view, queries, limit if limit else view.count
+                        )
+
+                    found = np.isfinite(scores)
+                    rows = self._get_rows(
+                        connection, np.unique(indices[found]).tolist()
+                    )
+                    break
+            except FileNotFoundError:
+                # The files were rewritten by another worker after the
+                # snapshot was taken, read the new ones
+                if attempt:
+                    raise
+
+        ids = []
+        distances = []
+        documents = []
+        metadatas = []
+        for query_scores, query_indices, query_found in zip(scores, indices, found):
+            query_rows = [rows[idx] for idx in query_indices[query_found].tolist()]
+            ids.append([row[0] for row in query_rows])
+            documents.append([row[1] for row in query_rows])
+            metadatas.append([row[2] for row in query_rows])
+            # Cosine distance, as reported by Chroma
+            distances.append((1 - query_scores[query_found]).tolist())
+
+        return SearchResult(
+            **{
+                "ids": ids,
+                "distances": distances,
+                "documents": documents,
+                "metadatas": metadatas,
+            }
+        )
+
+    def search_many(
+        self, collection_name: str, vectors: list[list[float | int]], limit: int
+    ) -> Optional[list[SearchResult]]:
+        # Search for the nearest neighbor items of all the vectors in a single request and return a result per vector.
+        result = self.search(
+            collection_name=collection_name, vectors=vectors, limit=limit
+        )
+        return result.split() if result is not None else None
+
+    def query(
+        self, collection_name: str, filter: dict, limit: Optional[int] = None
+    ) -> Optional[GetResult]:
+        # Query the items from the collection based on the filter.
+        clause, params = self._get_filter_clause(filter)
+        with self._transaction(collection_name) as connection:
+            if connection is None:
+                return None
+
+            rows = connection.execute(
+                f"SELECT id, text, metadata FROM row WHERE {clause} ORDER BY idx LIMIT ?",
+                [*params, limit if limit is not None else -1],
+            ).fetchall()
+
+        return GetResult(
+            **{
+                "ids": [[row[0] for row in rows]],
+                "documents": [[row[1] for row in rows]],
+                "metadatas": [[json.loads(row[2]) for row in rows]],
+            }
+        )
+
+    def get(self, collection_name: str) -> Optional[GetResult]:
+        # Get all the items in the collection.
+        return self.query(collection_name=collection_name, filter={})
+
+    def insert(self, collection_name: str, items: list[VectorItem]):
+        # Insert the items into the collection, if the collection does not exist, it will be created.
+        if not items:
+            return
+
+        vectors = normalize(as_matrix([item["vector"] for item in items]))
+        directory = self._get_dir(collection_name)
+
+        with self._transaction(collection_name, write=True) as connection:
+            state = self._get_state(connection)
+            if not state:
+                state = {
+                    "uid": uuid.uuid4().hex,
+                    "dim": vectors.shape[1],
+                    "dtype": np.dtype(QUANTIZATION_DTYPES[self.quantization]).name,
+                    "scale": (
+                        get_int8_scale(vectors) if self.quantization == "int8" else 1.0
+                    ),
+                    "count": 0,
+                    "generation": 0,
+                    "version": 0,
+                    "deletes": 0,
+                    "ivf_rows": 0,
+                }
+            elif state["dim"] != vectors.shape[1]:
+                raise ValueError(
+                    f"Expected vectors of dimension {state['dim']}, got {vectors.shape[1]}"
+                )
+
+            # Items with an existing id replace it
+            ids = [item["id"] for item in items]
+            if self._delete_rows(connection, ids=ids):
+                state["deletes"] += 1
+
+            count = state["count"]
+            self._append(
+                self._get_file(directory, "vectors", state["generation"]),
+                count,
+                self._encode(vectors, state),
+            )
+            if state["ivf_rows"]:
+                centroids = np.load(
+                    self._get_file(directory, "centroids", state["generation"])
+                )
+                self._append(
+                    self._get_file(directory, "lists", state["generation"]),
+                    count,
+                    np.argmax(vectors @ centroids.T, axis=1).astype(np.int32),
+                )
+
+            connection.executemany(
+                "INSERT OR REPLACE INTO row (idx, id, text, metadata) VALUES (?, ?, ?, ?)",
+                [
+                    (
+                        count + i,
+                        item["id"],
+                        item["text"],
+                        json.dumps(item["metadata"], default=str),
+                    )
+                    for i, item in enumerate(items)
+                ],
+            )
+            state["count"] = count + len(items)
+            state["version"] += 1
+
+            alive_count = connection.execute("SELECT COUNT(*) FROM row").fetchone()[0]
+            if (
+                self.ivf_threshold > 0
+                and alive_count >= self.ivf_threshold
+                and alive_count >= 4 * state["ivf_rows"]
+            ):
+                self._train_ivf(connection, directory, state, alive_count)
+
+            self._set_state(connection, state)
+
+        self._remove_stale_files(directory, state["generation"])
+
+    def upsert(self, collection_name: str, items: list[VectorItem]):
+        # Update the items in the collection, if the items are not present, insert them. If the collection does not exist, it will be created.
+        return self.insert(collection_name=collection_name, items=items)
+
+    def delete(
+        self,
+        collection_name: str,
+        ids: Optional[list[str]] = None,
+        filter: Optional[dict] = None,
+    ):
+        # Delete the items from the collection based on the ids.
+        if not self.has_collection(collection_name):
+            return
+
+        directory = self._get_dir(collection_name)
+        with self._transaction(collection_name, write=True) as connection:
+            state = self._get_state(connection)
+            if not state or not self._delete_rows(connection, ids=ids, filter=filter):
+                return
+
+            state["version"] += 1
+            state["deletes"] += 1
+
+            alive_count = connection.execute("SELECT COUNT(*) FROM row").fetchone()[0]
+            if state["count"] - alive_count > alive_count:
+                self._compact(connection, directory, state)
+
+            self._set_state(connection, state)
+
+        self._remove_stale_files(directory, state["generation"])
+
+    def reset(self):
+        # Resets the database. This will delete all collections and item entries.
+        with self._lock:
+            self._views.clear()
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def _delete_rows(
+        self,
+        connection: sqlite3.Connection,
+        ids: Optional[list[str]] = None,
+        filter: Optional[dict] = None,
+    ) -> int:
+        deleted = 0
+        if ids:
+            for i in range(0, len(ids), SQL_BATCH_SIZE):
+                batch = ids[i : i + SQL_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                deleted += connection.execute(
+                    f"DELETE FROM row WHERE id IN ({placeholders})", batch
+                ).rowcount
+        elif filter:
+            clause, params = self._get_filter_clause(filter)
+            deleted += connection.execute(
+                f"DELETE FROM row WHERE {clause}", params
+            ).rowcount
+        return deleted
+
+    @staticmethod
+    def _encode(vectors: np.ndarray, state: dict) -> np.ndarray:
+        # The type of a collection is kept when the quantization is changed
+        if state["dtype"] == "int8":
+            return quantize(vectors, "int8", state["scale"])
+        return vectors.astype(state["dtype"])
+
+    @staticmethod
+    def _append(path: str, start: int, values: np.ndarray):
+        # Rows past `start` were left behind by a failed write, overwrite them
+        with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+            f.seek(start * values[0].nbytes)
+            f.write(values.tobytes())
+            f.truncate()
+
+    def _train_ivf(
+        self,
+        connection: sqlite3.Connection,
+        directory: str,
+        state: dict,
+        alive_count: int,
+    ):
+        log.info(f"Training IVF index of {directory} with {alive_count} vectors")
+        vectors = self._load_vectors(directory, state)
+        alive = self._load_alive(connection, state["count"])
+        nlist = max(int(math.sqrt(alive_count)), 1)
+
+        rng = np.random.default_rng()
+        alive_rows = np.flatnonzero(alive)
+        sample_rows = np.sort(
+            rng.choice(
+                alive_rows,
+                min(len(alive_rows), nlist * IVF_SAMPLES_PER_LIST),
+                replace=False,
+            )
+        )
+        sample = dequantize(vectors[sample_rows], state.get("scale"))
+
+        # Spherical k-means, the vectors being normalized
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)]
+        for _ in range(IVF_TRAINING_ITERATIONS):
+            assignment = self._assign(sample, centroids)
+            order = np.argsort(assignment, kind="stable")
+            lists, starts = np.unique(assignment[order], return_index=True)
+            centroids[lists] = np.add.reduceat(sample[order], starts, axis=0)
+            centroids = normalize(centroids)
+
+        generation = state["generation"] + 1
+        # The matrix doesn't change, link it under the new generation
+        source = self._get_file(directory, "vectors", state["generation"])
+        target = self._get_file(directory, "vectors", generation)
+        try:
+            os.link(source, target)
+        except OSError:
+            shutil.copyfile(source, target)
+
+        with open(self._get_file(directory, "centroids", generation), "wb") as f:
+            np.save(f, centroids)
+        with open(self._get_file(directory, "lists", generation), "wb") as f:
+            for start in range(0, state["count"], BLOCK_SIZE):
+                block = dequantize(
+                    vectors[start : start + BLOCK_SIZE], state.get("scale")
+                )
+                f.write(self._assign(block, centroids).astype(np.int32).tobytes())
+
+        state["generation"] = generation
+        state["ivf_rows"] = alive_count
+
+    @staticmethod
+    def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        assignment = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), BLOCK_SIZE // 8):
+            end = start + BLOCK_SIZE // 8
+            assignment[start:end] = np.argmax(vectors[start:end] @ centroids.T, axis=1)
+        return assignment
+
+    def _compact(self, connection: sqlite3.Connection, directory: str, state: dict):
+        # Rewrites the matrix, and the IVF lists, without the dead rows
+        log.info(f"Compacting {directory}")
+        alive_rows = np.array(
+            connection.execute("SELECT idx FROM row ORDER BY idx").fetchall(),
+            dtype=np.int64,
+        ).reshape(-1)
+        generation = state["generation"] + 1
+
+        names = ["vectors"]
+        if state["ivf_rows"]:
+            names.append("lists")
+            shutil.copyfile(
+                self._get_file(directory, "centroids", state["generation"]),
+                self._get_file(directory, "centroids", generation),
+            )
+
+        for name in names:
+            if name == "vectors":
+                source = self._load_vectors(directory, state)
+            else:
+                source = np.memmap(
+                    self._get_file(directory, name, state["generation"]),
+                    dtype=np.int32,
+                    mode="r",
+                    shape=(state["count"],),
+                )
+
+            with open(self._get_file(directory, name, generation), "wb") as f:
+                for start in range(0, len(alive_rows), BLOCK_SIZE):
+                    f.write(source[alive_rows[start : start + BLOCK_SIZE]].tobytes())
+
+        # Rows keep their order, so no index is taken before it is freed
+        connection.executemany(
+            "UPDATE row SET idx = ? WHERE idx = ?",
+            ((new, old) for new, old in enumerate(alive_rows.tolist())),
+        )
+        state["count"] = len(alive_rows)
+        state["generation"] = generation
+
+    def _remove_stale_files(self, directory: str, generation: int):
+        # Workers that still have older generations mapped keep reading them
+        # until they notice the new version
+        for name in os.listdir(directory):
+            prefix, _, suffix = name.rpartition(".")
+            if prefix in ("vectors", "lists", "centroids") and suffix.isdigit():
+                if int(suffix) < generation:
+                    try:
+                        os.remove(os.path.join(directory, name))
+                    except OSError:
+                        pass
@@ -1,19 +1,71 @@
 from pymilvus import MilvusClient as Client
 from pymilvus import FieldSchema, DataType
 import json
+import logging
+import numpy as np
 
 from typing import Optional
 
-from open_webui.apps.retrieval.vector.main import VectorItem, SearchResult, GetResult
+from open_webui.apps.retrieval.vector.main import (
+    VectorItem,
+    SearchResult,
+    GetResult,
+    as_lists,
+)
+from open_webui.utils.cache import TTLCache
 from open_webui.config import (
+    MILVUS_HNSW_EF,
+    MILVUS_HNSW_EF_CONSTRUCTION,
+    MILVUS_HNSW_M,
+    MILVUS_INDEX_TYPE,
+    MILVUS_INSERT_BATCH_SIZE,
+    MILVUS_IVF_NLIST,
+    MILVUS_IVF_NPROBE,
+    MILVUS_NUM_PARTITIONS,
+    MILVUS_PARTITION_KEY_MODE,
     MILVUS_URI,
+    VECTOR_DB_COLLECTION_CACHE_TTL,
+    VECTOR_DB_QUANTIZATION,
 )
+from open_webui.env import SRC_LOG_LEVELS
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
 
 
 class MilvusClient:
+    """
+    Stores every collection in a Milvus collection of its own or, with
+    MILVUS_PARTITION_KEY_MODE, all collections with vectors of the same
+    dimension in one shared Milvus collection. There the collection name is
+    a partition key (except with Milvus Lite, which has none), which Milvus
+    hashes onto a fixed number of partitions, so tens of thousands of file
+    collections don't each cost a Milvus collection. Rows of a shared
+    collection have a primary key made of their collection name and id, and
+    every expression is restricted to the collection's rows.
+    """
+
     def __init__(self):
         self.collection_prefix = "open_webui"
         self.client = Client(uri=MILVUS_URI)
+        self.partition_key_mode = MILVUS_PARTITION_KEY_MODE
+
+        # Milvus Lite, used when the URI is a local file, only supports some
+        # index types and no partition keys
+        self.lite = MILVUS_URI.endswith(".db")
+        self.index_type = MILVUS_INDEX_TYPE
+        if self.lite and self.index_type not in [
+            "FLAT",
+            "IVF_FLAT",
+            "AUTOINDEX",
+        ]:
+            self.index_type = "FLAT"
+
+        # Type of the vector field of each Milvus collection, which stays the
+        # same when VECTOR_DB_QUANTIZATION is changed
+        self.vector_types = {}
+        # Names of collections known to have rows in a shared collection
+        self.collections = TTLCache(ttl=VECTOR_DB_COLLECTION_CACHE_TTL)
 
     def _result_to_get_result(self, result) -> GetResult:
         ids = []
@@ -54,7 +106,8 @@ class MilvusClient:
             _metadatas = []
 
             for item in match:
-                _ids.append(item.get("id"))
+                # Rows of shared collections have their id in a field
+                _ids.append(item.get("entity", {}).get("id", item.get("id")))
                 _distances.append(item.get("distance"))
                 _documents.append(item.get("entity", {}).get("data", {}).get("text"))
                 _metadatas.append(item.get("entity", {}).get("metadata"))
@@ -73,20 +126,97 @@ class MilvusClient:
             }
         )
 
-    def _create_collection(self, collection_name: str, dimension: int):
+    def _get_shared_name(self, dimension: int) -> str:
+        return f"{self.collection_prefix}__shared_{dimension}"
+
+    def _get_milvus_names(self, collection_name: str) -> list[str]:
+        # Milvus collections the rows of a collection may be in
+        if not self.partition_key_mode:
+            return [f"{self.collection_prefix}_{collection_name}"]
+        return [
+            name
+            for name in self.client.list_collections()
+            if name.startswith(f"{self.collection_prefix}__shared_")
+        ]
+
+    def _get_filter_string(
+        self,
+        collection_name: str,
+        filter: Optional[dict] = None,
+        ids: Optional[list[str]] = None,
+    ) -> str:
+        conditions = []
+        if self.partition_key_mode:
+            conditions.append(f"collection == {json.dumps(collection_name)}")
+        if ids:
+            conditions.append(f"id in {json.dumps(ids)}")
+        for key, value in (filter or {}).items():
+            conditions.append(f'metadata["{key}"] == {json.dumps(value)}')
+        return " && ".join(conditions)
+
+    def _get_index_params(self):
+        if self.index_type == "HNSW":
+            params = {"M": MILVUS_HNSW_M, "efConstruction": MILVUS_HNSW_EF_CONSTRUCTION}
+        elif self.index_type in ["IVF_FLAT", "IVF_SQ8"]:
+            params = {"nlist": MILVUS_IVF_NLIST}
+        else:
+            params = {}
+
+        index_params = self.client.prepare_index_params()
+        index_params.add_index(
+            field_name="vector",
+            index_type=self.index_type,
+            metric_type="COSINE",
+            params=params,
+        )
+        return index_params
+
+    def _get_search_params(self, limit: int) -> dict:
+        # Parameters of other index types are ignored by Milvus, so this also
+        # works for collections created with another index type
+        if self.index_type == "HNSW":
+            params = {"ef": max(MILVUS_HNSW_EF, limit or 0)}
+        elif self.index_type in ["IVF_FLAT", "IVF_SQ8"]:
+            params = {"nprobe": MILVUS_IVF_NPROBE}
+        else:
+            params = {}
+        return {"metric_type": "COSINE", "params": params}
+
+    def _create_collection(self, milvus_name: str, dimension: int):
         schema = self.client.create_schema(
             auto_id=False,
             enable_dynamic_field=True,
         )
-        schema.add_field(
-            field_name="id",
-            datatype=DataType.VARCHAR,
-            is_primary=True,
-            max_length=65535,
-        )
+        if self.partition_key_mode:
+            schema.add_field(
+                field_name="pk",
+                datatype=DataType.VARCHAR,
+                is_primary=True,
+                max_length=65535,
+            )
+            schema.add_field(
+                field_name="id", datatype=DataType.VARCHAR, max_length=65535
+            )
+            schema.add_field(
+                field_name="collection",
+                datatype=DataType.VARCHAR,
+                max_length=65535,
+                is_partition_key=not self.lite,
+            )
+        else:
+            schema.add_field(
+                field_name="id",
+                datatype=DataType.VARCHAR,
+                is_primary=True,
+                max_length=65535,
+            )
         schema.add_field(
             field_name="vector",
-            datatype=DataType.FLOAT_VECTOR,
+            datatype=(
+                DataType.FLOAT16_VECTOR
+                if VECTOR_DB_QUANTIZATION == "float16"
+                else DataType.FLOAT_VECTOR
+            ),
             dim=dimension,
             description="vector",
         )
@@ -95,60 +225,113 @@ class MilvusClient:
             field_name="metadata", datatype=DataType.JSON, description="metadata"
         )
 
-        index_params = self.client.prepare_index_params()
-        index_params.add_index(
-            field_name="vector",
-            index_type="HNSW",
-            metric_type="COSINE",
-            params={"M": 16, "efConstruction": 100},
-        )
+        kwargs = {}
+        if self.partition_key_mode and not self.lite:
+            kwargs["num_partitions"] = MILVUS_NUM_PARTITIONS
 
         self.client.create_collection(
-            collection_name=f"{self.collection_prefix}_{collection_name}",
+            collection_name=milvus_name,
             schema=schema,
-            index_params=index_params,
+            index_params=self._get_index_params(),
+            **kwargs,
         )
 
+    def _get_vector_type(self, milvus_name: str) -> DataType:
+        if milvus_name not in self.vector_types:
+            description = self.client.describe_collection(collection_name=milvus_name)
+            self.vector_types[milvus_name] = next(
+                field["type"]
+                for field in description["fields"]
+                if field["name"] == "vector"
+            )
+        return self.vector_types[milvus_name]
+
+    def _encode_vectors(
+        self, milvus_name: str, vectors: list[list[float | int]]
+    ) -> list:
+        # Float16 vectors are passed to Milvus as float16 arrays, float32
+        # vectors as lists
+        if self._get_vector_type(milvus_name) == DataType.FLOAT16_VECTOR:
+            return list(np.asarray(vectors, dtype=np.float16))
+        return as_lists(vectors)
+
     def has_collection(self, collection_name: str) -> bool:
         # Check if the collection exists based on the collection name.
         collection_name = collection_name.replace("-", "_")
-        return self.client.has_collection(
-            collection_name=f"{self.collection_prefix}_{collection_name}"
+        if not self.partition_key_mode:
+            return self.client.has_collection(
+                collection_name=f"{self.collection_prefix}_{collection_name}"
+            )
+
+        if self.collections.get(collection_name):
+            return True
+
+        exists = any(
+            self.client.query(
+                collection_name=milvus_name,
+                filter=self._get_filter_string(collection_name),
+                output_fields=["pk"],
+                limit=1,
+            )
+            for milvus_name in self._get_milvus_names(collection_name)
         )
+        if exists:
+            self.collections.set(collection_name, True)
+        return exists
 
     def delete_collection(self, collection_name: str):
         # Delete the collection based on the collection name.
         collection_name = collection_name.replace("-", "_")
-        return self.client.drop_collection(
-            collection_name=f"{self.collection_prefix}_{collection_name}"
-        )
+        if not self.partition_key_mode:
+            self.vector_types.pop(f"{self.collection_prefix}_{collection_name}", None)
+            return self.client.drop_collection(
+                collection_name=f"{self.collection_prefix}_{collection_name}"
+            )
+
+        self.collections.delete(collection_name)
+        for milvus_name in self._get_milvus_names(collection_name):
+            self.client.delete(
+                collection_name=milvus_name,
+                filter=self._get_filter_string(collection_name),
+            )
 
     def search(
         self, collection_name: str, vectors: list[list[float | int]], limit: int
     ) -> Optional[SearchResult]:
         # Search for the nearest neighbor items based on the vectors and return 'limit' number of results.
         collection_name = collection_name.replace("-", "_")
+        if self.partition_key_mode:
+            milvus_name = self._get_shared_name(len(vectors[0]))
+        else:
+            milvus_name = f"{self.collection_prefix}_{collection_name}"
+
         result = self.client.search(
-            collection_name=f"{self.collection_prefix}_{collection_name}",
-            data=vectors,
+            collection_name=milvus_name,
+            data=self._encode_vectors(milvus_name, vectors),
+            filter=self._get_filter_string(collection_name),
             limit=limit,
-            output_fields=["data", "metadata"],
+            output_fields=["id", "data", "metadata"],
+            search_params=self._get_search_params(limit),
         )
 
         return self._result_to_search_result(result)
 
+    def search_many(
+        self, collection_name: str, vectors: list[list[float | int]], limit: int
+    ) -> Optional[list[SearchResult]]:
+        # Search for the nearest neighbor items of all the vectors in a single request and return a result per vector.
+        result = self.search(
+            collection_name=collection_name, vectors=vectors, limit=limit
+        )
+        return result.split() if result is not None else None
+
     def query(self, collection_name: str, filter: dict, limit: Optional[int] = None):
         # Construct the filter string for querying
         collection_name = collection_name.replace("-", "_")
         if not self.has_collection(collection_name):
             return None
 
-        filter_string = " && ".join(
-            [
-                f'metadata["{key}"] == {json.dumps(value)}'
-                for key, value in filter.items()
-            ]
-        )
+        filter_string = self._get_filter_string(collection_name, filter)
 
         max_limit = 16383  # The maximum number of records per request
         all_results = []
@@ -161,43 +344,47 @@ class MilvusClient:
         remaining = limit
 
         try:
-            # Loop until there are no more items to fetch or the desired limit is reached
-            while remaining > 0:
-                print("remaining", remaining)
-                current_fetch = min(
-                    max_limit, remaining
-                )  # Determine how many items to fetch in this iteration
-
-                results = self.client.query(
-                    collection_name=f"{self.collection_prefix}_{collection_name}",
-                    filter=filter_string,
-                    output_fields=["*"],
-                    limit=current_fetch,
-                    offset=offset,
-                )
-
-                if not results:
-                    break
-
-                all_results.extend(results)
-                results_count = len(results)
-                remaining -= (
-                    results_count  # Decrease remaining by the number of items fetched
-                )
-                offset += results_count
-
-                # Break the loop if the results returned are less than the requested fetch count
-                if results_count < current_fetch:
-                    break
-
-            print(all_results)
+            for milvus_name in self._get_milvus_names(collection_name):
+                offset = 0
+
+                # Loop until there are no more items to fetch or the desired limit is reached
+                while remaining > 0:
+                    log.debug(f"query {milvus_name}: remaining {remaining}")
+                    current_fetch = min(
+                        max_limit, remaining
+                    )  # Determine how many items to fetch in this iteration
+
+                    results = self.client.query(
+                        collection_name=milvus_name,
+                        filter=filter_string,
+                        output_fields=["id", "data", "metadata"],
+                        limit=current_fetch,
+                        offset=offset,
+                    )
+
+                    if not results:
+                        break
+
+                    all_results.extend(results)
+                    results_count = len(results)
+                    remaining -= results_count  # Decrease remaining by the number of items fetched
+                    offset += results_count
+
+                    # Break the loop if the results returned are less than the requested fetch count
+                    if results_count < current_fetch:
+                        break
+
+            log.debug(f"query {collection_name}: {len(all_results)} results")
             return self._result_to_get_result([all_results])
-        except Exception as e:
-            print(e)
+        except Exception:
+            log.exception(f"Error querying collection {collection_name}")
             return None
 
     def get(self, collection_name: str) -> Optional[GetResult]:
         # Get all the items in the collection.
+        if self.partition_key_mode:
+            return self.query(collection_name=collection_name, filter={})
+
         collection_name = collection_name.replace("-", "_")
         result = self.client.query(
             collection_name=f"{self.collection_prefix}_{collection_name}",
@@ -205,51 +392,51 @@ class MilvusClient:
         )
         return self._result_to_get_result([result])
 
-    def insert(self, collection_name: str, items: list[VectorItem]):
-        # Insert the items into the collection, if the collection does not exist, it will be created.
+    def _write(self, collection_name: str, items: list[VectorItem], upsert: bool):
         collection_name = collection_name.replace("-", "_")
-        if not self.client.has_collection(
-            collection_name=f"{self.collection_prefix}_{collection_name}"
-        ):
-            self._create_collection(
-                collection_name=collection_name, dimension=len(items[0]["vector"])
+        if not items:
+            return
+
+        dimension = len(items[0]["vector"])
+        if self.partition_key_mode:
+            milvus_name = self._get_shared_name(dimension)
+        else:
+            milvus_name = f"{self.collection_prefix}_{collection_name}"
+        if not self.client.has_collection(collection_name=milvus_name):
+            self._create_collection(milvus_name=milvus_name, dimension=dimension)
+
+        vectors = self._encode_vectors(milvus_name, [item["vector"] for item in items])
+        rows = []
+        for item, vector in zip(items, vectors):
+            row = {
+                "id": item["id"],
+                "vector": vector,
+                "data": {"text": item["text"]},
+                "metadata": item["metadata"],
+            }
+            if self.partition_key_mode:
+                row["pk"] = f"{collection_name}/{item['id']}"
+                row["collection"] = collection_name
+            rows.append(row)
+
+        # Large uploads are sent in several requests
+        write = self.client.upsert if upsert else self.client.insert
+        for i in range(0, len(rows), MILVUS_INSERT_BATCH_SIZE):
+            write(
+                collection_name=milvus_name,
+                data=rows[i : i + MILVUS_INSERT_BATCH_SIZE],
             )
 
-        return self.client.insert(
-            collection_name=f"{self.collection_prefix}_{collection_name}",
-            data=[
-                {
-                    "id": item["id"],
-                    "vector": item["vector"],
-                    "data": {"text": item["text"]},
-                    "metadata": item["metadata"],
-                }
-                for item in items
-            ],
-        )
+        if self.partition_key_mode:
+            self.collections.set(collection_name, True)
+
+    def insert(self, collection_name: str, items: list[VectorItem]):
+        # Insert the items into the collection, if the collection does not exist, it will be created.
+        return self._write(collection_name=collection_name, items=items, upsert=False)
 
     def upsert(self, collection_name: str, items: list[VectorItem]):
         # Update the items in the collection, if the items are not present, insert them. If the collection does not exist, it will be created.
-        collection_name = collection_name.replace("-", "_")
-        if not self.client.has_collection(
-            collection_name=f"{self.collection_prefix}_{collection_name}"
-        ):
-            self._create_collection(
-                collection_name=collection_name, dimension=len(items[0]["vector"])
-            )
-
-        return self.client.upsert(
-            collection_name=f"{self.collection_prefix}_{collection_name}",
-            data=[
-                {
-                    "id": item["id"],
-                    "vector": item["vector"],
-                    "data": {"text": item["text"]},
-                    "metadata": item["metadata"],
-                }
-                for item in items
-            ],
-        )
+        return self._write(collection_name=collection_name, items=items, upsert=True)
 
     def delete(
         self,
@@ -259,6 +446,16 @@ class MilvusClient:
     ):
         # Delete the items from the collection based on the ids.
         collection_name = collection_name.replace("-", "_")
+        if self.partition_key_mode:
+            if not ids and not filter:
+                return
+            for milvus_name in self._get_milvus_names(collection_name):
+                self.client.delete(
+                    collection_name=milvus_name,
+                    filter=self._get_filter_string(collection_name, filter, ids),
+                )
+            return
+
         if ids:
             return self.client.delete(
                 collection_name=f"{self.collection_prefix}_{collection_name}",
@@ -280,6 +477,8 @@ class MilvusClient:
 
     def reset(self):
         # Resets the database. This will delete all collections and item entries.
+        self.vector_types.clear()
+        self.collections.clear()
         collection_names = self.client.list_collections()
         for collection_name in collection_names:
             if collection_name.startswith(self.collection_prefix):
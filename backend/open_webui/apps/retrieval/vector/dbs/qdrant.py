@@ -4,8 +4,18 @@ from qdrant_client import QdrantClient as Qclient
 from qdrant_client.http.models import PointStruct
 from qdrant_client.models import models
 
-from open_webui.apps.retrieval.vector.main import VectorItem, SearchResult, GetResult
-from open_webui.config import QDRANT_URI
+from open_webui.apps.retrieval.vector.main import (
+    VectorItem,
+    SearchResult,
+    GetResult,
+    as_lists,
+)
+from open_webui.utils.cache import TTLCache
+from open_webui.config import (
+    QDRANT_URI,
+    VECTOR_DB_COLLECTION_CACHE_TTL,
+    VECTOR_DB_QUANTIZATION,
+)
 
 NO_LIMIT = 999999999
 
@@ -16,6 +26,9 @@ class QdrantClient:
         self.QDRANT_URI = QDRANT_URI
         self.client = Qclient(url=self.QDRANT_URI) if self.QDRANT_URI else None
 
+        # Names of collections known to exist
+        self.collections = TTLCache(ttl=VECTOR_DB_COLLECTION_CACHE_TTL)
+
     def _result_to_get_result(self, points) -> GetResult:
         ids = []
         documents = []
@@ -37,13 +50,37 @@ class QdrantClient:
 
     def _create_collection(self, collection_name: str, dimension: int):
         collection_name_with_prefix = f"{self.collection_prefix}_{collection_name}"
+        quantization_config = None
+        if VECTOR_DB_QUANTIZATION == "float16":
+            vectors_config = models.VectorParams(
+                size=dimension,
+                distance=models.Distance.COSINE,
+                datatype=models.Datatype.FLOAT16,
+            )
+        elif VECTOR_DB_QUANTIZATION == "int8":
+            # Searches go through the int8 vectors kept in memory, the full
+            # vectors stay on disk to rescore the best matches
+            vectors_config = models.VectorParams(
+                size=dimension, distance=models.Distance.COSINE, on_disk=True
+            )
+            quantization_config = models.ScalarQuantization(
+                scalar=models.ScalarQuantizationConfig(
+                    type=models.ScalarType.INT8, always_ram=True
+                )
+            )
+        else:
+            vectors_config = models.VectorParams(
+                size=dimension, distance=models.Distance.COSINE
+            )
+
         self.client.create_collection(
             collection_name=collection_name_with_prefix,
-            vectors_config=models.VectorParams(
-                size=dimension, distance=models.Distance.COSINE
-            ),
+            vectors_config=vectors_config,
+            quantization_config=quantization_config,
         )
 
+        self.collections.set(collection_name, True)
+
         print(f"collection {collection_name_with_prefix} successfully created!")
 
     def _create_collection_if_not_exists(self, collection_name, dimension):
@@ -53,21 +90,29 @@ class QdrantClient:
             )
 
     def _create_points(self, items: list[VectorItem]):
+        vectors = as_lists([item["vector"] for item in items])
         return [
             PointStruct(
                 id=item["id"],
-                vector=item["vector"],
+                vector=vector,
                 payload={"text": item["text"], "metadata": item["metadata"]},
             )
-            for item in items
+            for item, vector in zip(items, vectors)
         ]
 
     def has_collection(self, collection_name: str) -> bool:
-        return self.client.collection_exists(
+        if self.collections.get(collection_name):
+            return True
+
+        exists = self.client.collection_exists(
             f"{self.collection_prefix}_{collection_name}"
         )
+        if exists:
+            self.collections.set(collection_name, True)
+        return exists
 
     def delete_collection(self, collection_name: str):
+        self.collections.delete(collection_name)
         return self.client.delete_collection(
             collection_name=f"{self.collection_prefix}_{collection_name}"
         )
@@ -79,18 +124,40 @@ class QdrantClient:
         if limit is None:
             limit = NO_LIMIT  # otherwise qdrant would set limit to 10!
 
-        query_response = self.client.query_points(
+        query_responses = self.client.query_batch_points(
             collection_name=f"{self.collection_prefix}_{collection_name}",
-            query=vectors[0],
-            limit=limit,
+            requests=[
+                models.QueryRequest(query=vector, limit=limit, with_payload=True)
+                for vector in vectors
+            ],
         )
-        get_result = self._result_to_get_result(query_response.points)
+
+        ids = []
+        distances = []
+        documents = []
+        metadatas = []
+        for query_response in query_responses:
+            get_result = self._result_to_get_result(query_response.points)
+            ids.extend(get_result.ids)
+            documents.extend(get_result.documents)
+            metadatas.extend(get_result.metadatas)
+            distances.append([point.score for point in query_response.points])
+
         return SearchResult(
-            ids=get_result.ids,
-            documents=get_result.documents,
-            metadatas=get_result.metadatas,
-            distances=[[point.score for point in query_response.points]],
+            ids=ids,
+            documents=documents,
+            metadatas=metadatas,
+            distances=distances,
+        )
+
+    def search_many(
+        self, collection_name: str, vectors: list[list[float | int]], limit: int
+    ) -> Optional[list[SearchResult]]:
+        # Search for the nearest neighbor items of all the vectors in a single request and return a result per vector.
+        result = self.search(
+            collection_name=collection_name, vectors=vectors, limit=limit
         )
+        return result.split() if result is not None else None
 
     def query(self, collection_name: str, filter: dict, limit: Optional[int] = None):
         # Construct the filter string for querying
@@ -173,6 +240,7 @@ class QdrantClient:
 
     def reset(self):
         # Resets the database. This will delete all collections and item entries.
+        self.collections.clear()
         collection_names = self.client.get_collections().collections
         for collection_name in collection_names:
             if collection_name.name.startswith(self.collection_prefix):
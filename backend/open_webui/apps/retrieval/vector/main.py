@@ -1,13 +1,32 @@
-from pydantic import BaseModel
-from typing import Optional, List, Any
+import numpy as np
+from pydantic import BaseModel, ConfigDict
+from typing import Optional, List, Any, Sequence, Union
 
 
 class VectorItem(BaseModel):
     id: str
     text: str
-    vector: List[float | int]
+    # A list of floats, or a NumPy array such as a row of the embedding matrix
+    vector: Union[List[float | int], np.ndarray]
     metadata: Any
 
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+
+def as_matrix(vectors: Union[Sequence[Sequence[float]], np.ndarray]) -> np.ndarray:
+    """
+    Returns the vectors, a matrix or a list of lists or of arrays, as a
+    C-contiguous float32 matrix. A float32 matrix is returned as it is.
+    """
+    if len(vectors) == 0:
+        return np.empty((0, 0), dtype=np.float32)
+    return np.ascontiguousarray(vectors, dtype=np.float32)
+
+
+def as_lists(vectors: Union[Sequence[Sequence[float]], np.ndarray]) -> list:
+    # For clients that only take vectors as lists of floats
+    return as_matrix(vectors).tolist()
+
 
 class GetResult(BaseModel):
     ids: Optional[List[List[str]]]
@@ -17,3 +36,18 @@ class GetResult(BaseModel):
 
 class SearchResult(GetResult):
     distances: Optional[List[List[float | int]]]
+
+    def split(self) -> List["SearchResult"]:
+        # A search with several vectors returns one row per vector, split
+        # them into a result per vector.
+        return [
+            SearchResult(
+                ids=[ids],
+                distances=[distances],
+                documents=[documents],
+                metadatas=[metadatas],
+            )
+            for ids, distances, documents, metadatas in zip(
+                self.ids, self.distances, self.documents, self.metadatas
+            )
+        ]
@@ -0,0 +1,72 @@
+from typing import Optional
+
+import numpy as np
+
+# Modes of VECTOR_DB_QUANTIZATION and the type vectors are stored as
+QUANTIZATION_DTYPES = {
+    "": np.float32,
+    "float16": np.float16,
+    "int8": np.int8,
+}
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def get_int8_scale(vectors: np.ndarray) -> float:
+    # Maps the largest component to 127. Components of vectors quantized
+    # later that are larger still are clipped.
+    return 127.0 / max(float(np.abs(vectors).max()), 1e-12)
+
+
+def quantize(
+    vectors: np.ndarray, quantization: str, scale: Optional[float] = None
+) -> np.ndarray:
+    if quantization == "int8":
+        scale = get_int8_scale(vectors) if scale is None else scale
+        return np.clip(np.rint(vectors * scale), -127, 127).astype(np.int8)
+    return vectors.astype(QUANTIZATION_DTYPES[quantization])
+
+
+def dequantize(vectors: np.ndarray, scale: Optional[float] = None) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if scale is not None and scale != 1.0:
+        vectors *= 1 / scale
+    return vectors
+
+
+def measure_recall(
+    vectors: np.ndarray, queries: np.ndarray, k: int
+) -> dict[str, dict[str, float]]:
+    """
+    Compares a cosine search of `queries` over `vectors` stored in each
+    quantization mode with the full precision search, returning per mode the
+    share of the full precision top `k` that was found (recall@k) and the
+    bytes a vector takes.
+    """
+    vectors = normalize(np.asarray(vectors, dtype=np.float32))
+    queries = normalize(np.asarray(queries, dtype=np.float32))
+    k = min(k, len(vectors))
+
+    def top_k(scores: np.ndarray) -> np.ndarray:
+        return np.argpartition(-scores, k - 1, axis=1)[:, :k]
+
+    expected = top_k(queries @ vectors.T)
+
+    results = {}
+    for quantization, dtype in QUANTIZATION_DTYPES.items():
+        scale = get_int8_scale(vectors) if quantization == "int8" else None
+        stored = dequantize(quantize(vectors, quantization, scale), scale)
+        found = top_k(queries @ stored.T)
+
+        hits = sum(
+            len(np.intersect1d(a, b, assume_unique=True))
+            for a, b in zip(expected, found)
+        )
+        results[quantization or "float32"] = {
+            "recall": hits / (len(queries) * k) if k else 1.0,
+            "bytes_per_vector": vectors.shape[1] * np.dtype(dtype).itemsize,
+        }
+    return results
@@ -125,7 +125,7 @@ async def connect(sid, environ, auth):
         data = decode_token(auth["token"])
 
         if data is not None and "id" in data:
-            user = Users.get_user_by_id(data["id"])
+            user = Users.get_cached_user_by_id(data["id"])
 
         if user:
             SESSION_POOL[sid] = user.id
@@ -151,7 +151,7 @@ async def user_join(sid, data):
     if data is None or "id" not in data:
         return
 
-    user = Users.get_user_by_id(data["id"])
+    user = Users.get_cached_user_by_id(data["id"])
     if not user:
         return
 
@@ -0,0 +1,182 @@
+import logging
+import time
+import uuid
+from typing import Optional
+
+from open_webui.apps.webui.internal.db import Base, get_db
+from open_webui.env import SRC_LOG_LEVELS
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy import BigInteger, Column, Text
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MODELS"])
+
+####################
+# File Job DB Schema
+####################
+
+
+class FileJob(Base):
+    __tablename__ = "file_job"
+
+    id = Column(Text, primary_key=True)
+    file_id = Column(Text)
+    user_id = Column(Text)
+
+    # pending, processing, completed or failed
+    status = Column(Text)
+    attempts = Column(BigInteger, default=0)
+    error = Column(Text, nullable=True)
+
+    # Epoch after which a pending job may be picked up, used to back off retries
+    run_after = Column(BigInteger)
+    created_at = Column(BigInteger)
+    updated_at = Column(BigInteger)
+
+
+class FileJobModel(BaseModel):
+    id: str
+    file_id: str
+    user_id: str
+
+    status: str
+    attempts: int = 0
+    error: Optional[str] = None
+
+    run_after: int  # timestamp in epoch
+    created_at: int  # timestamp in epoch
+    updated_at: int  # timestamp in epoch
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class FileJobsTable:
+    def insert_new_job(self, file_id: str, user_id: str) -> Optional[FileJobModel]:
+        with get_db() as db:
+            now = int(time.time())
+            job = FileJobModel(
+                **{
+                    "id": str(uuid.uuid4()),
+                    "file_id": file_id,
+                    "user_id": user_id,
+                    "status": "pending",
+                    "attempts": 0,
+                    "run_after": now,
+                    "created_at": now,
+                    "updated_at": now,
+                }
+            )
+
+            try:
+                result = FileJob(**job.model_dump())
+                db.add(result)
+                db.commit()
+                db.refresh(result)
+                if result:
+                    return FileJobModel.model_validate(result)
+                else:
+                    return None
+            except Exception as e:
+                log.exception(f"Error inserting a new file job: {e}")
+                return None
+
+    def get_job_by_id(self, id: str) -> Optional[FileJobModel]:
+        with get_db() as db:
+            try:
+                job = db.get(FileJob, id)
+                return FileJobModel.model_validate(job)
+            except Exception:
+                return None
+
+    def get_latest_job_by_file_id(self, file_id: str) -> Optional[FileJobModel]:
+        with get_db() as db:
+            job = (
+                db.query(FileJob)
+                .filter_by(file_id=file_id)
+                .order_by(FileJob.created_at.desc())
+                .first()
+            )
+            return FileJobModel.model_validate(job) if job else None
+
+    def claim_next_job(self) -> Optional[FileJobModel]:
+        """
+        Marks the oldest runnable pending job as processing and returns it.
+        The status check in the update makes the claim atomic, so a job is
+        only ever handed to one worker.
+        """
+        with get_db() as db:
+            now = int(time.time())
+            candidates = (
+                db.query(FileJob.id)
+                .filter(FileJob.status == "pending", FileJob.run_after <= now)
+                .order_by(FileJob.created_at)
+                .limit(10)
+                .all()
+            )
+
+            for (id,) in candidates:
+                claimed = (
+                    db.query(FileJob)
+                    .filter_by(id=id, status="pending")
+                    .update(
+                        {
+                            "status": "processing",
+                            "attempts": FileJob.attempts + 1,
+                            "updated_at": now,
+                        },
+                        synchronize_session=False,
+                    )
+                )
+                db.commit()
+                if claimed:
+                    return FileJobModel.model_validate(db.get(FileJob, id))
+            return None
+
+    def touch_job_by_id(self, id: str):
+        with get_db() as db:
+            db.query(FileJob).filter_by(id=id).update({"updated_at": int(time.time())})
+            db.commit()
+
+    def update_job_status_by_id(
+        self,
+        id: str,
+        status: str,
+        error: Optional[str] = None,
+        run_after: Optional[int] = None,
+    ) -> Optional[FileJobModel]:
+        with get_db() as db:
+            now = int(time.time())
+            db.query(FileJob).filter_by(id=id).update(
+                {
+                    "status": status,
+                    "error": error,
+                    "run_after": run_after if run_after is not None else now,
+                    "updated_at": now,
+                }
+            )
+            db.commit()
+            return self.get_job_by_id(id)
+
+    def requeue_stale_jobs(self, timeout: int) -> int:
+        """
+        Returns jobs to the queue whose worker stopped reporting progress for
+        `timeout` seconds, e.g. because its process was restarted.
+        """
+        with get_db() as db:
+            now = int(time.time())
+            count = (
+                db.query(FileJob)
+                .filter(
+                    FileJob.status == "processing",
+                    FileJob.updated_at < now - timeout,
+                )
+                .update(
+                    {"status": "pending", "run_after": now, "updated_at": now},
+                    synchronize_session=False,
+                )
+            )
+            db.commit()
+            return count
+
+
+FileJobs = FileJobsTable()
@@ -1,3 +1,4 @@
+import copy
 import logging
 import time
 from typing import Optional
@@ -5,6 +6,7 @@ from typing import Optional
 from open_webui.apps.webui.internal.db import Base, JSONField, get_db
 from open_webui.apps.webui.models.users import Users
 from open_webui.env import SRC_LOG_LEVELS
+from open_webui.utils.cache import PLUGINS_CACHE
 from pydantic import BaseModel, ConfigDict
 from sqlalchemy import BigInteger, Boolean, Column, String, Text
 
@@ -100,6 +102,7 @@ class FunctionsTable:
                 db.add(result)
                 db.commit()
                 db.refresh(result)
+                PLUGINS_CACHE.bump()
                 if result:
                     return FunctionModel.model_validate(result)
                 else:
@@ -109,6 +112,9 @@ class FunctionsTable:
             return None
 
     def get_function_by_id(self, id: str) -> Optional[FunctionModel]:
+        return PLUGINS_CACHE.get(("function", id), lambda: self._get_function_by_id(id))
+
+    def _get_function_by_id(self, id: str) -> Optional[FunctionModel]:
         try:
             with get_db() as db:
                 function = db.get(Function, id)
@@ -117,6 +123,14 @@ class FunctionsTable:
             return None
 
     def get_functions(self, active_only=False) -> list[FunctionModel]:
+        return list(
+            PLUGINS_CACHE.get(
+                ("functions", active_only),
+                lambda: self._get_functions(active_only),
+            )
+        )
+
+    def _get_functions(self, active_only=False) -> list[FunctionModel]:
         with get_db() as db:
             if active_only:
                 return [
@@ -131,6 +145,16 @@ class FunctionsTable:
 
     def get_functions_by_type(
         self, type: str, active_only=False
+    ) -> list[FunctionModel]:
+        return list(
+            PLUGINS_CACHE.get(
+                ("functions_by_type", type, active_only),
+                lambda: self._get_functions_by_type(type, active_only),
+            )
+        )
+
+    def _get_functions_by_type(
+        self, type: str, active_only=False
     ) -> list[FunctionModel]:
         with get_db() as db:
             if active_only:
@@ -147,24 +171,32 @@ class FunctionsTable:
                 ]
 
     def get_global_filter_functions(self) -> list[FunctionModel]:
-        with get_db() as db:
-            return [
-                FunctionModel.model_validate(function)
-                for function in db.query(Function)
-                .filter_by(type="filter", is_active=True, is_global=True)
-                .all()
-            ]
+        return self._get_global_functions_by_type("filter")
 
     def get_global_action_functions(self) -> list[FunctionModel]:
-        with get_db() as db:
-            return [
-                FunctionModel.model_validate(function)
-                for function in db.query(Function)
-                .filter_by(type="action", is_active=True, is_global=True)
-                .all()
-            ]
+        return self._get_global_functions_by_type("action")
+
+    def _get_global_functions_by_type(self, type: str) -> list[FunctionModel]:
+        def load():
+            with get_db() as db:
+                return [
+                    FunctionModel.model_validate(function)
+                    for function in db.query(Function)
+                    .filter_by(type=type, is_active=True, is_global=True)
+                    .all()
+                ]
+
+        return list(PLUGINS_CACHE.get(("global_functions_by_type", type), load))
 
     def get_function_valves_by_id(self, id: str) -> Optional[dict]:
+        # Valves are handed out as copies, so callers may modify them freely
+        return copy.deepcopy(
+            PLUGINS_CACHE.get(
+                ("function_valves", id), lambda: self._get_function_valves_by_id(id)
+            )
+        )
+
+    def _get_function_valves_by_id(self, id: str) -> Optional[dict]:
         with get_db() as db:
             try:
                 function = db.get(Function, id)
@@ -183,12 +215,23 @@ class FunctionsTable:
                 function.updated_at = int(time.time())
                 db.commit()
                 db.refresh(function)
+                PLUGINS_CACHE.bump()
                 return self.get_function_by_id(id)
             except Exception:
                 return None
 
     def get_user_valves_by_id_and_user_id(
         self, id: str, user_id: str
+    ) -> Optional[dict]:
+        return copy.deepcopy(
+            PLUGINS_CACHE.get(
+                ("function_user_valves", id, user_id),
+                lambda: self._get_user_valves_by_id_and_user_id(id, user_id),
+            )
+        )
+
+    def _get_user_valves_by_id_and_user_id(
+        self, id: str, user_id: str
     ) -> Optional[dict]:
         try:
             user = Users.get_user_by_id(user_id)
@@ -238,6 +281,7 @@ class FunctionsTable:
                     }
                 )
                 db.commit()
+                PLUGINS_CACHE.bump()
                 return self.get_function_by_id(id)
             except Exception:
                 return None
@@ -252,6 +296,7 @@ class FunctionsTable:
                     }
                 )
                 db.commit()
+                PLUGINS_CACHE.bump()
                 return True
             except Exception:
                 return None
@@ -261,6 +306,7 @@ class FunctionsTable:
             try:
                 db.query(Function).filter_by(id=id).delete()
                 db.commit()
+                PLUGINS_CACHE.bump()
 
                 return True
             except Exception:
@@ -1,3 +1,4 @@
+import copy
 import logging
 import time
 from typing import Optional
@@ -5,6 +6,7 @@ from typing import Optional
 from open_webui.apps.webui.internal.db import Base, JSONField, get_db
 from open_webui.apps.webui.models.users import Users
 from open_webui.env import SRC_LOG_LEVELS
+from open_webui.utils.cache import PLUGINS_CACHE
 from pydantic import BaseModel, ConfigDict
 from sqlalchemy import BigInteger, Column, String, Text
 
@@ -93,6 +95,7 @@ class ToolsTable:
                 db.add(result)
                 db.commit()
                 db.refresh(result)
+                PLUGINS_CACHE.bump()
                 if result:
                     return ToolModel.model_validate(result)
                 else:
@@ -102,6 +105,9 @@ class ToolsTable:
                 return None
 
     def get_tool_by_id(self, id: str) -> Optional[ToolModel]:
+        return PLUGINS_CACHE.get(("tool", id), lambda: self._get_tool_by_id(id))
+
+    def _get_tool_by_id(self, id: str) -> Optional[ToolModel]:
         try:
             with get_db() as db:
                 tool = db.get(Tool, id)
@@ -110,10 +116,21 @@ class ToolsTable:
             return None
 
     def get_tools(self) -> list[ToolModel]:
-        with get_db() as db:
-            return [ToolModel.model_validate(tool) for tool in db.query(Tool).all()]
+        def load():
+            with get_db() as db:
+                return [ToolModel.model_validate(tool) for tool in db.query(Tool).all()]
+
+        return list(PLUGINS_CACHE.get(("tools",), load))
 
     def get_tool_valves_by_id(self, id: str) -> Optional[dict]:
+        # Valves are handed out as copies, so callers may modify them freely
+        return copy.deepcopy(
+            PLUGINS_CACHE.get(
+                ("tool_valves", id), lambda: self._get_tool_valves_by_id(id)
+            )
+        )
+
+    def _get_tool_valves_by_id(self, id: str) -> Optional[dict]:
         try:
             with get_db() as db:
                 tool = db.get(Tool, id)
@@ -129,12 +146,23 @@ class ToolsTable:
                     {"valves": valves, "updated_at": int(time.time())}
                 )
                 db.commit()
+                PLUGINS_CACHE.bump()
                 return self.get_tool_by_id(id)
         except Exception:
             return None
 
     def get_user_valves_by_id_and_user_id(
         self, id: str, user_id: str
+    ) -> Optional[dict]:
+        return copy.deepcopy(
+            PLUGINS_CACHE.get(
+                ("tool_user_valves", id, user_id),
+                lambda: self._get_user_valves_by_id_and_user_id(id, user_id),
+            )
+        )
+
+    def _get_user_valves_by_id_and_user_id(
+        self, id: str, user_id: str
     ) -> Optional[dict]:
         try:
             user = Users.get_user_by_id(user_id)
@@ -181,6 +209,7 @@ class ToolsTable:
                     {**updated, "updated_at": int(time.time())}
                 )
                 db.commit()
+                PLUGINS_CACHE.bump()
 
                 tool = db.query(Tool).get(id)
                 db.refresh(tool)
@@ -193,6 +222,7 @@ class ToolsTable:
             with get_db() as db:
                 db.query(Tool).filter_by(id=id).delete()
                 db.commit()
+                PLUGINS_CACHE.bump()
 
                 return True
         except Exception:
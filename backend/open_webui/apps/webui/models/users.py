@@ -3,6 +3,8 @@ from typing import Optional
 
 from open_webui.apps.webui.internal.db import Base, JSONField, get_db
 from open_webui.apps.webui.models.chats import Chats
+from open_webui.env import USER_LAST_ACTIVE_UPDATE_INTERVAL
+from open_webui.utils.cache import PLUGINS_CACHE, USER_CACHE
 from pydantic import BaseModel, ConfigDict
 from sqlalchemy import BigInteger, Column, String, Text
 
@@ -75,6 +77,13 @@ class UserUpdateForm(BaseModel):
 
 
 class UsersTable:
+    def __init__(self):
+        # User id -> time last_active_at was last written by this worker
+        self._last_active_written: dict[str, float] = {}
+
+    def _evict_cached_user(self, id: str):
+        USER_CACHE.delete_where(lambda user: user.id == id)
+
     def insert_new_user(
         self,
         id: str,
@@ -115,6 +124,27 @@ class UsersTable:
         except Exception:
             return None
 
+    def get_cached_user_by_id(self, id: str) -> Optional[UserModel]:
+        """
+        Like `get_user_by_id`, but served from a short-lived cache, for the
+        per-request authentication path. Writes through this table evict the
+        user; changes made by other workers apply once the entry expires.
+        """
+        user = USER_CACHE.get(("id", id))
+        if user is None:
+            user = self.get_user_by_id(id)
+            if user is not None:
+                USER_CACHE.set(("id", id), user)
+        return user
+
+    def get_cached_user_by_api_key(self, api_key: str) -> Optional[UserModel]:
+        user = USER_CACHE.get(("api_key", api_key))
+        if user is None:
+            user = self.get_user_by_api_key(api_key)
+            if user is not None:
+                USER_CACHE.set(("api_key", api_key), user)
+        return user
+
     def get_user_by_api_key(self, api_key: str) -> Optional[UserModel]:
         try:
             with get_db() as db:
@@ -165,6 +195,7 @@ class UsersTable:
             with get_db() as db:
                 db.query(User).filter_by(id=id).update({"role": role})
                 db.commit()
+                self._evict_cached_user(id)
                 user = db.query(User).filter_by(id=id).first()
                 return UserModel.model_validate(user)
         except Exception:
@@ -179,24 +210,34 @@ class UsersTable:
                     {"profile_image_url": profile_image_url}
                 )
                 db.commit()
+                self._evict_cached_user(id)
 
                 user = db.query(User).filter_by(id=id).first()
                 return UserModel.model_validate(user)
         except Exception:
             return None
 
-    def update_user_last_active_by_id(self, id: str) -> Optional[UserModel]:
+    def update_user_last_active_by_id(self, id: str) -> bool:
+        """
+        Records that the user is active. This runs on every authenticated
+        request, so the write is skipped if this worker already wrote it
+        within the last USER_LAST_ACTIVE_UPDATE_INTERVAL seconds.
+        """
+        now = time.time()
+        if (
+            now - self._last_active_written.get(id, 0)
+            < USER_LAST_ACTIVE_UPDATE_INTERVAL
+        ):
+            return False
+
+        self._last_active_written[id] = now
         try:
             with get_db() as db:
-                db.query(User).filter_by(id=id).update(
-                    {"last_active_at": int(time.time())}
-                )
+                db.query(User).filter_by(id=id).update({"last_active_at": int(now)})
                 db.commit()
-
-                user = db.query(User).filter_by(id=id).first()
-                return UserModel.model_validate(user)
+                return True
         except Exception:
-            return None
+            return False
 
     def update_user_oauth_sub_by_id(
         self, id: str, oauth_sub: str
@@ -205,6 +246,7 @@ class UsersTable:
             with get_db() as db:
                 db.query(User).filter_by(id=id).update({"oauth_sub": oauth_sub})
                 db.commit()
+                self._evict_cached_user(id)
 
                 user = db.query(User).filter_by(id=id).first()
                 return UserModel.model_validate(user)
@@ -216,6 +258,11 @@ class UsersTable:
             with get_db() as db:
                 db.query(User).filter_by(id=id).update(updated)
                 db.commit()
+                self._evict_cached_user(id)
+
+                # User valves are stored in the user's settings
+                if "settings" in updated:
+                    PLUGINS_CACHE.bump()
 
                 user = db.query(User).filter_by(id=id).first()
                 return UserModel.model_validate(user)
@@ -233,6 +280,9 @@ class UsersTable:
                     # Delete User
                     db.query(User).filter_by(id=id).delete()
                     db.commit()
+                    PLUGINS_CACHE.bump()
+                    self._evict_cached_user(id)
+                    self._last_active_written.pop(id, None)
 
                 return True
             else:
@@ -245,6 +295,7 @@ class UsersTable:
             with get_db() as db:
                 result = db.query(User).filter_by(id=id).update({"api_key": api_key})
                 db.commit()
+                self._evict_cached_user(id)
                 return True if result == 1 else False
         except Exception:
             return False
@@ -1,6 +1,7 @@
 from open_webui.config import BannerModel
 from fastapi import APIRouter, Depends, Request
 from pydantic import BaseModel
+from open_webui.utils.cache import MODELS_CACHE
 from open_webui.utils.utils import get_admin_user, get_verified_user
 
 
@@ -21,6 +22,7 @@ class ImportConfigForm(BaseModel):
 @router.post("/import", response_model=dict)
 async def import_config(form_data: ImportConfigForm, user=Depends(get_admin_user)):
     save_config(form_data.config)
+    MODELS_CACHE.invalidate()
     return get_config()
 
 
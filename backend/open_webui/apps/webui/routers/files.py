@@ -14,6 +14,7 @@ from open_webui.apps.webui.models.files import (
     FileModelResponse,
     Files,
 )
+from open_webui.apps.webui.models.file_jobs import FileJobModel, FileJobs
 from open_webui.apps.retrieval.main import process_file, ProcessFileForm
 
 from open_webui.config import UPLOAD_DIR
@@ -25,6 +26,7 @@ from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status
 from fastapi.responses import FileResponse, StreamingResponse
 
 
+from open_webui.utils.ingestion import INGESTION_QUEUE
 from open_webui.utils.utils import get_admin_user, get_verified_user
 
 log = logging.getLogger(__name__)
@@ -39,7 +41,18 @@ router = APIRouter()
 
 
 @router.post("/", response_model=FileModelResponse)
-def upload_file(file: UploadFile = File(...), user=Depends(get_verified_user)):
+def upload_file(
+    file: UploadFile = File(...),
+    wait: bool = False,
+    user=Depends(get_verified_user),
+):
+    """
+    Uploads a file and queues it for processing. The file's content is only
+    set once its job (`job_id`, also at /files/{id}/job) is completed, so the
+    file can't be used in a chat before. With `?wait=true` the response is
+    delayed until the job is finished, or RAG_FILE_PROCESSING_WAIT_TIMEOUT
+    seconds have passed, and includes the processed file and `job_status`.
+    """
     log.info(f"file.content_type: {file.content_type}")
     try:
         unsanitized_filename = file.filename
@@ -67,16 +80,27 @@ def upload_file(file: UploadFile = File(...), user=Depends(get_verified_user)):
             ),
         )
 
-        try:
-            process_file(ProcessFileForm(file_id=id))
-            file_item = Files.get_file_by_id(id=id)
-        except Exception as e:
-            log.exception(e)
-            log.error(f"Error processing file: {file_item.id}")
+        # Processed in the background, progress is reported as file-events
+        job = INGESTION_QUEUE.enqueue(file_item.id, user.id)
+        if job and wait:
+            job = INGESTION_QUEUE.wait_for_file(file_item.id) or job
+            file_item = FileModelResponse(
+                **{
+                    **Files.get_file_by_id(file_item.id).model_dump(),
+                    "job_id": job.id,
+                    "job_status": job.status,
+                    **({"error": job.error} if job.status == "failed" else {}),
+                }
+            )
+        elif job:
+            file_item = FileModelResponse(
+                **{**file_item.model_dump(), "job_id": job.id}
+            )
+        else:
             file_item = FileModelResponse(
                 **{
                     **file_item.model_dump(),
-                    "error": str(e.detail) if hasattr(e, "detail") else str(e),
+                    "error": ERROR_MESSAGES.DEFAULT("Error queueing file processing"),
                 }
             )
 
@@ -154,6 +178,24 @@ async def get_file_by_id(id: str, user=Depends(get_verified_user)):
         )
 
 
+############################
+# Get File Job By Id
+############################
+
+
+@router.get("/{id}/job", response_model=Optional[FileJobModel])
+async def get_file_job_by_id(id: str, user=Depends(get_verified_user)):
+    file = Files.get_file_by_id(id)
+
+    if file and (file.user_id == user.id or user.role == "admin"):
+        return FileJobs.get_latest_job_by_file_id(id)
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=ERROR_MESSAGES.NOT_FOUND,
+        )
+
+
 ############################
 # Get File Data Content By Id
 ############################
@@ -164,7 +206,7 @@ async def get_file_data_content_by_id(id: str, user=Depends(get_verified_user)):
     file = Files.get_file_by_id(id)
 
     if file and (file.user_id == user.id or user.role == "admin"):
-        return {"content": file.data.get("content", "")}
+        return {"content": (file.data or {}).get("content", "")}
     else:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -182,7 +224,7 @@ class ContentForm(BaseModel):
 
 
 @router.post("/{id}/data/content/update")
-async def update_file_data_content_by_id(
+def update_file_data_content_by_id(
     id: str, form_data: ContentForm, user=Depends(get_verified_user)
 ):
     file = Files.get_file_by_id(id)
@@ -195,7 +237,7 @@ async def update_file_data_content_by_id(
             log.exception(e)
             log.error(f"Error processing file: {file.id}")
 
-        return {"content": file.data.get("content", "")}
+        return {"content": (file.data or {}).get("content", "")}
     else:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
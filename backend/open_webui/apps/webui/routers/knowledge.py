@@ -11,11 +11,13 @@ from open_webui.apps.webui.models.knowledge import (
     KnowledgeResponse,
 )
 from open_webui.apps.webui.models.files import Files, FileModel
+from open_webui.apps.retrieval.bm25 import BM25_INDEXES
 from open_webui.apps.retrieval.vector.connector import VECTOR_DB_CLIENT
 from open_webui.apps.retrieval.main import process_file, ProcessFileForm
 
 
 from open_webui.constants import ERROR_MESSAGES
+from open_webui.utils.ingestion import INGESTION_QUEUE
 from open_webui.utils.utils import get_admin_user, get_verified_user
 from open_webui.env import SRC_LOG_LEVELS
 
@@ -182,7 +184,12 @@ def add_file_to_knowledge_by_id(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=ERROR_MESSAGES.NOT_FOUND,
         )
-    if not file.data:
+
+    # Uploaded files are processed in the background, and their content is
+    # needed here
+    INGESTION_QUEUE.wait_for_file(form_data.file_id)
+    file = Files.get_file_by_id(form_data.file_id)
+    if not file or not file.data:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=ERROR_MESSAGES.FILE_NOT_PROCESSED,
@@ -252,6 +259,13 @@ def update_file_from_knowledge_by_id(
     VECTOR_DB_CLIENT.delete(
         collection_name=knowledge.id, filter={"file_id": form_data.file_id}
     )
+    BM25_INDEXES.delete(
+        collection_name=knowledge.id, filter={"file_id": form_data.file_id}
+    )
+
+    # Uploaded files are processed in the background, and their content is
+    # needed here
+    INGESTION_QUEUE.wait_for_file(form_data.file_id)
 
     # Add content to the vector database
     try:
@@ -302,6 +316,9 @@ def remove_file_from_knowledge_by_id(
     VECTOR_DB_CLIENT.delete(
         collection_name=knowledge.id, filter={"file_id": form_data.file_id}
     )
+    BM25_INDEXES.delete(
+        collection_name=knowledge.id, filter={"file_id": form_data.file_id}
+    )
 
     result = VECTOR_DB_CLIENT.query(
         collection_name=knowledge.id,
@@ -354,6 +371,7 @@ def remove_file_from_knowledge_by_id(
 @router.post("/{id}/reset", response_model=Optional[KnowledgeResponse])
 async def reset_knowledge_by_id(id: str, user=Depends(get_admin_user)):
     try:
+        BM25_INDEXES.delete_collection(collection_name=id)
         VECTOR_DB_CLIENT.delete_collection(collection_name=id)
     except Exception as e:
         log.debug(e)
@@ -373,6 +391,7 @@ async def reset_knowledge_by_id(id: str, user=Depends(get_admin_user)):
 @router.delete("/{id}/delete", response_model=bool)
 async def delete_knowledge_by_id(id: str, user=Depends(get_admin_user)):
     try:
+        BM25_INDEXES.delete_collection(collection_name=id)
         VECTOR_DB_CLIENT.delete_collection(collection_name=id)
     except Exception as e:
         log.debug(e)
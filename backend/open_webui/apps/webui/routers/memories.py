@@ -1,3 +1,5 @@
+import asyncio
+
 from fastapi import APIRouter, Depends, HTTPException, Request
 from pydantic import BaseModel
 import logging
@@ -17,7 +19,11 @@ router = APIRouter()
 
 @router.get("/ef")
 async def get_embeddings(request: Request):
-    return {"result": request.app.state.EMBEDDING_FUNCTION("hello world")}
+    return {
+        "result": await asyncio.to_thread(
+            request.app.state.EMBEDDING_FUNCTION, "hello world"
+        )
+    }
 
 
 ############################
@@ -57,7 +63,9 @@ async def add_memory(
             {
                 "id": memory.id,
                 "text": memory.content,
-                "vector": request.app.state.EMBEDDING_FUNCTION(memory.content),
+                "vector": await asyncio.to_thread(
+                    request.app.state.EMBEDDING_FUNCTION, memory.content
+                ),
                 "metadata": {"created_at": memory.created_at},
             }
         ],
@@ -82,7 +90,11 @@ async def query_memory(
 ):
     results = VECTOR_DB_CLIENT.search(
         collection_name=f"user-memory-{user.id}",
-        vectors=[request.app.state.EMBEDDING_FUNCTION(form_data.content)],
+        vectors=[
+            await asyncio.to_thread(
+                request.app.state.EMBEDDING_FUNCTION, form_data.content
+            )
+        ],
         limit=form_data.k,
     )
 
@@ -99,19 +111,27 @@ async def reset_memory_from_vector_db(
     VECTOR_DB_CLIENT.delete_collection(f"user-memory-{user.id}")
 
     memories = Memories.get_memories_by_user_id(user.id)
+    vectors = (
+        await asyncio.to_thread(
+            request.app.state.EMBEDDING_FUNCTION,
+            [memory.content for memory in memories],
+        )
+        if memories
+        else []
+    )
     VECTOR_DB_CLIENT.upsert(
         collection_name=f"user-memory-{user.id}",
         items=[
             {
                 "id": memory.id,
                 "text": memory.content,
-                "vector": request.app.state.EMBEDDING_FUNCTION(memory.content),
+                "vector": vector,
                 "metadata": {
                     "created_at": memory.created_at,
                     "updated_at": memory.updated_at,
                 },
             }
-            for memory in memories
+            for memory, vector in zip(memories, vectors)
         ],
     )
 
@@ -160,7 +180,9 @@ async def update_memory_by_id(
                 {
                     "id": memory.id,
                     "text": memory.content,
-                    "vector": request.app.state.EMBEDDING_FUNCTION(memory.content),
+                    "vector": await asyncio.to_thread(
+                        request.app.state.EMBEDDING_FUNCTION, memory.content
+                    ),
                     "metadata": {
                         "created_at": memory.created_at,
                         "updated_at": memory.updated_at,
@@ -8,6 +8,7 @@ from open_webui.apps.webui.models.models import (
 )
 from open_webui.constants import ERROR_MESSAGES
 from fastapi import APIRouter, Depends, HTTPException, Request, status
+from open_webui.utils.cache import MODELS_CACHE
 from open_webui.utils.utils import get_admin_user, get_verified_user
 
 router = APIRouter()
@@ -52,6 +53,7 @@ async def add_new_model(
         model = Models.insert_new_model(form_data, user.id)
 
         if model:
+            MODELS_CACHE.invalidate()
             return model
         else:
             raise HTTPException(
@@ -75,11 +77,13 @@ async def update_model_by_id(
     model = Models.get_model_by_id(id)
     if model:
         model = Models.update_model_by_id(id, form_data)
+        MODELS_CACHE.invalidate()
         return model
     else:
         if form_data.id in request.app.state.MODELS:
             model = Models.insert_new_model(form_data, user.id)
             if model:
+                MODELS_CACHE.invalidate()
                 return model
             else:
                 raise HTTPException(
@@ -101,4 +105,5 @@ async def update_model_by_id(
 @router.delete("/delete", response_model=bool)
 async def delete_model_by_id(id: str, user=Depends(get_admin_user)):
     result = Models.delete_model_by_id(id)
+    MODELS_CACHE.invalidate()
     return result
@@ -606,6 +606,14 @@ OLLAMA_BASE_URLS = PersistentConfig(
     "OLLAMA_BASE_URLS", "ollama.base_urls", OLLAMA_BASE_URLS
 )
 
+# How requests for a model served by several OLLAMA_BASE_URLS are routed:
+# random, least_outstanding, ewma or affinity.
+OLLAMA_ROUTING_STRATEGY = PersistentConfig(
+    "OLLAMA_ROUTING_STRATEGY",
+    "ollama.routing_strategy",
+    os.environ.get("OLLAMA_ROUTING_STRATEGY", "least_outstanding"),
+)
+
 ####################################
 # OPENAI_API
 ####################################
@@ -931,6 +939,23 @@ TOOLS_FUNCTION_CALLING_PROMPT_TEMPLATE = PersistentConfig(
 
 VECTOR_DB = os.environ.get("VECTOR_DB", "chroma")
 
+# Stores new collections' vectors as "float16" or as "int8" (scalar quantized
+# with a scale per collection) instead of float32, where the vector database
+# supports it: float16 and int8 with Qdrant and the local store, float16 with
+# Milvus. The recall this costs can be measured with /quantization/recall.
+VECTOR_DB_QUANTIZATION = os.environ.get("VECTOR_DB_QUANTIZATION", "").lower()
+if VECTOR_DB_QUANTIZATION not in ["", "float16", "int8"]:
+    log.warning(
+        f"Unknown VECTOR_DB_QUANTIZATION {VECTOR_DB_QUANTIZATION}, storing float32 vectors"
+    )
+    VECTOR_DB_QUANTIZATION = ""
+
+# Seconds a collection found to exist is remembered before checking again.
+# Collections deleted by another worker may be reported as existing until then.
+VECTOR_DB_COLLECTION_CACHE_TTL = float(
+    os.environ.get("VECTOR_DB_COLLECTION_CACHE_TTL", "60")
+)
+
 # Chroma
 CHROMA_DATA_PATH = f"{DATA_DIR}/vector_db"
 CHROMA_TENANT = os.environ.get("CHROMA_TENANT", chromadb.DEFAULT_TENANT)
@@ -951,10 +976,45 @@ CHROMA_HTTP_SSL = os.environ.get("CHROMA_HTTP_SSL", "false").lower() == "true"
 # Milvus
 
 MILVUS_URI = os.environ.get("MILVUS_URI", f"{DATA_DIR}/vector_db/milvus.db")
+# Stores all collections in one Milvus collection per embedding dimension,
+# with the collection name as partition key hashed over MILVUS_NUM_PARTITIONS
+# partitions, instead of creating a Milvus collection per collection. Files
+# processed in the other mode are not found, so the vector database has to be
+# reset and the files processed again after switching.
+MILVUS_PARTITION_KEY_MODE = (
+    os.environ.get("MILVUS_PARTITION_KEY_MODE", "false").lower() == "true"
+)
+MILVUS_NUM_PARTITIONS = int(os.environ.get("MILVUS_NUM_PARTITIONS", "64"))
+# HNSW, IVF_FLAT, IVF_SQ8, FLAT or AUTOINDEX, used for Milvus collections
+# created afterwards. Milvus Lite (a .db file as MILVUS_URI) only supports
+# FLAT, IVF_FLAT and AUTOINDEX, and uses FLAT instead of the others.
+MILVUS_INDEX_TYPE = os.environ.get("MILVUS_INDEX_TYPE", "HNSW").upper()
+MILVUS_HNSW_M = int(os.environ.get("MILVUS_HNSW_M", "16"))
+MILVUS_HNSW_EF_CONSTRUCTION = int(os.environ.get("MILVUS_HNSW_EF_CONSTRUCTION", "100"))
+# Candidates considered per HNSW search, raised to the number of results
+MILVUS_HNSW_EF = int(os.environ.get("MILVUS_HNSW_EF", "64"))
+MILVUS_IVF_NLIST = int(os.environ.get("MILVUS_IVF_NLIST", "1024"))
+# IVF lists searched per query
+MILVUS_IVF_NPROBE = int(os.environ.get("MILVUS_IVF_NPROBE", "16"))
+# Rows sent per insert request, keeping large uploads under the gRPC message
+# size limit of Milvus
+MILVUS_INSERT_BATCH_SIZE = int(os.environ.get("MILVUS_INSERT_BATCH_SIZE", "2000"))
 
 # Qdrant
 QDRANT_URI = os.environ.get("QDRANT_URI", None)
 
+# Local
+LOCAL_VECTOR_DB_PATH = os.environ.get(
+    "LOCAL_VECTOR_DB_PATH", f"{DATA_DIR}/vector_db/local"
+)
+# Collections with at least this many chunks are searched through an IVF index,
+# probing the LOCAL_VECTOR_DB_IVF_NPROBE lists closest to the query. Set the
+# threshold to 0 to always search exhaustively.
+LOCAL_VECTOR_DB_IVF_THRESHOLD = int(
+    os.environ.get("LOCAL_VECTOR_DB_IVF_THRESHOLD", "100000")
+)
+LOCAL_VECTOR_DB_IVF_NPROBE = int(os.environ.get("LOCAL_VECTOR_DB_IVF_NPROBE", "32"))
+
 ####################################
 # Information Retrieval (RAG)
 ####################################
@@ -972,6 +1032,15 @@ TIKA_SERVER_URL = PersistentConfig(
     os.getenv("TIKA_SERVER_URL", "http://tika:9998"),  # Default for sidecar deployment
 )
 
+# Number of worker processes documents are parsed in (0 parses them in the
+# request thread), how long parsing one file may take in seconds, and how much
+# memory a worker may use in megabytes (0 for no limit)
+CONTENT_EXTRACTION_WORKERS = int(os.environ.get("CONTENT_EXTRACTION_WORKERS", "0"))
+CONTENT_EXTRACTION_TIMEOUT = int(os.environ.get("CONTENT_EXTRACTION_TIMEOUT", "300"))
+CONTENT_EXTRACTION_MAX_MEMORY = int(
+    os.environ.get("CONTENT_EXTRACTION_MAX_MEMORY", "0")
+)
+
 RAG_TOP_K = PersistentConfig(
     "RAG_TOP_K", "rag.top_k", int(os.environ.get("RAG_TOP_K", "3"))
 )
@@ -987,6 +1056,30 @@ ENABLE_RAG_HYBRID_SEARCH = PersistentConfig(
     os.environ.get("ENABLE_RAG_HYBRID_SEARCH", "").lower() == "true",
 )
 
+# BM25 indexes used by hybrid search, one per collection, and how many of them
+# are kept loaded in memory per worker
+BM25_INDEX_DIR = os.environ.get("BM25_INDEX_DIR", f"{DATA_DIR}/bm25")
+BM25_INDEX_MAX_LOADED = int(os.environ.get("BM25_INDEX_MAX_LOADED", "64"))
+
+# Embeddings of ingested chunks, reused for identical chunk text, and how many
+# of them are kept. Set the maximum to 0 to disable.
+CHUNK_EMBEDDING_STORE_PATH = os.environ.get(
+    "CHUNK_EMBEDDING_STORE_PATH", f"{DATA_DIR}/embeddings.db"
+)
+CHUNK_EMBEDDING_STORE_MAX_ENTRIES = int(
+    os.environ.get("CHUNK_EMBEDDING_STORE_MAX_ENTRIES", "500000")
+)
+
+# Smallest number of chunks embedded and inserted together while ingesting a
+# document. RAG_EMBEDDING_BATCH_SIZE is used when it is larger.
+RAG_INGESTION_MIN_BATCH_SIZE = int(os.environ.get("RAG_INGESTION_MIN_BATCH_SIZE", "64"))
+
+# Maximum number of collections searched concurrently when answering a query
+RAG_QUERY_CONCURRENCY = int(os.environ.get("RAG_QUERY_CONCURRENCY", "8"))
+
+# Number of (query, document) pairs the reranking model scores at once
+RAG_RERANKING_BATCH_SIZE = int(os.environ.get("RAG_RERANKING_BATCH_SIZE", "32"))
+
 RAG_FILE_MAX_COUNT = PersistentConfig(
     "RAG_FILE_MAX_COUNT",
     "rag.file.max_count",
@@ -1007,6 +1100,29 @@ RAG_FILE_MAX_SIZE = PersistentConfig(
     ),
 )
 
+# Uploaded files are processed by background jobs, at most this many at once
+# per worker
+RAG_FILE_PROCESSING_MAX_CONCURRENCY = PersistentConfig(
+    "RAG_FILE_PROCESSING_MAX_CONCURRENCY",
+    "rag.file.max_concurrent_jobs",
+    int(os.environ.get("RAG_FILE_PROCESSING_MAX_CONCURRENCY", "2")),
+)
+
+# Attempts made at processing a file before its job fails, and the seconds to
+# wait before the first retry, doubled for every further one
+RAG_FILE_PROCESSING_MAX_ATTEMPTS = int(
+    os.environ.get("RAG_FILE_PROCESSING_MAX_ATTEMPTS", "3")
+)
+RAG_FILE_PROCESSING_RETRY_DELAY = int(
+    os.environ.get("RAG_FILE_PROCESSING_RETRY_DELAY", "10")
+)
+
+# Seconds a request that needs a file's content, such as adding it to a
+# knowledge base, waits for the file's processing job to finish
+RAG_FILE_PROCESSING_WAIT_TIMEOUT = int(
+    os.environ.get("RAG_FILE_PROCESSING_WAIT_TIMEOUT", "30")
+)
+
 ENABLE_RAG_WEB_LOADER_SSL_VERIFICATION = PersistentConfig(
     "ENABLE_RAG_WEB_LOADER_SSL_VERIFICATION",
     "rag.enable_web_loader_ssl_verification",
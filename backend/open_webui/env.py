@@ -375,6 +375,212 @@ else:
     except Exception:
         AIOHTTP_CLIENT_TIMEOUT_OPENAI_MODEL_LIST = 3
 
+AIOHTTP_CLIENT_LIMIT_PER_HOST = os.environ.get("AIOHTTP_CLIENT_LIMIT_PER_HOST", "100")
+
+try:
+    AIOHTTP_CLIENT_LIMIT_PER_HOST = int(AIOHTTP_CLIENT_LIMIT_PER_HOST)
+except Exception:
+    AIOHTTP_CLIENT_LIMIT_PER_HOST = 100
+
+AIOHTTP_CLIENT_KEEPALIVE_TIMEOUT = os.environ.get(
+    "AIOHTTP_CLIENT_KEEPALIVE_TIMEOUT", "30"
+)
+
+try:
+    AIOHTTP_CLIENT_KEEPALIVE_TIMEOUT = float(AIOHTTP_CLIENT_KEEPALIVE_TIMEOUT)
+except Exception:
+    AIOHTTP_CLIENT_KEEPALIVE_TIMEOUT = 30
+
+AIOHTTP_CLIENT_DNS_CACHE_TTL = os.environ.get("AIOHTTP_CLIENT_DNS_CACHE_TTL", "300")
+
+if AIOHTTP_CLIENT_DNS_CACHE_TTL == "":
+    AIOHTTP_CLIENT_DNS_CACHE_TTL = None
+else:
+    try:
+        AIOHTTP_CLIENT_DNS_CACHE_TTL = int(AIOHTTP_CLIENT_DNS_CACHE_TTL)
+    except Exception:
+        AIOHTTP_CLIENT_DNS_CACHE_TTL = 300
+
+####################################
+# UPSTREAM HEALTH
+####################################
+
+# Consecutive failures after which an upstream base URL is taken out of
+# model listing and routing, and seconds before it is tried again.
+UPSTREAM_CIRCUIT_BREAKER_FAILURE_THRESHOLD = os.environ.get(
+    "UPSTREAM_CIRCUIT_BREAKER_FAILURE_THRESHOLD", "3"
+)
+
+try:
+    UPSTREAM_CIRCUIT_BREAKER_FAILURE_THRESHOLD = max(
+        int(UPSTREAM_CIRCUIT_BREAKER_FAILURE_THRESHOLD), 1
+    )
+except Exception:
+    UPSTREAM_CIRCUIT_BREAKER_FAILURE_THRESHOLD = 3
+
+UPSTREAM_CIRCUIT_BREAKER_RESET_TIMEOUT = os.environ.get(
+    "UPSTREAM_CIRCUIT_BREAKER_RESET_TIMEOUT", "30"
+)
+
+try:
+    UPSTREAM_CIRCUIT_BREAKER_RESET_TIMEOUT = float(
+        UPSTREAM_CIRCUIT_BREAKER_RESET_TIMEOUT
+    )
+except Exception:
+    UPSTREAM_CIRCUIT_BREAKER_RESET_TIMEOUT = 30
+
+# Seconds between background health probes of every upstream base URL.
+# Set to 0 to disable probing.
+UPSTREAM_HEALTH_CHECK_INTERVAL = os.environ.get("UPSTREAM_HEALTH_CHECK_INTERVAL", "15")
+
+try:
+    UPSTREAM_HEALTH_CHECK_INTERVAL = float(UPSTREAM_HEALTH_CHECK_INTERVAL)
+except Exception:
+    UPSTREAM_HEALTH_CHECK_INTERVAL = 15
+
+UPSTREAM_HEALTH_CHECK_TIMEOUT = os.environ.get("UPSTREAM_HEALTH_CHECK_TIMEOUT", "3")
+
+try:
+    UPSTREAM_HEALTH_CHECK_TIMEOUT = float(UPSTREAM_HEALTH_CHECK_TIMEOUT)
+except Exception:
+    UPSTREAM_HEALTH_CHECK_TIMEOUT = 3
+
+####################################
+# PIPELINE FILTERS
+####################################
+
+# Seconds a single pipeline filter inlet/outlet call may take before it is
+# skipped. Leave empty to wait indefinitely.
+PIPELINE_FILTER_TIMEOUT = os.environ.get("PIPELINE_FILTER_TIMEOUT", "30")
+
+if PIPELINE_FILTER_TIMEOUT == "":
+    PIPELINE_FILTER_TIMEOUT = None
+else:
+    try:
+        PIPELINE_FILTER_TIMEOUT = float(PIPELINE_FILTER_TIMEOUT)
+    except Exception:
+        PIPELINE_FILTER_TIMEOUT = 30
+
+# Maximum number of pipeline filter calls in flight across all requests.
+PIPELINE_FILTER_CONCURRENCY = os.environ.get("PIPELINE_FILTER_CONCURRENCY", "50")
+
+try:
+    PIPELINE_FILTER_CONCURRENCY = max(int(PIPELINE_FILTER_CONCURRENCY), 1)
+except Exception:
+    PIPELINE_FILTER_CONCURRENCY = 50
+
+####################################
+# OLLAMA EMBEDDINGS
+####################################
+
+# Inputs sent to Ollama's /api/embed per request; larger inputs are split and
+# the pieces are embedded concurrently.
+OLLAMA_EMBEDDING_BATCH_SIZE = os.environ.get("OLLAMA_EMBEDDING_BATCH_SIZE", "32")
+
+try:
+    OLLAMA_EMBEDDING_BATCH_SIZE = max(int(OLLAMA_EMBEDDING_BATCH_SIZE), 1)
+except Exception:
+    OLLAMA_EMBEDDING_BATCH_SIZE = 32
+
+# Maximum number of embedding requests in flight to Ollama at any time.
+OLLAMA_EMBEDDING_CONCURRENCY = os.environ.get("OLLAMA_EMBEDDING_CONCURRENCY", "4")
+
+try:
+    OLLAMA_EMBEDDING_CONCURRENCY = max(int(OLLAMA_EMBEDDING_CONCURRENCY), 1)
+except Exception:
+    OLLAMA_EMBEDDING_CONCURRENCY = 4
+
+####################################
+# MODELS_CACHE
+####################################
+
+# Seconds the aggregated model list is served from memory before it is rebuilt
+# in the background. Changes such as pulled or edited models reach the other
+# workers at once when WEBSOCKET_MANAGER is redis; otherwise they take up to
+# this long to show on other workers. Set to 0 to rebuild on every request.
+MODELS_CACHE_TTL = os.environ.get("MODELS_CACHE_TTL", "10")
+
+if MODELS_CACHE_TTL == "":
+    MODELS_CACHE_TTL = 0
+else:
+    try:
+        MODELS_CACHE_TTL = float(MODELS_CACHE_TTL)
+    except Exception:
+        MODELS_CACHE_TTL = 10
+
+####################################
+# USER_CACHE
+####################################
+
+# Seconds an authenticated user is served from memory instead of the
+# database. Changes made on another worker take up to this long to apply.
+# Set to 0 to disable.
+USER_CACHE_TTL = os.environ.get("USER_CACHE_TTL", "5")
+
+try:
+    USER_CACHE_TTL = float(USER_CACHE_TTL)
+except Exception:
+    USER_CACHE_TTL = 5
+
+# Minimum seconds between two writes of a user's last_active_at.
+USER_LAST_ACTIVE_UPDATE_INTERVAL = os.environ.get(
+    "USER_LAST_ACTIVE_UPDATE_INTERVAL", "60"
+)
+
+try:
+    USER_LAST_ACTIVE_UPDATE_INTERVAL = float(USER_LAST_ACTIVE_UPDATE_INTERVAL)
+except Exception:
+    USER_LAST_ACTIVE_UPDATE_INTERVAL = 60
+
+####################################
+# PLUGINS_CACHE
+####################################
+
+# Seconds function and tool rows and valves are served from memory. Changes
+# reach the other workers at once when WEBSOCKET_MANAGER is redis; otherwise
+# they take up to this long to apply on other workers. Set to 0 to keep
+# entries until they are changed.
+PLUGINS_CACHE_TTL = os.environ.get("PLUGINS_CACHE_TTL", "30")
+
+try:
+    PLUGINS_CACHE_TTL = float(PLUGINS_CACHE_TTL)
+except Exception:
+    PLUGINS_CACHE_TTL = 30
+
+####################################
+# EMBEDDING_CACHE
+####################################
+
+# Number of query embeddings kept in memory per worker, least recently used
+# evicted first. Set to 0 to disable.
+RAG_EMBEDDING_CACHE_SIZE = os.environ.get("RAG_EMBEDDING_CACHE_SIZE", "1024")
+
+try:
+    RAG_EMBEDDING_CACHE_SIZE = int(RAG_EMBEDDING_CACHE_SIZE)
+except Exception:
+    RAG_EMBEDDING_CACHE_SIZE = 1024
+
+# Optional Redis shared by all workers as a second tier behind the in-memory
+# cache, and the seconds its entries are kept.
+RAG_EMBEDDING_CACHE_REDIS_URL = os.environ.get("RAG_EMBEDDING_CACHE_REDIS_URL", "")
+RAG_EMBEDDING_CACHE_REDIS_TTL = os.environ.get("RAG_EMBEDDING_CACHE_REDIS_TTL", "86400")
+
+try:
+    RAG_EMBEDDING_CACHE_REDIS_TTL = int(RAG_EMBEDDING_CACHE_REDIS_TTL)
+except Exception:
+    RAG_EMBEDDING_CACHE_REDIS_TTL = 86400
+
+# Number of reranking scores of (query, chunk) pairs kept in memory per
+# worker, least recently used evicted first. Set to 0 to disable.
+RAG_RERANKING_SCORE_CACHE_SIZE = os.environ.get(
+    "RAG_RERANKING_SCORE_CACHE_SIZE", "10000"
+)
+
+try:
+    RAG_RERANKING_SCORE_CACHE_SIZE = int(RAG_RERANKING_SCORE_CACHE_SIZE)
+except Exception:
+    RAG_RERANKING_SCORE_CACHE_SIZE = 10000
+
 ####################################
 # OFFLINE_MODE
 ####################################
@@ -29,9 +29,10 @@ from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 from sqlalchemy import text
 from starlette.exceptions import HTTPException as StarletteHTTPException
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import MutableHeaders
 from starlette.middleware.sessions import SessionMiddleware
 from starlette.responses import Response, StreamingResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from open_webui.apps.audio.main import app as audio_app
 from open_webui.apps.images.main import app as images_app
@@ -39,12 +40,14 @@ from open_webui.apps.ollama.main import (
     app as ollama_app,
     get_all_models as get_ollama_models,
     generate_chat_completion as generate_ollama_chat_completion,
+    probe_upstreams as probe_ollama_upstreams,
     GenerateChatCompletionForm,
 )
 from open_webui.apps.openai.main import (
     app as openai_app,
     generate_chat_completion as generate_openai_chat_completion,
     get_all_models as get_openai_models,
+    probe_upstreams as probe_openai_upstreams,
 )
 from open_webui.apps.retrieval.main import app as retrieval_app
 from open_webui.apps.retrieval.utils import get_rag_context, rag_template
@@ -61,7 +64,7 @@ from open_webui.apps.webui.main import (
     get_all_models as get_open_webui_models,
 )
 from open_webui.apps.webui.models.functions import Functions
-from open_webui.apps.webui.models.models import Models
+from open_webui.apps.webui.models.models import ModelModel, Models
 from open_webui.apps.webui.models.users import UserModel, Users
 from open_webui.apps.webui.utils import load_function_module_by_id
 from open_webui.config import (
@@ -105,7 +108,13 @@ from open_webui.env import (
     WEBUI_URL,
     RESET_CONFIG_ON_START,
     OFFLINE_MODE,
+    PIPELINE_FILTER_CONCURRENCY,
+    PIPELINE_FILTER_TIMEOUT,
+    UPSTREAM_HEALTH_CHECK_INTERVAL,
 )
+from open_webui.utils.cache import MODELS_CACHE, PLUGINS_CACHE
+from open_webui.utils.circuit_breaker import UPSTREAM_BREAKERS
+from open_webui.utils.ingestion import INGESTION_QUEUE
 from open_webui.utils.misc import (
     add_or_update_system_message,
     get_last_user_message,
@@ -118,6 +127,7 @@ from open_webui.utils.response import (
     convert_streaming_response_ollama_to_openai,
 )
 from open_webui.utils.security_headers import SecurityHeadersMiddleware
+from open_webui.utils.session_pool import CLIENT_SESSION_POOL
 from open_webui.utils.task import (
     moa_response_generation_template,
     tags_generation_template,
@@ -172,14 +182,39 @@ https://github.com/open-webui/open-webui
 )
 
 
+async def periodic_upstream_health_check():
+    while True:
+        await asyncio.sleep(UPSTREAM_HEALTH_CHECK_INTERVAL)
+        results = await asyncio.gather(
+            probe_ollama_upstreams(),
+            probe_openai_upstreams(),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                log.error(f"Upstream health check failed: {result}")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     if RESET_CONFIG_ON_START:
         reset_config()
 
+    CLIENT_SESSION_POOL.loop = asyncio.get_running_loop()
+    MODELS_CACHE.start()
+    PLUGINS_CACHE.start()
+    INGESTION_QUEUE.start()
+
     asyncio.create_task(periodic_usage_pool_cleanup())
+    if UPSTREAM_HEALTH_CHECK_INTERVAL > 0:
+        asyncio.create_task(periodic_upstream_health_check())
     yield
 
+    await INGESTION_QUEUE.stop()
+    PLUGINS_CACHE.stop()
+    MODELS_CACHE.stop()
+    await CLIENT_SESSION_POOL.close()
+
 
 app = FastAPI(
     docs_url="/docs" if ENV == "dev" else None, redoc_url=None, lifespan=lifespan
@@ -412,7 +447,7 @@ async def chat_completion_tools_handler(
     )
 
     try:
-        payload = filter_pipeline(payload, user)
+        payload = await filter_pipeline(payload, user)
     except Exception as e:
         raise e
 
@@ -491,7 +526,8 @@ async def chat_completion_files_handler(body) -> tuple[dict, dict[str, list]]:
     citations = []
 
     if files := body.get("metadata", {}).get("files", None):
-        contexts, citations = get_rag_context(
+        contexts, citations = await asyncio.to_thread(
+            get_rag_context,
             files=files,
             messages=body["messages"],
             embedding_function=retrieval_app.state.EMBEDDING_FUNCTION,
@@ -513,38 +549,205 @@ def is_chat_completion_request(request):
     )
 
 
-async def get_body_and_model_and_user(request):
-    # Read the original request body
-    body = await request.body()
-    body_str = body.decode("utf-8")
-    body = json.loads(body_str) if body_str else {}
+def get_sorted_filters(model_id):
+    filters = [
+        model
+        for model in app.state.MODELS.values()
+        if "pipeline" in model
+        and "type" in model["pipeline"]
+        and model["pipeline"]["type"] == "filter"
+        and (
+            model["pipeline"]["pipelines"] == ["*"]
+            or any(
+                model_id == target_model_id
+                for target_model_id in model["pipeline"]["pipelines"]
+            )
+        )
+    ]
+    sorted_filters = sorted(filters, key=lambda x: x["pipeline"]["priority"])
+    return sorted_filters
+
+
+# Bounds pipeline filter calls across all requests. Calls within one request
+# stay sequential, as each filter receives the previous filter's output.
+pipeline_filter_semaphore = asyncio.Semaphore(PIPELINE_FILTER_CONCURRENCY)
+
+# Call statistics per pipeline filter and stage, keyed by "<filter id>/<stage>"
+pipeline_filter_timings: dict[str, dict] = {}
 
-    model_id = body["model"]
-    if model_id not in app.state.MODELS:
-        raise Exception("Model not found")
-    model = app.state.MODELS[model_id]
 
-    user = get_current_user(
-        request,
-        get_http_authorization_cred(request.headers.get("Authorization")),
+def record_pipeline_filter_timing(
+    filter_id: str, stage: str, elapsed: float, error: bool
+):
+    timing = pipeline_filter_timings.setdefault(
+        f"{filter_id}/{stage}",
+        {"count": 0, "errors": 0, "total_ms": 0.0, "last_ms": 0.0, "max_ms": 0.0},
     )
+    elapsed_ms = elapsed * 1000
+    timing["count"] += 1
+    timing["errors"] += int(error)
+    timing["total_ms"] += elapsed_ms
+    timing["last_ms"] = elapsed_ms
+    timing["max_ms"] = max(timing["max_ms"], elapsed_ms)
+    log.debug(f"pipeline filter {filter_id} {stage}: {elapsed_ms:.1f} ms")
+
+
+class PipelineFilterError(Exception):
+    """Raised when a pipeline filter rejects a request body."""
+
+    def __init__(self, status_code: int, detail):
+        super().__init__(status_code, detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+async def call_pipeline_filter(filter, stage: str, body: dict, user: dict) -> dict:
+    """
+    Sends `body` through a pipeline filter's inlet or outlet and returns the
+    filtered body. If the filter cannot be reached, the body is returned
+    unchanged; if it rejects the body, PipelineFilterError is raised.
+    """
+    r = None
+    res = None
+    start_time = time.perf_counter()
+    try:
+        urlIdx = filter["urlIdx"]
+
+        url = openai_app.state.config.OPENAI_API_BASE_URLS[urlIdx]
+        key = openai_app.state.config.OPENAI_API_KEYS[urlIdx]
+
+        if key == "":
+            return body
+
+        async with pipeline_filter_semaphore:
+            session = CLIENT_SESSION_POOL.get(url)
+            async with session.post(
+                f"{url}/{filter['id']}/filter/{stage}",
+                headers={"Authorization": f"Bearer {key}"},
+                json={"user": user, "body": body},
+                timeout=aiohttp.ClientTimeout(total=PIPELINE_FILTER_TIMEOUT),
+            ) as r:
+                try:
+                    res = await r.json(content_type=None)
+                except Exception:
+                    res = None
+                r.raise_for_status()
+
+            if res is None:
+                raise Exception("Invalid response from pipeline filter")
+
+        record_pipeline_filter_timing(
+            filter["id"], stage, time.perf_counter() - start_time, False
+        )
+        return res
+    except Exception as e:
+        record_pipeline_filter_timing(
+            filter.get("id"), stage, time.perf_counter() - start_time, True
+        )
+        # Handle connection error here
+        log.error(f"Connection error: {e}")
+
+        if r is not None and isinstance(res, dict) and "detail" in res:
+            raise PipelineFilterError(r.status, res["detail"])
+        return body
+
+
+async def filter_pipeline(payload, user):
+    user = {"id": user.id, "email": user.email, "name": user.name, "role": user.role}
+    model_id = payload["model"]
+    sorted_filters = get_sorted_filters(model_id)
+
+    model = app.state.MODELS[model_id]
+
+    if "pipeline" in model:
+        sorted_filters.append(model)
+
+    for filter in sorted_filters:
+        payload = await call_pipeline_filter(filter, "inlet", payload, user)
+
+    return payload
+
+
+def get_chat_completion_user(request: Request):
+    try:
+        return get_current_user(
+            request,
+            get_http_authorization_cred(request.headers["Authorization"]),
+        )
+    except KeyError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+        )
+
+
+class ChatCompletionMiddleware:
+    """
+    Prepares chat completion requests before they reach the Ollama/OpenAI
+    endpoints: pipeline inlet filters, filter functions, tools and RAG files.
+
+    This is a pure ASGI middleware. The request body is parsed and serialized
+    once, and the response is streamed straight through to the client, with
+    citations prepended to event streams. BaseHTTPMiddleware would instead
+    relay every streamed chunk through an extra task and memory stream.
+    """
 
-    return body, model, user
+    def __init__(self, app: ASGIApp):
+        self.app = app
 
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
 
-class ChatCompletionMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
+        request = Request(scope, receive)
         if not is_chat_completion_request(request):
-            return await call_next(request)
+            return await self.app(scope, receive, send)
         log.debug(f"request.url.path: {request.url.path}")
 
         try:
-            body, model, user = await get_body_and_model_and_user(request)
+            user = get_chat_completion_user(request)
+
+            body = await request.body()
+            body = json.loads(body) if body else {}
         except Exception as e:
-            return JSONResponse(
+            response = JSONResponse(
+                status_code=getattr(e, "status_code", status.HTTP_400_BAD_REQUEST),
+                content={"detail": getattr(e, "detail", str(e))},
+            )
+            return await response(scope, receive, send)
+
+        try:
+            body = await filter_pipeline(body, user)
+        except PipelineFilterError as e:
+            response = JSONResponse(
+                status_code=e.status_code,
+                content={"detail": e.detail},
+            )
+            return await response(scope, receive, send)
+        except Exception as e:
+            if len(e.args) > 1:
+                response = JSONResponse(
+                    status_code=e.args[0],
+                    content={"detail": e.args[1]},
+                )
+            else:
+                response = JSONResponse(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    content={"detail": str(e)},
+                )
+            return await response(scope, receive, send)
+
+        try:
+            model_id = body["model"]
+            if model_id not in app.state.MODELS:
+                raise Exception("Model not found")
+            model = app.state.MODELS[model_id]
+        except Exception as e:
+            response = JSONResponse(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 content={"detail": str(e)},
             )
+            return await response(scope, receive, send)
 
         metadata = {
             "chat_id": body.pop("chat_id", None),
@@ -577,10 +780,11 @@ class ChatCompletionMiddleware(BaseHTTPMiddleware):
                 body, model, extra_params
             )
         except Exception as e:
-            return JSONResponse(
+            response = JSONResponse(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 content={"detail": str(e)},
             )
+            return await response(scope, receive, send)
 
         metadata = {
             **metadata,
@@ -639,189 +843,77 @@ class ChatCompletionMiddleware(BaseHTTPMiddleware):
         if len(citations) > 0:
             data_items.append({"citations": citations})
 
-        modified_body_bytes = json.dumps(body).encode("utf-8")
-        # Replace the request body with the modified one
-        request._body = modified_body_bytes
-        # Set custom header to ensure content-length matches new body length
-        request.headers.__dict__["_list"] = [
-            (b"content-length", str(len(modified_body_bytes)).encode("utf-8")),
-            *[(k, v) for k, v in request.headers.raw if k.lower() != b"content-length"],
-        ]
-
-        response = await call_next(request)
-        if not isinstance(response, StreamingResponse):
-            return response
-
-        content_type = response.headers["Content-Type"]
-        is_openai = "text/event-stream" in content_type
-        is_ollama = "application/x-ndjson" in content_type
-        if not is_openai and not is_ollama:
-            return response
-
-        def wrap_item(item):
-            return f"data: {item}\n\n" if is_openai else f"{item}\n"
-
-        async def stream_wrapper(original_generator, data_items):
-            for item in data_items:
-                yield wrap_item(json.dumps(item))
-
-            async for data in original_generator:
-                yield data
-
-        return StreamingResponse(
-            stream_wrapper(response.body_iterator, data_items),
-            headers=dict(response.headers),
-        )
-
-    async def _receive(self, body: bytes):
-        return {"type": "http.request", "body": body, "more_body": False}
-
-
-app.add_middleware(ChatCompletionMiddleware)
-
-
-##################################
-#
-# Pipeline Middleware
-#
-##################################
-
-
-def get_sorted_filters(model_id):
-    filters = [
-        model
-        for model in app.state.MODELS.values()
-        if "pipeline" in model
-        and "type" in model["pipeline"]
-        and model["pipeline"]["type"] == "filter"
-        and (
-            model["pipeline"]["pipelines"] == ["*"]
-            or any(
-                model_id == target_model_id
-                for target_model_id in model["pipeline"]["pipelines"]
-            )
-        )
-    ]
-    sorted_filters = sorted(filters, key=lambda x: x["pipeline"]["priority"])
-    return sorted_filters
-
-
-def filter_pipeline(payload, user):
-    user = {"id": user.id, "email": user.email, "name": user.name, "role": user.role}
-    model_id = payload["model"]
-    sorted_filters = get_sorted_filters(model_id)
-
-    model = app.state.MODELS[model_id]
-
-    if "pipeline" in model:
-        sorted_filters.append(model)
-
-    for filter in sorted_filters:
-        r = None
-        try:
-            urlIdx = filter["urlIdx"]
-
-            url = openai_app.state.config.OPENAI_API_BASE_URLS[urlIdx]
-            key = openai_app.state.config.OPENAI_API_KEYS[urlIdx]
-
-            if key == "":
-                continue
-
-            headers = {"Authorization": f"Bearer {key}"}
-            r = requests.post(
-                f"{url}/{filter['id']}/filter/inlet",
-                headers=headers,
-                json={
-                    "user": user,
-                    "body": payload,
-                },
-            )
-
-            r.raise_for_status()
-            payload = r.json()
-        except Exception as e:
-            # Handle connection error here
-            print(f"Connection error: {e}")
-
-            if r is not None:
-                res = r.json()
-                if "detail" in res:
-                    raise Exception(r.status_code, res["detail"])
-
-    return payload
-
-
-class PipelineMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        if not is_chat_completion_request(request):
-            return await call_next(request)
-
-        log.debug(f"request.url.path: {request.url.path}")
-
-        # Read the original request body
-        body = await request.body()
-        # Decode body to string
-        body_str = body.decode("utf-8")
-        # Parse string to JSON
-        data = json.loads(body_str) if body_str else {}
+        body_bytes = json.dumps(body).encode("utf-8")
+        # Replace the content-length header to match the modified body
+        scope = {
+            **scope,
+            "headers": [
+                (b"content-length", str(len(body_bytes)).encode("utf-8")),
+                *[
+                    (k, v)
+                    for k, v in scope["headers"]
+                    if k.lower() != b"content-length"
+                ],
+            ],
+        }
 
-        try:
-            user = get_current_user(
-                request,
-                get_http_authorization_cred(request.headers["Authorization"]),
+        body_sent = False
+
+        async def receive_body():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body_bytes, "more_body": False}
+            # Let the endpoint keep listening for client disconnects
+            return await receive()
+
+        if not data_items:
+            return await self.app(scope, receive_body, send)
+
+        async def send_with_data_items(message: Message):
+            if message["type"] != "http.response.start":
+                return await send(message)
+
+            headers = MutableHeaders(raw=list(message["headers"]))
+            content_type = headers.get("Content-Type", "")
+            is_openai = "text/event-stream" in content_type
+            is_ollama = "application/x-ndjson" in content_type
+            if not is_openai and not is_ollama:
+                return await send(message)
+
+            def wrap_item(item):
+                return f"data: {item}\n\n" if is_openai else f"{item}\n"
+
+            # The prepended items change the length of the body
+            del headers["Content-Length"]
+            await send({**message, "headers": headers.raw})
+            await send(
+                {
+                    "type": "http.response.body",
+                    "body": "".join(
+                        wrap_item(json.dumps(item)) for item in data_items
+                    ).encode("utf-8"),
+                    "more_body": True,
+                }
             )
-        except KeyError as e:
-            if len(e.args) > 1:
-                return JSONResponse(
-                    status_code=e.args[0],
-                    content={"detail": e.args[1]},
-                )
-            else:
-                return JSONResponse(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    content={"detail": "Not authenticated"},
-                )
 
-        try:
-            data = filter_pipeline(data, user)
-        except Exception as e:
-            if len(e.args) > 1:
-                return JSONResponse(
-                    status_code=e.args[0],
-                    content={"detail": e.args[1]},
-                )
-            else:
-                return JSONResponse(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    content={"detail": str(e)},
-                )
-
-        modified_body_bytes = json.dumps(data).encode("utf-8")
-        # Replace the request body with the modified one
-        request._body = modified_body_bytes
-        # Set custom header to ensure content-length matches new body length
-        request.headers.__dict__["_list"] = [
-            (b"content-length", str(len(modified_body_bytes)).encode("utf-8")),
-            *[(k, v) for k, v in request.headers.raw if k.lower() != b"content-length"],
-        ]
+        await self.app(scope, receive_body, send_with_data_items)
 
-        response = await call_next(request)
-        return response
 
-    async def _receive(self, body: bytes):
-        return {"type": "http.request", "body": body, "more_body": False}
-
-
-app.add_middleware(PipelineMiddleware)
+app.add_middleware(ChatCompletionMiddleware)
 
 
 from urllib.parse import urlencode, parse_qs, urlparse
 
 
-class RedirectMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
+class RedirectMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
         # Check if the request is a GET request
-        if request.method == "GET":
+        if scope["type"] == "http" and scope["method"] == "GET":
+            request = Request(scope)
             path = request.url.path
             query_params = dict(parse_qs(urlparse(str(request.url)).query))
 
@@ -830,11 +922,11 @@ class RedirectMiddleware(BaseHTTPMiddleware):
                 video_id = query_params["v"][0]  # Extract the first 'v' parameter
                 encoded_video_id = urlencode({"youtube": video_id})
                 redirect_url = f"/?{encoded_video_id}"
-                return RedirectResponse(url=redirect_url)
+                response = RedirectResponse(url=redirect_url)
+                return await response(scope, receive, send)
 
         # Proceed with the normal flow of other requests
-        response = await call_next(request)
-        return response
+        await self.app(scope, receive, send)
 
 
 # Add the middleware to the app
@@ -852,53 +944,62 @@ app.add_middleware(
 app.add_middleware(SecurityHeadersMiddleware)
 
 
-@app.middleware("http")
-async def commit_session_after_request(request: Request, call_next):
-    response = await call_next(request)
-    log.debug("Commit session after request")
-    Session.commit()
-    return response
+class RequestHooksMiddleware:
+    """
+    Per-request hooks of the app, from the outside in:
 
+    - rejects socket.io websocket requests without upgrade headers
+    - points the webui app at the embedding function after it is updated
+    - loads the model list if it is empty and sets X-Process-Time
+    - commits the database session once the response is sent
+
+    This is a pure ASGI middleware, so streamed responses are passed through
+    as they are instead of through a task and memory stream per hook.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        request = Request(scope)
+        if (
+            "/ws/socket.io" in request.url.path
+            and request.query_params.get("transport") == "websocket"
+        ):
+            upgrade = (request.headers.get("Upgrade") or "").lower()
+            connection = (request.headers.get("Connection") or "").lower().split(",")
+            # Check that there's the correct headers for an upgrade, else reject the connection
+            # This is to work around this upstream issue: https://github.com/miguelgrinberg/python-engineio/issues/367
+            if upgrade != "websocket" or "upgrade" not in connection:
+                response = JSONResponse(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    content={"detail": "Invalid WebSocket upgrade request"},
+                )
+                return await response(scope, receive, send)
+
+        if len(app.state.MODELS) == 0:
+            await get_all_models()
+
+        start_time = int(time.time())
+
+        async def send_with_process_time(message: Message):
+            if message["type"] == "http.response.start":
+                process_time = int(time.time()) - start_time
+                MutableHeaders(scope=message)["X-Process-Time"] = str(process_time)
+            await send(message)
+
+        await self.app(scope, receive, send_with_process_time)
+        log.debug("Commit session after request")
+        Session.commit()
+
+        if "/embedding/update" in request.url.path:
+            webui_app.state.EMBEDDING_FUNCTION = retrieval_app.state.EMBEDDING_FUNCTION
 
-@app.middleware("http")
-async def check_url(request: Request, call_next):
-    if len(app.state.MODELS) == 0:
-        await get_all_models()
-    else:
-        pass
-
-    start_time = int(time.time())
-    response = await call_next(request)
-    process_time = int(time.time()) - start_time
-    response.headers["X-Process-Time"] = str(process_time)
-
-    return response
-
-
-@app.middleware("http")
-async def update_embedding_function(request: Request, call_next):
-    response = await call_next(request)
-    if "/embedding/update" in request.url.path:
-        webui_app.state.EMBEDDING_FUNCTION = retrieval_app.state.EMBEDDING_FUNCTION
-    return response
-
-
-@app.middleware("http")
-async def inspect_websocket(request: Request, call_next):
-    if (
-        "/ws/socket.io" in request.url.path
-        and request.query_params.get("transport") == "websocket"
-    ):
-        upgrade = (request.headers.get("Upgrade") or "").lower()
-        connection = (request.headers.get("Connection") or "").lower().split(",")
-        # Check that there's the correct headers for an upgrade, else reject the connection
-        # This is to work around this upstream issue: https://github.com/miguelgrinberg/python-engineio/issues/367
-        if upgrade != "websocket" or "upgrade" not in connection:
-            return JSONResponse(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                content={"detail": "Invalid WebSocket upgrade request"},
-            )
-    return await call_next(request)
+
+app.add_middleware(RequestHooksMiddleware)
 
 
 app.mount("/ws", socket_app)
@@ -916,6 +1017,72 @@ webui_app.state.EMBEDDING_FUNCTION = retrieval_app.state.EMBEDDING_FUNCTION
 
 
 async def get_all_models():
+    return await MODELS_CACHE.get(build_all_models)
+
+
+def merge_custom_models(models: list[dict], custom_models: list[ModelModel]):
+    """
+    Applies the custom models to `models` in place. Custom models without a
+    base model rename and describe the models they match, the others are
+    appended as presets owned by the owner of their base model, which can be
+    a preset appended before them. Models are matched by full id or by base
+    name (the id without its ":tag"), the first one in `models` winning.
+    """
+    # Index models by full id and by base name, keeping list order
+    models_index = {}
+
+    def index_model(model):
+        models_index.setdefault(model["id"], []).append(model)
+        base_name = model["id"].split(":")[0]
+        if base_name != model["id"]:
+            models_index.setdefault(base_name, []).append(model)
+
+    for model in models:
+        index_model(model)
+
+    for custom_model in custom_models:
+        if custom_model.base_model_id is None:
+            for model in models_index.get(custom_model.id, []):
+                model["name"] = custom_model.name
+                model["info"] = custom_model.model_dump()
+
+                action_ids = []
+                if "info" in model and "meta" in model["info"]:
+                    action_ids.extend(model["info"]["meta"].get("actionIds", []))
+
+                model["action_ids"] = action_ids
+        else:
+            owned_by = "openai"
+            pipe = None
+            action_ids = []
+
+            base_models = models_index.get(custom_model.base_model_id, [])
+            if base_models:
+                owned_by = base_models[0]["owned_by"]
+                if "pipe" in base_models[0]:
+                    pipe = base_models[0]["pipe"]
+
+            if custom_model.meta:
+                meta = custom_model.meta.model_dump()
+                if "actionIds" in meta:
+                    action_ids.extend(meta["actionIds"])
+
+            preset = {
+                "id": custom_model.id,
+                "name": custom_model.name,
+                "object": "model",
+                "created": custom_model.created_at,
+                "owned_by": owned_by,
+                "info": custom_model.model_dump(),
+                "preset": True,
+                **({"pipe": pipe} if pipe is not None else {}),
+                "action_ids": action_ids,
+            }
+            models.append(preset)
+            index_model(preset)
+
+
+async def build_all_models():
     # TODO: Optimize this function
     open_webui_models = []
     openai_models = []
@@ -947,63 +1114,60 @@ async def get_all_models():
     if len([model for model in models if model["owned_by"] != "arena"]) == 0:
         return []
 
-    global_action_ids = [
-        function.id for function in Functions.get_global_action_functions()
-    ]
-    enabled_action_ids = [
-        function.id
+    enabled_actions = {
+        function.id: function
         for function in Functions.get_functions_by_type("action", active_only=True)
+    }
+    global_action_ids = [
+        action_id for action_id, action in enabled_actions.items() if action.is_global
     ]
 
-    custom_models = Models.get_all_models()
-    for custom_model in custom_models:
-        if custom_model.base_model_id is None:
-            for model in models:
-                if (
-                    custom_model.id == model["id"]
-                    or custom_model.id == model["id"].split(":")[0]
-                ):
-                    model["name"] = custom_model.name
-                    model["info"] = custom_model.model_dump()
-
-                    action_ids = []
-                    if "info" in model and "meta" in model["info"]:
-                        action_ids.extend(model["info"]["meta"].get("actionIds", []))
-
-                    model["action_ids"] = action_ids
-        else:
-            owned_by = "openai"
-            pipe = None
-            action_ids = []
+    merge_custom_models(models, Models.get_all_models())
 
-            for model in models:
-                if (
-                    custom_model.base_model_id == model["id"]
-                    or custom_model.base_model_id == model["id"].split(":")[0]
-                ):
-                    owned_by = model["owned_by"]
-                    if "pipe" in model:
-                        pipe = model["pipe"]
-                    break
+    action_manifests = {}
 
-            if custom_model.meta:
-                meta = custom_model.meta.model_dump()
-                if "actionIds" in meta:
-                    action_ids.extend(meta["actionIds"])
+    def get_action_manifest(action_id):
+        if action_id in action_manifests:
+            return action_manifests[action_id]
 
-            models.append(
+        action = enabled_actions[action_id]
+        if action_id in webui_app.state.FUNCTIONS:
+            function_module = webui_app.state.FUNCTIONS[action_id]
+        else:
+            function_module, _, _ = load_function_module_by_id(action_id)
+            webui_app.state.FUNCTIONS[action_id] = function_module
+
+        __webui__ = False
+        if hasattr(function_module, "__webui__"):
+            __webui__ = function_module.__webui__
+
+        if hasattr(function_module, "actions"):
+            actions = function_module.actions
+            manifest = [
                 {
-                    "id": custom_model.id,
-                    "name": custom_model.name,
-                    "object": "model",
-                    "created": custom_model.created_at,
-                    "owned_by": owned_by,
-                    "info": custom_model.model_dump(),
-                    "preset": True,
-                    **({"pipe": pipe} if pipe is not None else {}),
-                    "action_ids": action_ids,
+                    "id": f"{action_id}.{_action['id']}",
+                    "name": _action.get("name", f"{action.name} ({_action['id']})"),
+                    "description": action.meta.description,
+                    "icon_url": _action.get(
+                        "icon_url", action.meta.manifest.get("icon_url", None)
+                    ),
+                    **({"__webui__": __webui__} if __webui__ else {}),
                 }
-            )
+                for _action in actions
+            ]
+        else:
+            manifest = [
+                {
+                    "id": action_id,
+                    "name": action.name,
+                    "description": action.meta.description,
+                    "icon_url": action.meta.manifest.get("icon_url", None),
+                    **({"__webui__": __webui__} if __webui__ else {}),
+                }
+            ]
+
+        action_manifests[action_id] = manifest
+        return manifest
 
     for model in models:
         action_ids = []
@@ -1014,53 +1178,12 @@ async def get_all_models():
         action_ids = action_ids + global_action_ids
         action_ids = list(set(action_ids))
         action_ids = [
-            action_id for action_id in action_ids if action_id in enabled_action_ids
+            action_id for action_id in action_ids if action_id in enabled_actions
         ]
 
         model["actions"] = []
         for action_id in action_ids:
-            action = Functions.get_function_by_id(action_id)
-            if action is None:
-                raise Exception(f"Action not found: {action_id}")
-
-            if action_id in webui_app.state.FUNCTIONS:
-                function_module = webui_app.state.FUNCTIONS[action_id]
-            else:
-                function_module, _, _ = load_function_module_by_id(action_id)
-                webui_app.state.FUNCTIONS[action_id] = function_module
-
-            __webui__ = False
-            if hasattr(function_module, "__webui__"):
-                __webui__ = function_module.__webui__
-
-            if hasattr(function_module, "actions"):
-                actions = function_module.actions
-                model["actions"].extend(
-                    [
-                        {
-                            "id": f"{action_id}.{_action['id']}",
-                            "name": _action.get(
-                                "name", f"{action.name} ({_action['id']})"
-                            ),
-                            "description": action.meta.description,
-                            "icon_url": _action.get(
-                                "icon_url", action.meta.manifest.get("icon_url", None)
-                            ),
-                            **({"__webui__": __webui__} if __webui__ else {}),
-                        }
-                        for _action in actions
-                    ]
-                )
-            else:
-                model["actions"].append(
-                    {
-                        "id": action_id,
-                        "name": action.name,
-                        "description": action.meta.description,
-                        "icon_url": action.meta.manifest.get("icon_url", None),
-                        **({"__webui__": __webui__} if __webui__ else {}),
-                    }
-                )
+            model["actions"].extend(get_action_manifest(action_id))
 
     app.state.MODELS = {model["id"]: model for model in models}
     webui_app.state.MODELS = app.state.MODELS
@@ -1196,48 +1319,23 @@ async def chat_completed(form_data: dict, user=Depends(get_verified_user)):
         sorted_filters = [model] + sorted_filters
 
     for filter in sorted_filters:
-        r = None
         try:
-            urlIdx = filter["urlIdx"]
-
-            url = openai_app.state.config.OPENAI_API_BASE_URLS[urlIdx]
-            key = openai_app.state.config.OPENAI_API_KEYS[urlIdx]
-
-            if key != "":
-                headers = {"Authorization": f"Bearer {key}"}
-                r = requests.post(
-                    f"{url}/{filter['id']}/filter/outlet",
-                    headers=headers,
-                    json={
-                        "user": {
-                            "id": user.id,
-                            "name": user.name,
-                            "email": user.email,
-                            "role": user.role,
-                        },
-                        "body": data,
-                    },
-                )
-
-                r.raise_for_status()
-                data = r.json()
-        except Exception as e:
-            # Handle connection error here
-            print(f"Connection error: {e}")
-
-            if r is not None:
-                try:
-                    res = r.json()
-                    if "detail" in res:
-                        return JSONResponse(
-                            status_code=r.status_code,
-                            content=res,
-                        )
-                except Exception:
-                    pass
-
-            else:
-                pass
+            data = await call_pipeline_filter(
+                filter,
+                "outlet",
+                data,
+                {
+                    "id": user.id,
+                    "name": user.name,
+                    "email": user.email,
+                    "role": user.role,
+                },
+            )
+        except PipelineFilterError as e:
+            return JSONResponse(
+                status_code=e.status_code,
+                content={"detail": e.detail},
+            )
 
     __event_emitter__ = get_event_emitter(
         {
@@ -1581,7 +1679,7 @@ Artificial Intelligence in Healthcare
 
     # Handle pipeline filters
     try:
-        payload = filter_pipeline(payload, user)
+        payload = await filter_pipeline(payload, user)
     except Exception as e:
         if len(e.args) > 1:
             return JSONResponse(
@@ -1650,7 +1748,7 @@ JSON format: { "tags": ["tag1", "tag2", "tag3"] }
 
     # Handle pipeline filters
     try:
-        payload = filter_pipeline(payload, user)
+        payload = await filter_pipeline(payload, user)
     except Exception as e:
         if len(e.args) > 1:
             return JSONResponse(
@@ -1727,7 +1825,7 @@ Search Query:"""
 
     # Handle pipeline filters
     try:
-        payload = filter_pipeline(payload, user)
+        payload = await filter_pipeline(payload, user)
     except Exception as e:
         if len(e.args) > 1:
             return JSONResponse(
@@ -1795,7 +1893,7 @@ Message: """{{prompt}}"""
 
     # Handle pipeline filters
     try:
-        payload = filter_pipeline(payload, user)
+        payload = await filter_pipeline(payload, user)
     except Exception as e:
         if len(e.args) > 1:
             return JSONResponse(
@@ -1856,7 +1954,7 @@ Responses from models: {{responses}}"""
     log.debug(payload)
 
     try:
-        payload = filter_pipeline(payload, user)
+        payload = await filter_pipeline(payload, user)
     except Exception as e:
         if len(e.args) > 1:
             return JSONResponse(
@@ -1906,6 +2004,17 @@ async def get_pipelines_list(user=Depends(get_admin_user)):
     }
 
 
+@app.get("/api/pipelines/timings")
+async def get_pipeline_filter_timings(user=Depends(get_admin_user)):
+    return {
+        key: {
+            **timing,
+            "avg_ms": timing["total_ms"] / timing["count"] if timing["count"] else 0,
+        }
+        for key, timing in pipeline_filter_timings.items()
+    }
+
+
 @app.post("/api/pipelines/upload")
 async def upload_pipeline(
     urlIdx: int = Form(...), file: UploadFile = File(...), user=Depends(get_admin_user)
@@ -1940,6 +2049,7 @@ async def upload_pipeline(
         r.raise_for_status()
         data = r.json()
 
+        MODELS_CACHE.invalidate()
         return {**data}
     except Exception as e:
         # Handle connection error here
@@ -1988,6 +2098,7 @@ async def add_pipeline(form_data: AddPipelineForm, user=Depends(get_admin_user))
         r.raise_for_status()
         data = r.json()
 
+        MODELS_CACHE.invalidate()
         return {**data}
     except Exception as e:
         # Handle connection error here
@@ -2030,6 +2141,7 @@ async def delete_pipeline(form_data: DeletePipelineForm, user=Depends(get_admin_
         r.raise_for_status()
         data = r.json()
 
+        MODELS_CACHE.invalidate()
         return {**data}
     except Exception as e:
         # Handle connection error here
@@ -2180,6 +2292,7 @@ async def update_pipeline_valves(
         r.raise_for_status()
         data = r.json()
 
+        MODELS_CACHE.invalidate()
         return {**data}
     except Exception as e:
         # Handle connection error here
@@ -2319,6 +2432,18 @@ async def update_webhook_url(form_data: UrlForm, user=Depends(get_admin_user)):
     return {"url": app.state.config.WEBHOOK_URL}
 
 
+@app.get("/api/upstreams/health")
+async def get_upstreams_health(user=Depends(get_admin_user)):
+    return {
+        "ollama": UPSTREAM_BREAKERS.get_metrics(
+            ollama_app.state.config.OLLAMA_BASE_URLS
+        ),
+        "openai": UPSTREAM_BREAKERS.get_metrics(
+            openai_app.state.config.OPENAI_API_BASE_URLS
+        ),
+    }
+
+
 @app.get("/api/version")
 async def get_app_version():
     return {
@@ -0,0 +1,47 @@
+"""Add file job table
+
+Revision ID: 3e0e00844bb0
+Revises: 4ace53fd72c8
+Create Date: 2024-10-28 09:12:41.530127
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# Revision identifiers, used by Alembic.
+revision = "3e0e00844bb0"
+down_revision = "4ace53fd72c8"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # ### Create file_job table ###
+    op.create_table(
+        "file_job",
+        sa.Column("id", sa.Text(), primary_key=True),  # Unique job ID
+        sa.Column("file_id", sa.Text(), nullable=False),  # File being processed
+        sa.Column("user_id", sa.Text(), nullable=False),  # Owner of the file
+        sa.Column(
+            "status", sa.Text(), nullable=False
+        ),  # pending, processing, completed or failed
+        sa.Column(
+            "attempts", sa.BigInteger(), nullable=False, default=0
+        ),  # Number of times the job was started
+        sa.Column("error", sa.Text(), nullable=True),  # Error of the last attempt
+        sa.Column(
+            "run_after", sa.BigInteger(), nullable=False
+        ),  # Pending jobs are not started before this epoch
+        sa.Column("created_at", sa.BigInteger(), nullable=False),
+        sa.Column("updated_at", sa.BigInteger(), nullable=False),
+    )
+    op.create_index("file_job_file_id_idx", "file_job", ["file_id"])
+    op.create_index("file_job_status_idx", "file_job", ["status", "run_after"])
+
+
+def downgrade():
+    # ### Drop file_job table ###
+    op.drop_index("file_job_status_idx", table_name="file_job")
+    op.drop_index("file_job_file_id_idx", table_name="file_job")
+    op.drop_table("file_job")
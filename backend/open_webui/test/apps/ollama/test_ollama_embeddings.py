@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from open_webui.apps.ollama import main as ollama_main
+from open_webui.apps.ollama.main import (
+    GenerateEmbedForm,
+    generate_ollama_batch_embeddings,
+)
+
+
+@pytest.fixture
+def requests(monkeypatch):
+    requests = []
+
+    async def send_embedding_request(url_idx, path, payload):
+        requests.append((url_idx, payload["input"]))
+        # Later batches finish first, the results must still be in order
+        await asyncio.sleep(0.01 / len(requests))
+        return {
+            "model": payload["model"],
+            "embeddings": [[float(text)] for text in payload["input"]],
+            "total_duration": 10,
+            "prompt_eval_count": len(payload["input"]),
+        }
+
+    monkeypatch.setattr(ollama_main, "send_embedding_request", send_embedding_request)
+    monkeypatch.setattr(ollama_main, "get_model_url_idx", lambda model: 1)
+    return requests
+
+
+def embed(input, **kwargs):
+    form_data = GenerateEmbedForm(model="nomic-embed-text", input=input)
+    return asyncio.run(generate_ollama_batch_embeddings(form_data, **kwargs))
+
+
+class TestGenerateOllamaBatchEmbeddings:
+    def test_large_input_is_split_into_batches(self, requests):
+        texts = [str(i) for i in range(7)]
+        data = embed(texts, batch_size=3)
+
+        assert sorted(batch for _, batch in requests) == [
+            ["0", "1", "2"],
+            ["3", "4", "5"],
+            ["6"],
+        ]
+        assert data["embeddings"] == [[float(i)] for i in range(7)]
+        assert data["total_duration"] == 30
+        assert data["prompt_eval_count"] == 7
+        assert data["model"] == "nomic-embed-text"
+
+    def test_small_input_is_sent_as_is(self, requests):
+        data = embed(["0", "1"], batch_size=3)
+        assert requests == [(1, ["0", "1"])]
+        assert data["prompt_eval_count"] == 2
+
+        embed("2", batch_size=3)
+        assert requests[-1] == (1, "2")
+
+    def test_url_idx_overrides_routing(self, requests):
+        embed(["0", "1", "2"], url_idx=0, batch_size=2)
+        assert [idx for idx, _ in requests] == [0, 0]
+
+    def test_failed_batch_fails_the_call(self, requests, monkeypatch):
+        async def send_embedding_request(url_idx, path, payload):
+            if "1" in payload["input"]:
+                raise HTTPException(status_code=500, detail="Ollama: out of memory")
+            return {"embeddings": [[0.0] for _ in payload["input"]]}
+
+        monkeypatch.setattr(
+            ollama_main, "send_embedding_request", send_embedding_request
+        )
+        with pytest.raises(Exception, match="Ollama: out of memory"):
+            embed(["0", "1", "2"], batch_size=1)
+
+    def test_missing_embeddings_fail_the_call(self, monkeypatch):
+        async def send_embedding_request(url_idx, path, payload):
+            return {}
+
+        monkeypatch.setattr(
+            ollama_main, "send_embedding_request", send_embedding_request
+        )
+        monkeypatch.setattr(ollama_main, "get_model_url_idx", lambda model: 0)
+        with pytest.raises(Exception, match="Server Connection Error"):
+            embed(["0"])
@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+from open_webui.apps.ollama.main import get_model_name, stream_content
+from open_webui.utils.circuit_breaker import CircuitBreakerRegistry
+from open_webui.utils.routing import UpstreamRouter
+
+URL = "http://ollama"
+
+
+class FakeResponse:
+    def __init__(self, chunks, error=None):
+        self.chunks = chunks
+        self.error = error
+        self.released = False
+
+    @property
+    def content(self):
+        async def content():
+            for chunk in self.chunks:
+                yield chunk
+            if self.error:
+                raise self.error
+
+        return content()
+
+    def release(self):
+        self.released = True
+
+
+@pytest.fixture
+def router():
+    return UpstreamRouter(
+        breakers=CircuitBreakerRegistry(failure_threshold=1, reset_timeout=30)
+    )
+
+
+async def consume(stream, limit=None):
+    chunks = []
+    async for chunk in stream:
+        chunks.append(chunk)
+        if len(chunks) == limit:
+            break
+    return chunks
+
+
+class TestStreamContent:
+    def test_finishes_when_stream_ends(self, router):
+        r = FakeResponse([b"a", b"b"])
+        tracker = router.track(URL, "llama3:latest")
+
+        assert asyncio.run(consume(stream_content(r, tracker))) == [b"a", b"b"]
+        stats = router.get_stats(URL)
+        assert stats.in_flight == 0
+        assert stats.errors == 0
+        assert "llama3:latest" in stats.models
+        assert r.released
+
+    def test_stream_failing_midway_is_an_error(self, router):
+        r = FakeResponse([b"a"], error=ConnectionResetError())
+        tracker = router.track(URL, "llama3:latest")
+
+        with pytest.raises(ConnectionResetError):
+            asyncio.run(consume(stream_content(r, tracker)))
+        stats = router.get_stats(URL)
+        assert stats.in_flight == 0
+        assert stats.errors == 1
+        assert not router.breakers.allow(URL)
+        assert r.released
+
+    def test_client_disconnect_finishes_without_error(self, router):
+        r = FakeResponse([b"a", b"b", b"c"])
+        tracker = router.track(URL, "llama3:latest")
+
+        async def main():
+            stream = stream_content(r, tracker)
+            assert await consume(stream, limit=1) == [b"a"]
+            await stream.aclose()
+
+        asyncio.run(main())
+        stats = router.get_stats(URL)
+        assert stats.in_flight == 0
+        assert stats.errors == 0
+        assert r.released
+
+
+def test_get_model_name():
+    assert get_model_name("llama3") == "llama3:latest"
+    assert get_model_name("llama3:8b") == "llama3:8b"
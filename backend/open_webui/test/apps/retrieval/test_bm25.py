@@ -0,0 +1,145 @@
+import os
+
+import pytest
+
+from open_webui.apps.retrieval.bm25 import (
+    LOG_FILE,
+    SNAPSHOT_FILE,
+    BM25Index,
+    BM25IndexStore,
+)
+
+ITEMS = [
+    {"id": "1", "text": "apple pie with apple sauce", "metadata": {"file_id": "a"}},
+    {"id": "2", "text": "banana bread", "metadata": {"file_id": "b"}},
+    {"id": "3", "text": "apple and banana smoothie", "metadata": {"file_id": "b"}},
+]
+
+
+def not_called():
+    raise AssertionError("The index should not be rebuilt")
+
+
+class TestBM25Index:
+    def test_search_ranks_by_term_frequency(self):
+        index = BM25Index()
+        index.add(ITEMS)
+
+        results = index.search("apple", 10)
+        assert [id for id, _ in results] == ["1", "3"]
+        assert results[0][1] > results[1][1] > 0
+        assert index.search("cherry", 10) == []
+        assert len(index.search("apple banana", 1)) == 1
+
+    def test_add_replaces_existing_chunks(self):
+        index = BM25Index()
+        index.add(ITEMS)
+        index.add([{"id": "1", "text": "cherry tart", "metadata": {}}])
+
+        assert [id for id, _ in index.search("apple", 10)] == ["3"]
+        assert [id for id, _ in index.search("cherry", 10)] == ["1"]
+        assert index.total_length == sum(index.lengths.values())
+
+    def test_delete_by_ids_and_filter(self):
+        index = BM25Index()
+        index.add(ITEMS)
+
+        index.delete(ids=["1", "missing"])
+        assert set(index.docs) == {"2", "3"}
+
+        index.delete(filter={"file_id": "b"})
+        assert index.docs == {}
+        assert index.postings == {}
+        assert index.total_length == 0
+
+    def test_state_round_trip(self):
+        index = BM25Index(k1=1.2, b=0.5)
+        index.add(ITEMS)
+
+        restored = BM25Index.from_state(index.get_state())
+        assert restored.search("apple banana", 10) == index.search("apple banana", 10)
+
+
+class TestBM25IndexStore:
+    @pytest.fixture
+    def path(self, tmp_path):
+        return str(tmp_path / "bm25")
+
+    def test_builds_index_from_loader_once(self, path):
+        store = BM25IndexStore(path)
+
+        results = store.search("collection", "banana", 10, lambda: ITEMS)
+        assert [result["id"] for result in results] == ["2", "3"]
+        assert results[0]["text"] == "banana bread"
+        assert results[0]["metadata"] == {"file_id": "b"}
+
+        assert len(store.search("collection", "apple", 10, not_called)) == 2
+
+    def test_missing_collection(self, path):
+        store = BM25IndexStore(path)
+
+        assert store.search("missing", "apple", 10, lambda: None) == []
+        assert os.listdir(path) == []
+
+    def test_changes_without_index_are_ignored(self, path):
+        store = BM25IndexStore(path)
+        store.add("collection", ITEMS)
+
+        assert not os.path.exists(path)
+
+    def test_changes_are_replayed_by_other_workers(self, path):
+        writer = BM25IndexStore(path)
+        reader = BM25IndexStore(path)
+        writer.create("collection", ITEMS)
+        assert len(reader.search("collection", "apple", 10, not_called)) == 2
+
+        writer.add("collection", [{"id": "4", "text": "apple crumble"}])
+        writer.delete("collection", filter={"file_id": "a"})
+
+        results = reader.search("collection", "apple", 10, not_called)
+        assert [result["id"] for result in results] == ["4", "3"]
+
+    def test_log_is_compacted_into_snapshot(self, path):
+        store = BM25IndexStore(path)
+        reader = BM25IndexStore(path)
+        store.create("collection", ITEMS)
+        reader.search("collection", "apple", 10, not_called)
+
+        for i in range(20):
+            store.add("collection", [{"id": f"new-{i}", "text": f"cherry {i}"}])
+
+        directory = store._dir("collection")
+        log_size = os.path.getsize(os.path.join(directory, LOG_FILE))
+        assert log_size <= os.path.getsize(os.path.join(directory, SNAPSHOT_FILE))
+
+        # A reader that was behind picks up the new snapshot
+        assert len(reader.search("collection", "cherry", 100, not_called)) == 20
+
+    def test_changes_made_while_building_are_kept(self, path):
+        store = BM25IndexStore(path)
+
+        def loader():
+            # Written to the vector database after it was read
+            store.add("collection", [{"id": "4", "text": "apple crumble"}])
+            store.delete("collection", ids=["1"])
+            return ITEMS
+
+        results = store.search("collection", "apple", 10, loader)
+        assert sorted(result["id"] for result in results) == ["3", "4"]
+        assert os.path.getsize(os.path.join(store._dir("collection"), LOG_FILE)) == 0
+
+    def test_delete_collection(self, path):
+        store = BM25IndexStore(path)
+        store.create("collection", ITEMS)
+        store.search("collection", "apple", 10, not_called)
+
+        store.delete_collection("collection")
+        assert store.search("collection", "apple", 10, lambda: None) == []
+        assert store._write_locks == {}
+
+    def test_collection_names_are_not_paths(self, path):
+        store = BM25IndexStore(path)
+        store.create("../collection", ITEMS)
+
+        assert os.listdir(os.path.dirname(path)) == ["bm25"]
+        assert len(os.listdir(path)) == 1
@@ -0,0 +1,82 @@
+import time
+
+import numpy as np
+import pytest
+
+from open_webui.apps.retrieval.embedding_store import EmbeddingStore
+
+
+class FakeEmbeddingFunction:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts: list[str]) -> list[list[float]]:
+        self.calls.append(texts)
+        return [[float(len(text)), float(ord(text[0]))] for text in texts]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return EmbeddingStore(str(tmp_path / "embeddings.db"), max_entries=100)
+
+
+class TestEmbeddingStore:
+    def test_embed_reuses_stored_vectors(self, store):
+        embedding_function = FakeEmbeddingFunction()
+
+        first = store.embed(["apple", "pie"], "ollama", "model", embedding_function)
+        assert first.dtype == np.float32
+        assert first.tolist() == [[5.0, 97.0], [3.0, 112.0]]
+
+        second = store.embed(["pie", "bread"], "ollama", "model", embedding_function)
+        assert second.tolist() == [[3.0, 112.0], [5.0, 98.0]]
+        assert embedding_function.calls == [["apple", "pie"], ["bread"]]
+
+    def test_duplicates_are_embedded_once(self, store):
+        embedding_function = FakeEmbeddingFunction()
+
+        vectors = store.embed(["a", "b", "a"], "ollama", "model", embedding_function)
+        assert vectors.shape == (3, 2)
+        assert vectors[0].tolist() == vectors[2].tolist()
+        assert embedding_function.calls == [["a", "b"]]
+
+    def test_vectors_are_per_engine_and_model(self, store):
+        embedding_function = FakeEmbeddingFunction()
+
+        store.embed(["apple"], "ollama", "model", embedding_function)
+        store.embed(["apple"], "ollama", "other", embedding_function)
+        store.embed(["apple"], "openai", "model", embedding_function)
+        assert len(embedding_function.calls) == 3
+
+    def test_least_recently_used_vectors_are_dropped(self, tmp_path, monkeypatch):
+        store = EmbeddingStore(str(tmp_path / "embeddings.db"), max_entries=2)
+        now = time.time()
+        keys = [store.get_key("ollama", "model", text) for text in "abc"]
+
+        for i, key in enumerate(keys[:2]):
+            monkeypatch.setattr(time, "time", lambda: now + i)
+            store.set_many({key: np.ones(2)})
+
+        # Reading "a" makes "b" the least recently used
+        monkeypatch.setattr(time, "time", lambda: now + 2)
+        store.get_many([keys[0]])
+        monkeypatch.setattr(time, "time", lambda: now + 3)
+        store.set_many({keys[2]: np.ones(2)})
+
+        assert set(store.get_many(keys)) == {keys[0], keys[2]}
+
+    def test_disabled_store_always_embeds(self, tmp_path):
+        store = EmbeddingStore(str(tmp_path / "embeddings.db"), max_entries=0)
+        embedding_function = FakeEmbeddingFunction()
+
+        store.embed(["apple"], "ollama", "model", embedding_function)
+        store.embed(["apple"], "ollama", "model", embedding_function)
+        assert len(embedding_function.calls) == 2
+        assert not (tmp_path / "embeddings.db").exists()
+
+    def test_unavailable_database_falls_back_to_embedding(self, tmp_path):
+        store = EmbeddingStore(str(tmp_path / "missing" / "embeddings.db"), 100)
+        embedding_function = FakeEmbeddingFunction()
+
+        vectors = store.embed(["apple"], "ollama", "model", embedding_function)
+        assert vectors.tolist() == [[5.0, 97.0]]
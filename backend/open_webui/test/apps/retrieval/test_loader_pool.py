@@ -0,0 +1,65 @@
+import os
+import time
+
+import pytest
+
+from open_webui.apps.retrieval.loaders.main import (
+    DocumentLoadError,
+    LoaderProcessPool,
+)
+
+
+class ExitOnLoad:
+    # Exits the worker as it receives its arguments, as a crash would
+    def __init__(self, code: int):
+        self.code = code
+
+    def __reduce__(self):
+        return os._exit, (self.code,)
+
+
+@pytest.fixture
+def text_file(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_text("Hello from a worker")
+    return str(path)
+
+
+class TestLoaderProcessPool:
+    def test_load(self, text_file):
+        pool = LoaderProcessPool(max_workers=1, timeout=30)
+        docs = pool.load("", {}, "notes.txt", "text/plain", text_file)
+
+        assert [doc.page_content for doc in docs] == ["Hello from a worker"]
+
+    def test_loader_errors_are_raised(self, tmp_path):
+        pool = LoaderProcessPool(max_workers=1, timeout=30)
+        with pytest.raises(Exception, match="Error loading") as e:
+            pool.load("", {}, "missing.txt", "text/plain", str(tmp_path / "x.txt"))
+        assert not isinstance(e.value, DocumentLoadError)
+
+    def test_timeout_kills_worker(self, tmp_path):
+        # Opening a FIFO blocks until a writer shows up, which never happens
+        path = tmp_path / "blocked.txt"
+        os.mkfifo(path)
+        pool = LoaderProcessPool(max_workers=1, timeout=1)
+
+        start = time.monotonic()
+        with pytest.raises(DocumentLoadError, match="longer than 1 seconds"):
+            pool.load("", {}, "blocked.txt", "text/plain", str(path))
+        assert time.monotonic() - start < 10
+
+    def test_crashed_worker(self, text_file):
+        pool = LoaderProcessPool(max_workers=1, timeout=30)
+        with pytest.raises(DocumentLoadError, match="exited with code 3"):
+            pool.load(
+                "", {"crash": ExitOnLoad(3)}, "notes.txt", "text/plain", text_file
+            )
+
+    def test_memory_limit(self, tmp_path):
+        path = tmp_path / "large.txt"
+        path.write_text("x" * 64 * 1024 * 1024)
+        pool = LoaderProcessPool(max_workers=1, timeout=30, max_memory=1)
+
+        with pytest.raises(DocumentLoadError, match="more than 1 MB"):
+            pool.load("", {}, "large.txt", "text/plain", str(path))
@@ -0,0 +1,232 @@
+import threading
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+from open_webui.apps.retrieval import embedding_store
+from open_webui.apps.retrieval import utils
+from open_webui.apps.retrieval.utils import (
+    RerankCompressor,
+    get_embedding_function,
+    merge_and_sort_query_results,
+    query_collection,
+    search_collections,
+)
+from open_webui.apps.retrieval.vector.main import SearchResult
+from open_webui.utils.cache import EmbeddingCache
+
+
+def result(*chunks: tuple[str, float]) -> dict:
+    return {
+        "distances": [[distance for _, distance in chunks]],
+        "documents": [[document for document, _ in chunks]],
+        "metadatas": [[{"source": document} for document, _ in chunks]],
+    }
+
+
+class TestMergeAndSortQueryResults:
+    def test_lowest_distance_first(self):
+        merged = merge_and_sort_query_results(
+            [result(("a", 0.3), ("b", 0.1)), result(("c", 0.2), ("d", 0.4))], k=3
+        )
+
+        assert merged["documents"] == [["b", "c", "a"]]
+        assert merged["distances"] == [[0.1, 0.2, 0.3]]
+        assert merged["metadatas"] == [
+            [{"source": "b"}, {"source": "c"}, {"source": "a"}]
+        ]
+
+    def test_highest_score_first_with_reverse(self):
+        merged = merge_and_sort_query_results(
+            [result(("a", 0.3), ("b", 0.1)), result(("c", 0.2))], k=2, reverse=True
+        )
+
+        assert merged["documents"] == [["a", "c"]]
+        assert merged["distances"] == [[0.3, 0.2]]
+
+    def test_duplicates_are_kept_once_with_best_distance(self):
+        merged = merge_and_sort_query_results(
+            [result(("a", 0.1), ("b", 0.2)), result(("a", 0.05), ("c", 0.3))], k=3
+        )
+
+        assert merged["documents"] == [["a", "b", "c"]]
+        assert merged["distances"] == [[0.05, 0.2, 0.3]]
+
+    def test_more_candidates_are_selected_when_duplicates_fill_the_top(self):
+        # The k best candidates are all the same chunk
+        query_results = [result(("a", 0.01 * i)) for i in range(5)]
+        query_results.append(result(("b", 0.5), ("c", 0.6), ("d", 0.7)))
+
+        merged = merge_and_sort_query_results(query_results, k=3)
+        assert merged["documents"] == [["a", "b", "c"]]
+
+    def test_fewer_chunks_than_k(self):
+        merged = merge_and_sort_query_results(
+            [result(("a", 0.1), ("b", 0.2)), result(("a", 0.3))], k=5
+        )
+        assert merged["documents"] == [["a", "b"]]
+
+    def test_no_results(self):
+        merged = merge_and_sort_query_results([result()], k=3)
+        assert merged == {"distances": [[]], "documents": [[]], "metadatas": [[]]}
+
+
+class TestRerankCompressorSimilarity:
+    @pytest.fixture
+    def embedded(self, monkeypatch):
+        monkeypatch.setattr(utils, "EMBEDDING_CACHE", EmbeddingCache(maxsize=10))
+
+        def embed(texts):
+            raise AssertionError("Queries must not use the embedding store")
+
+        monkeypatch.setattr(embedding_store.EMBEDDING_STORE, "embed", embed)
+
+        embedded = []
+
+        def embedding_function(texts):
+            embedded.extend(texts)
+            return np.array([[1.0, 0.0] if "a" in t else [0.0, 1.0] for t in texts])
+
+        embedding_function.engine = "ollama"
+        embedding_function.model = "model"
+        compressor = RerankCompressor(
+            embedding_function=embedding_function,
+            top_n=2,
+            reranking_function=None,
+            r_score=0,
+            query_embedding=[1.0, 0.0],
+        )
+        return compressor, embedded
+
+    def test_chunks_are_cached_between_queries(self, embedded):
+        compressor, embedded = embedded
+        documents = [Document(page_content="a"), Document(page_content="b")]
+
+        scores = compressor.get_similarity_scores(documents, "query")
+        assert scores.tolist() == [1.0, 0.0]
+        assert embedded == ["a", "b"]
+
+        documents.append(Document(page_content="ab"))
+        scores = compressor.get_similarity_scores(documents, "query")
+        assert scores.tolist() == [1.0, 0.0, 1.0]
+        assert embedded == ["a", "b", "ab"]
+
+
+class FakeVectorDBClient:
+    def __init__(self, collections: dict[str, dict]):
+        self.collections = collections
+        self.searches = []
+
+    def search_many(self, collection_name, vectors, limit):
+        self.searches.append((collection_name, len(vectors)))
+        collection = self.collections.get(collection_name)
+        if isinstance(collection, Exception):
+            raise collection
+        if collection is None:
+            return None
+        return [
+            SearchResult(ids=[collection["documents"][0]], **collection)
+            for _ in vectors
+        ]
+
+
+class TestSearchCollections:
+    def test_collections_are_searched_concurrently(self):
+        # Every search waits for all the others, so this only passes if they
+        # run at the same time
+        barrier = threading.Barrier(3, timeout=5)
+
+        def search(collection_name):
+            barrier.wait()
+            return result((collection_name, 0.1))
+
+        results = search_collections(["a", "b", "c"], search)
+        assert list(results) == ["a", "b", "c"]
+        assert results["b"]["documents"] == [["b"]]
+
+    def test_metadata_is_tagged_with_collection(self):
+        results = search_collections(["a"], lambda name: result(("x", 0.1)))
+        metadata = results["a"]["metadatas"][0][0]
+        assert metadata["collection_name"] == "a"
+        assert metadata["search_time_ms"] >= 0
+
+    def test_errors_are_returned_per_collection(self):
+        def search(collection_name):
+            if collection_name == "broken":
+                raise ValueError("Collection is broken")
+            return None
+
+        results = search_collections(["broken", "missing"], search)
+        assert isinstance(results["broken"], ValueError)
+        assert results["missing"] is None
+
+
+class TestQueryCollection:
+    def test_results_of_all_collections_are_merged(self, monkeypatch):
+        client = FakeVectorDBClient(
+            {
+                "a": result(("a1", 0.3), ("shared", 0.2)),
+                "b": result(("b1", 0.1), ("shared", 0.4)),
+                "broken": ConnectionError("Vector DB unavailable"),
+            }
+        )
+        monkeypatch.setattr(utils, "VECTOR_DB_CLIENT", client)
+
+        merged = query_collection(
+            ["a", "", "b", "broken", "missing"],
+            query="query",
+            embedding_function=None,
+            k=3,
+            query_embedding=[1.0, 0.0],
+        )
+
+        assert merged["documents"] == [["b1", "shared", "a1"]]
+        assert merged["distances"] == [[0.1, 0.2, 0.3]]
+        assert [m["collection_name"] for m in merged["metadatas"][0]] == [
+            "b",
+            "a",
+            "a",
+        ]
+        assert sorted(client.searches) == [
+            ("a", 1),
+            ("b", 1),
+            ("broken", 1),
+            ("missing", 1),
+        ]
+
+
+class FakeSentenceTransformer:
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts):
+        self.calls.append(texts)
+        if isinstance(texts, str):
+            return np.array([1.0, 0.0], dtype=np.float32)
+        return np.ones((len(texts), 2), dtype=np.float32)
+
+
+class TestGetEmbeddingFunction:
+    @pytest.fixture
+    def embedding_function(self, monkeypatch):
+        monkeypatch.setattr(utils, "EMBEDDING_CACHE", EmbeddingCache(maxsize=10))
+        model = FakeSentenceTransformer()
+        return get_embedding_function("", "all-MiniLM-L6-v2", model, "", "", 1), model
+
+    def test_documents_are_returned_as_matrix(self, embedding_function):
+        embedding_function, model = embedding_function
+
+        embeddings = embedding_function(["a", "b", "c"])
+        assert isinstance(embeddings, np.ndarray)
+        assert embeddings.shape == (3, 2)
+        assert model.calls == [["a", "b", "c"]]
+
+    def test_queries_are_cached_lists(self, embedding_function):
+        embedding_function, model = embedding_function
+
+        assert embedding_function("capital  of\nFrance") == [1.0, 0.0]
+        assert embedding_function("capital of France") == [1.0, 0.0]
+        assert model.calls == ["capital  of\nFrance"]
+        assert embedding_function.engine == ""
+        assert embedding_function.model == "all-MiniLM-L6-v2"
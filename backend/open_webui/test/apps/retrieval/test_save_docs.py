@@ -0,0 +1,164 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+from open_webui.apps.retrieval import main as retrieval_main
+from open_webui.apps.retrieval.main import save_docs_to_vector_db
+from open_webui.constants import ERROR_MESSAGES
+
+
+class FakeVectorDBClient:
+    def __init__(self, collections=(), fail_on_insert=None):
+        self.collections = {name: [] for name in collections}
+        self.fail_on_insert = fail_on_insert
+        self.inserts = 0
+
+    def query(self, collection_name, filter):
+        return None
+
+    def has_collection(self, collection_name):
+        return collection_name in self.collections
+
+    def insert(self, collection_name, items):
+        self.inserts += 1
+        if self.inserts == self.fail_on_insert:
+            raise ConnectionError("Vector DB unavailable")
+        self.collections.setdefault(collection_name, []).extend(items)
+
+    def delete(self, collection_name, ids):
+        self.collections[collection_name] = [
+            item for item in self.collections[collection_name] if item["id"] not in ids
+        ]
+
+    def delete_collection(self, collection_name):
+        self.collections.pop(collection_name, None)
+
+
+class FakeBM25Indexes:
+    def __init__(self):
+        self.calls = []
+
+    def create(self, collection_name, items):
+        self.calls.append(("create", len(items)))
+
+    def add(self, collection_name, items):
+        self.calls.append(("add", len(items)))
+
+    def delete(self, collection_name, ids):
+        self.calls.append(("delete", len(ids)))
+
+    def delete_collection(self, collection_name):
+        self.calls.append(("delete_collection", None))
+
+
+@pytest.fixture
+def ingestion(monkeypatch):
+    config = SimpleNamespace(
+        TEXT_SPLITTER="character",
+        CHUNK_SIZE=10,
+        CHUNK_OVERLAP=0,
+        RAG_EMBEDDING_ENGINE="ollama",
+        RAG_EMBEDDING_MODEL="nomic-embed-text",
+        RAG_EMBEDDING_BATCH_SIZE=1,
+        OPENAI_API_KEY="",
+        OPENAI_API_BASE_URL="",
+    )
+    monkeypatch.setattr(
+        retrieval_main.app,
+        "state",
+        SimpleNamespace(config=config, sentence_transformer_ef=None),
+    )
+    monkeypatch.setattr(retrieval_main, "RAG_INGESTION_MIN_BATCH_SIZE", 3)
+    monkeypatch.setattr(
+        retrieval_main, "get_embedding_function", lambda *args: "embedding_function"
+    )
+
+    ingestion = SimpleNamespace(
+        client=FakeVectorDBClient(),
+        bm25=FakeBM25Indexes(),
+        embedded=[],
+        consumed=0,
+    )
+    monkeypatch.setattr(retrieval_main, "VECTOR_DB_CLIENT", ingestion.client)
+    monkeypatch.setattr(retrieval_main, "BM25_INDEXES", ingestion.bm25)
+
+    def embed(texts, engine, model, embedding_function):
+        # Record how many documents had been read when this batch was embedded
+        ingestion.embedded.append((texts, ingestion.consumed))
+        return np.array([[float(len(text))] for text in texts], dtype=np.float32)
+
+    monkeypatch.setattr(retrieval_main.EMBEDDING_STORE, "embed", embed)
+    return ingestion
+
+
+def documents(ingestion, texts):
+    for text in texts:
+        ingestion.consumed += 1
+        yield Document(page_content=text, metadata={"source": "notes.txt"})
+
+
+class TestSaveDocsToVectorDB:
+    def test_chunks_are_embedded_and_inserted_in_batches(self, ingestion):
+        texts = [f"chunk {i}" for i in range(7)]
+        assert save_docs_to_vector_db(
+            documents(ingestion, texts), "file-1", metadata={"hash": "h"}, split=False
+        )
+
+        assert [batch for batch, _ in ingestion.embedded] == [
+            texts[0:3],
+            texts[3:6],
+            texts[6:7],
+        ]
+        # Documents are read as they are embedded, not all up front
+        assert [consumed for _, consumed in ingestion.embedded] == [3, 6, 7]
+
+        items = ingestion.client.collections["file-1"]
+        assert [item["text"] for item in items] == texts
+        assert items[0]["metadata"]["hash"] == "h"
+        assert items[0]["metadata"]["source"] == "notes.txt"
+        assert ingestion.bm25.calls == [("create", 3), ("add", 3), ("add", 1)]
+
+    def test_documents_are_split_one_at_a_time(self, ingestion):
+        assert save_docs_to_vector_db(
+            documents(ingestion, ["aaaa bbbb cccc dddd", "eeee"]), "file-1"
+        )
+
+        assert [batch for batch, _ in ingestion.embedded] == [
+            ["aaaa bbbb", "cccc dddd", "eeee"]
+        ]
+        items = ingestion.client.collections["file-1"]
+        assert [item["metadata"]["start_index"] for item in items] == [0, 10, 0]
+
+    def test_empty_content_is_rejected(self, ingestion):
+        with pytest.raises(ValueError, match=ERROR_MESSAGES.EMPTY_CONTENT):
+            save_docs_to_vector_db(documents(ingestion, []), "file-1", split=False)
+
+    def test_existing_collection_is_kept(self, ingestion):
+        ingestion.client.collections["file-1"] = []
+        assert save_docs_to_vector_db(
+            documents(ingestion, ["chunk"]), "file-1", split=False
+        )
+        assert ingestion.embedded == []
+
+    def test_failed_insert_removes_new_collection(self, ingestion):
+        ingestion.client.fail_on_insert = 2
+        texts = [f"chunk {i}" for i in range(7)]
+
+        assert not save_docs_to_vector_db(
+            documents(ingestion, texts), "file-1", split=False
+        )
+        assert "file-1" not in ingestion.client.collections
+        assert ingestion.bm25.calls[-1] == ("delete_collection", None)
+
+    def test_failed_insert_removes_added_chunks(self, ingestion):
+        ingestion.client.collections["knowledge"] = [{"id": "existing"}]
+        ingestion.client.fail_on_insert = 2
+        texts = [f"chunk {i}" for i in range(7)]
+
+        assert not save_docs_to_vector_db(
+            documents(ingestion, texts), "knowledge", split=False, add=True
+        )
+        assert ingestion.client.collections["knowledge"] == [{"id": "existing"}]
+        assert ingestion.bm25.calls == [("add", 3), ("delete", 3)]
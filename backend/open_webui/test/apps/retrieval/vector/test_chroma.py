@@ -0,0 +1,93 @@
+import chromadb
+import numpy as np
+import pytest
+from chromadb import Settings
+
+from open_webui.apps.retrieval.vector.dbs.chroma import ChromaClient
+from open_webui.utils.cache import TTLCache
+
+A, B, C = "a", "b", "c"
+
+
+def make_items() -> list[dict]:
+    vectors = {A: [1.0, 0.0], B: [0.0, 1.0], C: [0.7, 0.7]}
+    return [
+        {"id": id, "text": f"text {id}", "vector": vector, "metadata": {"n": id}}
+        for id, vector in vectors.items()
+    ]
+
+
+@pytest.fixture
+def client():
+    client = ChromaClient.__new__(ChromaClient)
+    client.client = chromadb.EphemeralClient(
+        settings=Settings(allow_reset=True, anonymized_telemetry=False)
+    )
+    client.collections = TTLCache(ttl=60)
+    yield client
+    client.reset()
+
+
+class TestChromaSearchMany:
+    def test_one_result_per_vector(self, client):
+        client.insert("docs", make_items())
+
+        results = client.search_many("docs", [[1.0, 0.0], [0.0, 1.0]], limit=2)
+        assert [result.ids for result in results] == [[[A, C]], [[B, C]]]
+        assert results[0].documents == [["text a", "text c"]]
+        assert results[0].metadatas == [[{"n": A}, {"n": C}]]
+        assert results[0].distances[0][0] == pytest.approx(0, abs=1e-6)
+
+    def test_missing_collection(self, client):
+        assert client.search_many("missing", [[1.0, 0.0]], limit=2) is None
+
+
+class TestChromaCollectionCache:
+    def test_existing_collection_is_cached(self, client):
+        client.insert("docs", make_items())
+
+        # Removed behind the client's back, so only the cache knows it
+        client.client.delete_collection("docs")
+        assert client.has_collection("docs")
+
+    def test_missing_collection_is_not_cached(self, client):
+        assert not client.has_collection("docs")
+        client.client.create_collection("docs")
+        assert client.has_collection("docs")
+
+    def test_delete_collection_invalidates(self, client):
+        client.insert("docs", make_items())
+        assert client.has_collection("docs")
+
+        client.delete_collection("docs")
+        assert not client.has_collection("docs")
+
+        client.upsert("docs", make_items())
+        assert client.has_collection("docs")
+
+    def test_reset_invalidates(self, client):
+        client.insert("docs", make_items())
+        client.reset()
+        assert not client.has_collection("docs")
+
+
+class TestChromaInsert:
+    def test_matrix_rows_are_inserted_in_batches(self, client, monkeypatch):
+        monkeypatch.setattr(client.client, "get_max_batch_size", lambda: 2)
+        vectors = np.random.default_rng(0).normal(size=(5, 3)).astype(np.float32)
+        client.insert(
+            "docs",
+            [
+                {
+                    "id": str(i),
+                    "text": f"text {i}",
+                    "vector": vector,
+                    "metadata": {"n": i},
+                }
+                for i, vector in enumerate(vectors)
+            ],
+        )
+
+        result = client.search("docs", vectors[[4]], limit=1)
+        assert result.ids == [["4"]]
+        assert sorted(client.get("docs").ids[0]) == ["0", "1", "2", "3", "4"]
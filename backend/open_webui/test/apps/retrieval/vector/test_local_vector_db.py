@@ -0,0 +1,178 @@
+import os
+
+import numpy as np
+import pytest
+
+from open_webui.apps.retrieval.vector.dbs.local import LocalClient
+
+DIM = 16
+
+
+def make_items(vectors: np.ndarray, start: int = 0) -> list[dict]:
+    return [
+        {
+            "id": f"id-{start + i}",
+            "text": f"text {start + i}",
+            "vector": vector,
+            "metadata": {"file_id": f"file-{(start + i) % 4}", "n": start + i},
+        }
+        for i, vector in enumerate(vectors)
+    ]
+
+
+def exact_top_k(vectors: np.ndarray, query: np.ndarray, k: int) -> list[str]:
+    vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = vectors @ (query / np.linalg.norm(query))
+    return [f"id-{idx}" for idx in np.argsort(-scores)[:k]]
+
+
+def get_state(client: LocalClient, collection_name: str) -> dict:
+    with client._transaction(collection_name) as connection:
+        return client._get_state(connection)
+
+
+@pytest.fixture
+def vectors():
+    return np.random.default_rng(0).normal(size=(400, DIM)).astype(np.float32)
+
+
+@pytest.fixture
+def client(tmp_path):
+    client = LocalClient()
+    client.path = str(tmp_path)
+    client.quantization = ""
+    client.ivf_threshold = 0
+    return client
+
+
+class TestLocalClient:
+    def test_missing_collection(self, client):
+        assert not client.has_collection("missing")
+        assert client.search("missing", [[1.0] * DIM], 3) is None
+        assert client.query("missing", {}) is None
+        assert client.get("missing") is None
+
+    def test_insert_and_search(self, client, vectors):
+        client.insert("collection", make_items(vectors))
+        assert client.has_collection("collection")
+
+        result = client.search("collection", [vectors[3], vectors[7]], 5)
+        assert result.ids[0] == exact_top_k(vectors, vectors[3], 5)
+        assert result.ids[1] == exact_top_k(vectors, vectors[7], 5)
+        assert result.distances[0][0] == pytest.approx(0, abs=1e-5)
+        assert result.documents[0][0] == "text 3"
+        assert result.metadatas[0][0] == {"file_id": "file-3", "n": 3}
+
+        results = client.search_many("collection", [vectors[3], vectors[7]], 1)
+        assert [result.ids for result in results] == [[["id-3"]], [["id-7"]]]
+
+    def test_search_many(self, client, vectors):
+        client.insert("collection", make_items(vectors))
+
+        results = client.search_many("collection", [vectors[3], vectors[7]], 5)
+        assert [result.ids for result in results] == [
+            [exact_top_k(vectors, vectors[3], 5)],
+            [exact_top_k(vectors, vectors[7], 5)],
+        ]
+        assert results[1].documents[0][0] == "text 7"
+        assert client.search_many("missing", [vectors[3]], 5) is None
+
+    def test_query_and_get(self, client, vectors):
+        client.insert("collection", make_items(vectors))
+
+        assert len(client.get("collection").ids[0]) == len(vectors)
+        result = client.query("collection", {"file_id": "file-1"})
+        assert result.ids[0][:3] == ["id-1", "id-5", "id-9"]
+        assert len(result.ids[0]) == len(vectors) // 4
+        assert (
+            len(client.query("collection", {"file_id": "file-1"}, limit=2).ids[0]) == 2
+        )
+
+    def test_delete(self, client, vectors):
+        client.insert("collection", make_items(vectors[:100]))
+
+        client.delete("collection", ids=["id-3"])
+        assert "id-3" not in client.search("collection", [vectors[3]], 5).ids[0]
+
+        client.delete("collection", filter={"file_id": "file-1"})
+        ids = client.get("collection").ids[0]
+        assert len(ids) == 74
+        assert "id-5" not in ids
+
+    def test_upsert_replaces_rows(self, client, vectors):
+        client.insert("collection", make_items(vectors[:10]))
+
+        item = make_items(vectors[9:10])[0]
+        client.upsert("collection", [{**item, "id": "id-0", "text": "new"}])
+
+        result = client.search("collection", [vectors[9]], 2)
+        assert sorted(result.ids[0]) == ["id-0", "id-9"]
+        assert "new" in result.documents[0]
+        assert len(client.get("collection").ids[0]) == 10
+
+    def test_compaction_drops_dead_rows(self, client, vectors):
+        client.insert("collection", make_items(vectors[:100]))
+        generation = get_state(client, "collection")["generation"]
+
+        client.delete("collection", ids=[f"id-{i}" for i in range(60)])
+
+        state = get_state(client, "collection")
+        assert state["generation"] > generation
+        assert state["count"] == 40
+        assert client.search("collection", [vectors[70]], 1).ids == [["id-70"]]
+        assert f"vectors.{generation}" not in os.listdir(client._get_dir("collection"))
+
+    def test_delete_collection_and_reset(self, client, vectors):
+        client.insert("a", make_items(vectors[:10]))
+        client.insert("b", make_items(vectors[:10]))
+
+        client.delete_collection("a")
+        assert not client.has_collection("a")
+        assert client.has_collection("b")
+
+        client.reset()
+        assert not client.has_collection("b")
+
+    @pytest.mark.parametrize("quantization", ["", "int8"])
+    def test_ivf_index(self, client, vectors, quantization):
+        client.quantization = quantization
+        client.ivf_threshold = 200
+        client.nprobe = 10
+        client.insert("collection", make_items(vectors[:150]))
+        assert get_state(client, "collection")["ivf_rows"] == 0
+
+        client.insert("collection", make_items(vectors[150:], start=150))
+        assert get_state(client, "collection")["ivf_rows"] == len(vectors)
+
+        hits = 0
+        for idx in range(0, len(vectors), 20):
+            found = client.search("collection", [vectors[idx]], 10).ids[0]
+            assert found[0] == f"id-{idx}"
+            hits += len(set(found) & set(exact_top_k(vectors, vectors[idx], 10)))
+        assert hits / (len(vectors) // 20 * 10) > 0.7
+
+        # Rows added after training are assigned to the existing lists
+        client.insert("collection", [{**make_items(vectors[:1])[0], "id": "new"}])
+        assert "new" in client.search("collection", [vectors[0]], 2).ids[0]
+
+
+class TestLocalClientQuantization:
+    @pytest.mark.parametrize("quantization", ["float16", "int8"])
+    def test_search_quantized(self, client, vectors, quantization):
+        client.quantization = quantization
+        client.insert("collection", make_items(vectors))
+        assert get_state(client, "collection")["dtype"] == quantization
+
+        for idx in (3, 7, 11):
+            result = client.search("collection", [vectors[idx]], 5)
+            assert result.ids[0][0] == f"id-{idx}"
+            assert result.distances[0][0] == pytest.approx(0, abs=0.02)
+
+    def test_quantization_is_kept_per_collection(self, client, vectors):
+        client.quantization = "int8"
+        client.insert("collection", make_items(vectors[:10]))
+
+        client.quantization = ""
+        client.insert("collection", make_items(vectors[10:20], start=10))
+        assert get_state(client, "collection")["dtype"] == "int8"
+        assert client.search("collection", [vectors[15]], 1).ids == [["id-15"]]
@@ -0,0 +1,74 @@
+import pytest
+from pymilvus import MilvusClient as Client
+
+from open_webui.apps.retrieval.vector.dbs.milvus import MilvusClient
+from open_webui.utils.cache import TTLCache
+
+
+@pytest.fixture
+def client():
+    # Only the filter expressions are tested, so no connection is made
+    client = MilvusClient.__new__(MilvusClient)
+    client.partition_key_mode = False
+    return client
+
+
+class TestMilvusFilterString:
+    def test_no_conditions(self, client):
+        assert client._get_filter_string("docs") == ""
+
+    def test_partition_key_mode(self, client):
+        client.partition_key_mode = True
+        assert client._get_filter_string("docs") == 'collection == "docs"'
+
+    def test_ids(self, client):
+        assert client._get_filter_string("docs", ids=["a", "b"]) == 'id in ["a", "b"]'
+
+    def test_filter(self, client):
+        assert (
+            client._get_filter_string("docs", filter={"file_id": "1", "page": 2})
+            == 'metadata["file_id"] == "1" && metadata["page"] == 2'
+        )
+
+    def test_all_conditions(self, client):
+        client.partition_key_mode = True
+        assert client._get_filter_string(
+            "docs", filter={"file_id": "1"}, ids=["a"]
+        ) == ('collection == "docs" && id in ["a"] && metadata["file_id"] == "1"')
+
+    def test_values_are_escaped(self, client):
+        client.partition_key_mode = True
+        assert (
+            client._get_filter_string('a"b', filter={"name": 'x" || true'})
+            == 'collection == "a\\"b" && metadata["name"] == "x\\" || true"'
+        )
+
+
+@pytest.fixture
+def lite_client(tmp_path):
+    client = MilvusClient.__new__(MilvusClient)
+    client.collection_prefix = "open_webui"
+    client.client = Client(uri=str(tmp_path / "milvus.db"))
+    client.partition_key_mode = False
+    client.lite = True
+    client.index_type = "FLAT"
+    client.vector_types = {}
+    client.collections = TTLCache(ttl=60)
+    yield client
+    client.client.close()
+
+
+class TestMilvusSearchMany:
+    def test_one_result_per_vector(self, lite_client):
+        vectors = {"a": [1.0, 0.0], "b": [0.0, 1.0], "c": [0.7, 0.7]}
+        lite_client.insert(
+            "docs",
+            [
+                {"id": id, "text": f"text {id}", "vector": vector, "metadata": {}}
+                for id, vector in vectors.items()
+            ],
+        )
+
+        results = lite_client.search_many("docs", [[1.0, 0.0], [0.0, 1.0]], limit=2)
+        assert [result.ids for result in results] == [[["a", "c"]], [["b", "c"]]]
+        assert results[1].documents == [["text b", "text c"]]
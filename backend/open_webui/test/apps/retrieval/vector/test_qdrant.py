@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+from qdrant_client import QdrantClient as Qclient
+from qdrant_client.models import models
+
+from open_webui.apps.retrieval.vector.dbs.qdrant import QdrantClient
+from open_webui.utils.cache import TTLCache
+
+# Qdrant only takes UUIDs and integers as point ids
+A = "00000000-0000-0000-0000-00000000000a"
+B = "00000000-0000-0000-0000-00000000000b"
+C = "00000000-0000-0000-0000-00000000000c"
+
+
+def make_items() -> list[dict]:
+    vectors = {A: [1.0, 0.0], B: [0.0, 1.0], C: [0.7, 0.7]}
+    return [
+        {"id": id, "text": f"text {id}", "vector": vector, "metadata": {"n": id}}
+        for id, vector in vectors.items()
+    ]
+
+
+@pytest.fixture
+def client():
+    client = QdrantClient.__new__(QdrantClient)
+    client.collection_prefix = "open-webui"
+    client.client = Qclient(":memory:")
+    client.collections = TTLCache(ttl=60)
+    return client
+
+
+class TestQdrantSearchMany:
+    def test_one_result_per_vector(self, client):
+        client.insert("docs", make_items())
+
+        results = client.search_many("docs", [[1.0, 0.0], [0.0, 1.0]], limit=2)
+        assert [result.ids for result in results] == [[[A, C]], [[B, C]]]
+        assert results[1].documents == [[f"text {B}", f"text {C}"]]
+        assert results[1].metadatas == [[{"n": B}, {"n": C}]]
+        assert results[0].distances[0][0] == pytest.approx(1)
+
+    def test_search_returns_a_row_per_vector(self, client):
+        client.insert("docs", make_items())
+
+        result = client.search("docs", [[1.0, 0.0], [0.0, 1.0], [0.7, 0.7]], limit=1)
+        assert result.ids == [[A], [B], [C]]
+
+
+class TestQdrantCollectionCache:
+    def test_existing_collection_is_cached(self, client):
+        client.insert("docs", make_items())
+
+        # Removed behind the client's back, so only the cache knows it
+        client.client.delete_collection("open-webui_docs")
+        assert client.has_collection("docs")
+
+    def test_missing_collection_is_not_cached(self, client):
+        assert not client.has_collection("docs")
+        client.client.create_collection(
+            "open-webui_docs",
+            vectors_config=models.VectorParams(size=2, distance=models.Distance.COSINE),
+        )
+        assert client.has_collection("docs")
+
+    def test_delete_collection_invalidates(self, client):
+        client.insert("docs", make_items())
+        assert client.has_collection("docs")
+
+        client.delete_collection("docs")
+        assert not client.has_collection("docs")
+        assert client.query("docs", {"n": A}) is None
+
+        client.upsert("docs", make_items())
+        assert client.has_collection("docs")
+
+    def test_reset_invalidates(self, client):
+        client.insert("docs", make_items())
+        client.reset()
+        assert not client.has_collection("docs")
+
+
+class TestQdrantInsert:
+    def test_matrix_rows_are_inserted(self, client):
+        vectors = np.array([[1.0, 0.0], [0.0, 1.0]], dtype=np.float32)
+        client.insert(
+            "docs",
+            [
+                {"id": id, "text": id, "vector": vector, "metadata": {}}
+                for id, vector in zip([A, B], vectors)
+            ],
+        )
+
+        assert client.search("docs", vectors[[1]], limit=1).ids == [[B]]
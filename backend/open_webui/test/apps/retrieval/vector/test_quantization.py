@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from open_webui.apps.retrieval.vector.quantization import (
+    dequantize,
+    get_int8_scale,
+    measure_recall,
+    normalize,
+    quantize,
+)
+
+
+@pytest.fixture
+def vectors():
+    return normalize(np.random.default_rng(0).normal(size=(500, 32)))
+
+
+class TestQuantization:
+    def test_normalize(self):
+        vectors = normalize(np.array([[3.0, 4.0], [0.0, 0.0]]))
+        assert vectors.tolist() == [[0.6, 0.8], [0.0, 0.0]]
+
+    @pytest.mark.parametrize(
+        "quantization, dtype", [("", np.float32), ("float16", np.float16)]
+    )
+    def test_float_quantization(self, vectors, quantization, dtype):
+        stored = quantize(vectors, quantization)
+        assert stored.dtype == dtype
+        assert np.allclose(dequantize(stored), vectors, atol=1e-3)
+
+    def test_int8_quantization(self, vectors):
+        scale = get_int8_scale(vectors)
+        stored = quantize(vectors, "int8", scale)
+        assert stored.dtype == np.int8
+        assert np.abs(stored).max() == 127
+        assert np.allclose(dequantize(stored, scale), vectors, atol=0.5 / scale)
+
+        assert np.array_equal(quantize(vectors, "int8"), stored)
+
+    def test_int8_clips_components_beyond_scale(self):
+        scale = get_int8_scale(np.array([[0.5, -0.5]]))
+        stored = quantize(np.array([[1.0, -1.0, 0.25]]), "int8", scale)
+        assert stored.tolist() == [[127, -127, 64]]
+
+    def test_measure_recall(self, vectors):
+        queries = normalize(np.random.default_rng(1).normal(size=(20, 32)))
+        results = measure_recall(vectors, queries, k=10)
+
+        assert set(results) == {"float32", "float16", "int8"}
+        assert results["float32"] == {"recall": 1.0, "bytes_per_vector": 128}
+        assert results["float16"]["bytes_per_vector"] == 64
+        assert results["int8"]["bytes_per_vector"] == 32
+        assert results["float16"]["recall"] > 0.95
+        assert results["int8"]["recall"] > 0.8
+
+    def test_measure_recall_with_k_above_vector_count(self, vectors):
+        results = measure_recall(vectors[:5], vectors[:2], k=10)
+        assert results["float32"]["recall"] == 1.0
@@ -0,0 +1,60 @@
+import numpy as np
+
+from open_webui.apps.retrieval.vector.main import SearchResult, as_lists, as_matrix
+
+
+class TestAsMatrix:
+    def test_float32_matrix_is_returned_as_is(self):
+        vectors = np.ones((3, 4), dtype=np.float32)
+        assert as_matrix(vectors) is vectors
+
+    def test_lists_and_rows_are_stacked(self):
+        for vectors in [
+            [[1, 2], [3, 4]],
+            [np.array([1.0, 2.0]), np.array([3.0, 4.0])],
+            np.array([[1.0, 2.0], [3.0, 4.0]]),
+        ]:
+            matrix = as_matrix(vectors)
+            assert matrix.dtype == np.float32
+            assert matrix.flags["C_CONTIGUOUS"]
+            assert matrix.tolist() == [[1.0, 2.0], [3.0, 4.0]]
+
+    def test_non_contiguous_matrix_is_copied(self):
+        vectors = np.arange(8, dtype=np.float32).reshape(4, 2)[::2]
+        matrix = as_matrix(vectors)
+        assert matrix.flags["C_CONTIGUOUS"]
+        assert matrix.tolist() == [[0.0, 1.0], [4.0, 5.0]]
+
+    def test_no_vectors(self):
+        assert as_matrix([]).shape == (0, 0)
+
+    def test_as_lists(self):
+        lists = as_lists(np.array([[0.5, 1.0]], dtype=np.float32))
+        assert lists == [[0.5, 1.0]]
+        assert type(lists[0][0]) is float
+
+
+class TestSearchResultSplit:
+    def test_one_result_per_row(self):
+        result = SearchResult(
+            ids=[["a", "b"], ["c"]],
+            distances=[[0.1, 0.2], [0.3]],
+            documents=[["A", "B"], ["C"]],
+            metadatas=[[{"n": 1}, {"n": 2}], [None]],
+        )
+
+        assert result.split() == [
+            SearchResult(
+                ids=[["a", "b"]],
+                distances=[[0.1, 0.2]],
+                documents=[["A", "B"]],
+                metadatas=[[{"n": 1}, {"n": 2}]],
+            ),
+            SearchResult(
+                ids=[["c"]], distances=[[0.3]], documents=[["C"]], metadatas=[[None]]
+            ),
+        ]
+
+    def test_no_rows(self):
+        result = SearchResult(ids=[], distances=[], documents=[], metadatas=[])
+        assert result.split() == []
@@ -0,0 +1,81 @@
+import time
+
+from sqlalchemy import inspect
+
+from open_webui.apps.webui.models.file_jobs import FileJob, FileJobs
+
+
+def set_job_fields(engine, id: str, **fields):
+    with engine.begin() as connection:
+        connection.execute(
+            FileJob.__table__.update().where(FileJob.id == id).values(**fields)
+        )
+
+
+class TestFileJobs:
+    def test_migration_matches_model(self, file_job_db):
+        columns = {
+            column["name"] for column in inspect(file_job_db).get_columns("file_job")
+        }
+        assert columns == set(FileJob.__table__.columns.keys())
+
+        indexes = {
+            index["name"] for index in inspect(file_job_db).get_indexes("file_job")
+        }
+        assert indexes == {"file_job_file_id_idx", "file_job_status_idx"}
+
+    def test_insert_new_job(self, file_job_db):
+        job = FileJobs.insert_new_job("file-1", "user-1")
+        assert job.status == "pending"
+        assert job.attempts == 0
+        assert job.error is None
+        assert FileJobs.get_job_by_id(job.id) == job
+        assert FileJobs.get_latest_job_by_file_id("file-1") == job
+        assert FileJobs.get_latest_job_by_file_id("file-2") is None
+
+    def test_claim_next_job(self, file_job_db):
+        first = FileJobs.insert_new_job("file-1", "user-1")
+        second = FileJobs.insert_new_job("file-2", "user-1")
+        set_job_fields(file_job_db, first.id, created_at=first.created_at - 1)
+
+        claimed = FileJobs.claim_next_job()
+        assert claimed.id == first.id
+        assert claimed.status == "processing"
+        assert claimed.attempts == 1
+
+        # A claimed job is not handed out again
+        assert FileJobs.claim_next_job().id == second.id
+        assert FileJobs.claim_next_job() is None
+
+    def test_claim_next_job_waits_for_run_after(self, file_job_db):
+        job = FileJobs.insert_new_job("file-1", "user-1")
+        set_job_fields(file_job_db, job.id, run_after=int(time.time()) + 60)
+        assert FileJobs.claim_next_job() is None
+
+        set_job_fields(file_job_db, job.id, run_after=int(time.time()))
+        assert FileJobs.claim_next_job().id == job.id
+
+    def test_retry_counts_attempts(self, file_job_db):
+        job = FileJobs.insert_new_job("file-1", "user-1")
+        FileJobs.claim_next_job()
+
+        job = FileJobs.update_job_status_by_id(job.id, "pending", "error", 0)
+        assert job.status == "pending"
+        assert job.error == "error"
+
+        job = FileJobs.claim_next_job()
+        assert job.attempts == 2
+
+        job = FileJobs.update_job_status_by_id(job.id, "failed", "error")
+        assert job.status == "failed"
+        assert FileJobs.claim_next_job() is None
+
+    def test_requeue_stale_jobs(self, file_job_db):
+        job = FileJobs.insert_new_job("file-1", "user-1")
+        FileJobs.claim_next_job()
+        assert FileJobs.requeue_stale_jobs(60) == 0
+
+        set_job_fields(file_job_db, job.id, updated_at=int(time.time()) - 120)
+        assert FileJobs.requeue_stale_jobs(60) == 1
+        assert FileJobs.get_job_by_id(job.id).status == "pending"
+        assert FileJobs.claim_next_job().attempts == 2
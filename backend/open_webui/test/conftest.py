@@ -0,0 +1,51 @@
+import importlib.util
+from contextlib import contextmanager
+from pathlib import Path
+
+import pytest
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import open_webui
+
+MIGRATION_PATH = (
+    Path(open_webui.__file__).parent
+    / "migrations"
+    / "versions"
+    / "3e0e00844bb0_add_file_job_table.py"
+)
+
+
+@pytest.fixture
+def file_job_db(monkeypatch):
+    # An in-memory database with the file_job table created by its migration
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+
+    spec = importlib.util.spec_from_file_location("add_file_job_table", MIGRATION_PATH)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    with engine.begin() as connection:
+        with Operations.context(MigrationContext.configure(connection)):
+            migration.upgrade()
+
+    SessionLocal = sessionmaker(bind=engine, expire_on_commit=False)
+
+    @contextmanager
+    def get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    from open_webui.apps.webui.models import file_jobs
+
+    monkeypatch.setattr(file_jobs, "get_db", get_db)
+    return engine
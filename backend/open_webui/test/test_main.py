@@ -0,0 +1,370 @@
+import asyncio
+import json
+from types import SimpleNamespace
+from typing import Optional
+
+import pytest
+from aiohttp import web
+
+from open_webui import main
+from open_webui.apps.webui.models.models import ModelMeta, ModelModel, ModelParams
+from open_webui.main import (
+    ChatCompletionMiddleware,
+    PipelineFilterError,
+    call_pipeline_filter,
+    merge_custom_models,
+)
+from open_webui.utils.session_pool import ClientSessionPool
+
+
+def custom_model(id: str, base_model_id: Optional[str] = None, **meta) -> ModelModel:
+    return ModelModel(
+        id=id,
+        user_id="user-1",
+        base_model_id=base_model_id,
+        name=f"Custom {id}",
+        params=ModelParams(),
+        meta=ModelMeta(**meta),
+        updated_at=0,
+        created_at=0,
+    )
+
+
+def model(id: str, owned_by: str = "ollama", **extra) -> dict:
+    return {"id": id, "name": id, "owned_by": owned_by, **extra}
+
+
+class TestMergeCustomModels:
+    def test_override_matches_full_id_and_base_name(self):
+        models = [model("llama3:latest"), model("llama3:8b"), model("gpt-4o", "openai")]
+        merge_custom_models(models, [custom_model("llama3", actionIds=["summarize"])])
+
+        assert [m["name"] for m in models] == [
+            "Custom llama3",
+            "Custom llama3",
+            "gpt-4o",
+        ]
+        assert models[0]["action_ids"] == ["summarize"]
+        assert "action_ids" not in models[2]
+
+        merge_custom_models(models, [custom_model("llama3:8b")])
+        assert models[1]["info"]["id"] == "llama3:8b"
+        assert models[0]["info"]["id"] == "llama3"
+
+    def test_preset_takes_owner_and_pipe_of_first_base_model(self):
+        models = [
+            model("mistral:latest", "ollama"),
+            model("mistral", "openai", pipe={"type": "pipe"}),
+        ]
+        merge_custom_models(
+            models,
+            [
+                custom_model("helper", "mistral", actionIds=["a"]),
+                custom_model("unknown", "missing"),
+            ],
+        )
+
+        helper, unknown = models[2:]
+        assert helper["preset"] is True
+        assert helper["owned_by"] == "ollama"
+        assert "pipe" not in helper
+        assert helper["action_ids"] == ["a"]
+        assert unknown["owned_by"] == "openai"
+
+        models = [model("mistral", "openai", pipe={"type": "pipe"})]
+        merge_custom_models(models, [custom_model("helper", "mistral:latest")])
+        assert models[1]["owned_by"] == "openai"
+        assert "pipe" not in models[1]
+
+        merge_custom_models(models, [custom_model("helper2", "mistral")])
+        assert models[2]["pipe"] == {"type": "pipe"}
+
+    def test_preset_on_preset(self):
+        models = [model("gpt-4o", "openai"), model("llama3:latest", "ollama")]
+        merge_custom_models(
+            models,
+            [
+                custom_model("writer", "llama3"),
+                custom_model("editor", "writer"),
+                custom_model("reviewer", "editor"),
+                # Presets only see presets merged before them
+                custom_model("early", "later"),
+                custom_model("later", "gpt-4o"),
+            ],
+        )
+
+        owners = {m["id"]: m["owned_by"] for m in models}
+        assert owners["writer"] == owners["editor"] == owners["reviewer"] == "ollama"
+        assert owners["early"] == "openai"
+        assert owners["later"] == "openai"
+
+    def test_override_of_preset_merged_before(self):
+        models = [model("llama3:latest")]
+        merge_custom_models(
+            models, [custom_model("writer", "llama3"), custom_model("writer")]
+        )
+
+        assert [m["id"] for m in models] == ["llama3:latest", "writer"]
+        assert models[1]["name"] == "Custom writer"
+        assert models[1]["preset"] is True
+
+
+CITATIONS = [{"source": {"name": "notes.txt"}, "document": ["Paris"]}]
+
+
+@pytest.fixture
+def chat_handlers(monkeypatch):
+    user = SimpleNamespace(id="user-1", email="a@b.c", name="A", role="user")
+    monkeypatch.setattr(main, "get_chat_completion_user", lambda request: user)
+    monkeypatch.setattr(
+        main.app.state,
+        "MODELS",
+        {"llama3:latest": {"id": "llama3:latest", "owned_by": "ollama"}},
+    )
+
+    async def filter_pipeline(body, user):
+        return body
+
+    async def passthrough(body, *args):
+        return body, {}
+
+    monkeypatch.setattr(main, "filter_pipeline", filter_pipeline)
+    monkeypatch.setattr(main, "chat_completion_filter_functions_handler", passthrough)
+    monkeypatch.setattr(main, "chat_completion_tools_handler", passthrough)
+
+    files = {"flags": {}}
+
+    async def chat_completion_files_handler(body):
+        return body, files["flags"]
+
+    monkeypatch.setattr(
+        main, "chat_completion_files_handler", chat_completion_files_handler
+    )
+    return files
+
+
+def run_middleware(body: dict, content_type: bytes, chunks: list[bytes]):
+    """
+    Sends a chat completion request through the middleware to an endpoint
+    streaming `chunks`, and returns what the endpoint received and what the
+    client was sent.
+    """
+    received = {}
+
+    async def endpoint(scope, receive, send):
+        message = await receive()
+        received["body"] = json.loads(message["body"])
+        received["headers"] = dict(scope["headers"])
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", content_type),
+                    (b"content-length", b"100"),
+                ],
+            }
+        )
+        for chunk in chunks:
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    raw = json.dumps(body).encode()
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/api/chat/completions",
+        "query_string": b"",
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(raw)).encode()),
+            (b"authorization", b"Bearer token"),
+        ],
+    }
+    messages = [{"type": "http.request", "body": raw, "more_body": False}]
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(ChatCompletionMiddleware(endpoint)(scope, receive, send))
+    return received, sent
+
+
+def get_body(sent: list[dict]) -> bytes:
+    return b"".join(m["body"] for m in sent if m["type"] == "http.response.body")
+
+
+class TestChatCompletionMiddleware:
+    body = {
+        "model": "llama3:latest",
+        "chat_id": "chat-1",
+        "id": "message-1",
+        "session_id": "session-1",
+        "messages": [{"role": "user", "content": "Capital of France?"}],
+        "files": [{"id": "file-1"}],
+        "stream": True,
+    }
+
+    def test_body_is_rewritten_with_content_length(self, chat_handlers):
+        chat_handlers["flags"] = {"contexts": ["Paris is the capital."]}
+        received, _ = run_middleware(self.body, b"application/x-ndjson", [b"{}\n"])
+
+        body = received["body"]
+        assert body["metadata"] == {
+            "chat_id": "chat-1",
+            "message_id": "message-1",
+            "session_id": "session-1",
+            "tool_ids": None,
+            "files": [{"id": "file-1"}],
+        }
+        assert "files" not in body and "chat_id" not in body
+        assert "Paris is the capital." in body["messages"][0]["content"]
+
+        headers = received["headers"]
+        assert (
+            headers[b"content-length"] == str(len(json.dumps(body).encode())).encode()
+        )
+        assert headers[b"authorization"] == b"Bearer token"
+
+    def test_response_is_passed_through_without_citations(self, chat_handlers):
+        _, sent = run_middleware(self.body, b"application/x-ndjson", [b"a\n", b"b\n"])
+
+        assert (b"content-length", b"100") in sent[0]["headers"]
+        assert get_body(sent) == b"a\nb\n"
+
+    @pytest.mark.parametrize(
+        "content_type, prefix",
+        [
+            (b"application/x-ndjson", b""),
+            (b"text/event-stream; charset=utf-8", b"data: "),
+        ],
+    )
+    def test_citations_are_prepended_to_streams(
+        self, chat_handlers, content_type, prefix
+    ):
+        chat_handlers["flags"] = {"citations": CITATIONS}
+        _, sent = run_middleware(self.body, content_type, [b"token"])
+
+        headers = dict(sent[0]["headers"])
+        assert b"content-length" not in headers
+        assert headers[b"content-type"] == content_type
+
+        citations = json.dumps({"citations": CITATIONS}).encode()
+        suffix = b"\n\n" if prefix else b"\n"
+        assert get_body(sent) == prefix + citations + suffix + b"token"
+
+    def test_citations_are_not_added_to_json_responses(self, chat_handlers):
+        chat_handlers["flags"] = {"citations": CITATIONS}
+        _, sent = run_middleware(self.body, b"application/json", [b"{}"])
+
+        assert get_body(sent) == b"{}"
+
+    def test_unknown_model_is_rejected(self, chat_handlers):
+        received, sent = run_middleware(
+            {**self.body, "model": "missing"}, b"application/x-ndjson", []
+        )
+
+        assert received == {}
+        assert sent[0]["status"] == 400
+        assert json.loads(get_body(sent)) == {"detail": "Model not found"}
+
+
+async def filter_inlet(request):
+    data = await request.json()
+    body = data["body"]
+    if body.get("delay"):
+        await asyncio.sleep(body["delay"])
+    if body.get("reject"):
+        return web.json_response({"detail": "Rate limit exceeded"}, status=429)
+    if body.get("error"):
+        return web.Response(status=500, text="Internal Server Error")
+    return web.json_response({**body, "filtered_for": data["user"]["id"]})
+
+
+@pytest.fixture
+def pipelines(monkeypatch):
+    monkeypatch.setattr(main, "CLIENT_SESSION_POOL", ClientSessionPool(10, 30, None))
+    monkeypatch.setattr(main, "PIPELINE_FILTER_TIMEOUT", 0.2)
+    monkeypatch.setattr(main, "pipeline_filter_timings", {})
+    config = SimpleNamespace(OPENAI_API_BASE_URLS=[], OPENAI_API_KEYS=[])
+    monkeypatch.setattr(main.openai_app, "state", SimpleNamespace(config=config))
+    return config
+
+
+def call_filter(config, body: dict, key: str = "sk-pipelines", reachable=True):
+    """
+    Runs `body` through the inlet of a pipeline filter served on a local
+    port, or on a closed one if not `reachable`.
+    """
+
+    async def run():
+        app = web.Application()
+        app.router.add_post("/rate-limit/filter/inlet", filter_inlet)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        if not reachable:
+            await runner.cleanup()
+
+        config.OPENAI_API_BASE_URLS = [f"http://127.0.0.1:{port}"]
+        config.OPENAI_API_KEYS = [key]
+        try:
+            return await call_pipeline_filter(
+                {"id": "rate-limit", "urlIdx": 0}, "inlet", body, {"id": "user-1"}
+            )
+        finally:
+            await main.CLIENT_SESSION_POOL.close()
+            await runner.cleanup()
+
+    return asyncio.run(run())
+
+
+class TestCallPipelineFilter:
+    def test_filtered_body_is_returned(self, pipelines):
+        assert call_filter(pipelines, {"model": "llama3"}) == {
+            "model": "llama3",
+            "filtered_for": "user-1",
+        }
+        timing = main.pipeline_filter_timings["rate-limit/inlet"]
+        assert (timing["count"], timing["errors"]) == (1, 0)
+
+    def test_rejection_raises(self, pipelines):
+        with pytest.raises(PipelineFilterError) as e:
+            call_filter(pipelines, {"reject": True})
+        assert (e.value.status_code, e.value.detail) == (429, "Rate limit exceeded")
+        assert main.pipeline_filter_timings["rate-limit/inlet"]["errors"] == 1
+
+    @pytest.mark.parametrize(
+        "body, reachable",
+        [({"delay": 1}, True), ({"error": True}, True), ({}, False)],
+        ids=["timeout", "server error", "unreachable"],
+    )
+    def test_failed_call_returns_body_unchanged(self, pipelines, body, reachable):
+        assert call_filter(pipelines, body, reachable=reachable) == body
+        timing = main.pipeline_filter_timings["rate-limit/inlet"]
+        assert (timing["count"], timing["errors"]) == (1, 1)
+        assert timing["last_ms"] < 1000
+
+    def test_filter_without_key_is_skipped(self, pipelines):
+        assert call_filter(pipelines, {"reject": True}, key="") == {"reject": True}
+        assert main.pipeline_filter_timings == {}
+
+    def test_rejection_is_returned_to_client(self, chat_handlers, monkeypatch):
+        async def filter_pipeline(body, user):
+            raise PipelineFilterError(429, "Rate limit exceeded")
+
+        monkeypatch.setattr(main, "filter_pipeline", filter_pipeline)
+        received, sent = run_middleware(
+            TestChatCompletionMiddleware.body, b"application/x-ndjson", []
+        )
+
+        assert received == {}
+        assert sent[0]["status"] == 429
+        assert json.loads(get_body(sent)) == {"detail": "Rate limit exceeded"}
@@ -0,0 +1,323 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from open_webui.utils.cache import (
+    AsyncTTLCache,
+    EmbeddingCache,
+    LRUCache,
+    TTLCache,
+    VersionedCache,
+)
+
+
+class TestAsyncTTLCache:
+    def test_concurrent_callers_share_one_load(self):
+        cache = AsyncTTLCache(ttl=60)
+        loads = []
+
+        async def loader():
+            loads.append(1)
+            await asyncio.sleep(0.01)
+            return ["model"]
+
+        async def main():
+            return await asyncio.gather(*[cache.get(loader) for _ in range(10)])
+
+        assert asyncio.run(main()) == [["model"]] * 10
+        assert len(loads) == 1
+
+    def test_stale_value_is_served_while_refreshing(self, monkeypatch):
+        cache = AsyncTTLCache(ttl=10)
+        values = iter(["old", "new"])
+
+        async def loader():
+            return next(values)
+
+        async def main():
+            now = time.monotonic()
+            assert await cache.get(loader) == "old"
+
+            monkeypatch.setattr(time, "monotonic", lambda: now + 11)
+            assert await cache.get(loader) == "old"
+            await cache._task
+            assert await cache.get(loader) == "new"
+
+        asyncio.run(main())
+
+    def test_invalidate_discards_load_in_flight(self):
+        cache = AsyncTTLCache(ttl=60)
+        values = iter(["old", "new"])
+
+        async def loader():
+            value = next(values)
+            await asyncio.sleep(0.01)
+            return value
+
+        async def main():
+            task = asyncio.create_task(cache.get(loader))
+            await asyncio.sleep(0)
+            cache.invalidate()
+
+            assert await task == "old"
+            assert await cache.get(loader) == "new"
+            assert await cache.get(loader) == "new"
+
+        asyncio.run(main())
+
+    def test_failed_load_is_retried(self):
+        cache = AsyncTTLCache(ttl=60)
+        calls = []
+
+        async def loader():
+            calls.append(1)
+            if len(calls) == 1:
+                raise Exception("Upstream unavailable")
+            return ["model"]
+
+        async def main():
+            with pytest.raises(Exception):
+                await cache.get(loader)
+            assert await cache.get(loader) == ["model"]
+
+        asyncio.run(main())
+
+    def test_zero_ttl_loads_every_time(self):
+        cache = AsyncTTLCache(ttl=0)
+        values = iter(["first", "second"])
+
+        async def loader():
+            return next(values)
+
+        async def main():
+            assert await cache.get(loader) == "first"
+            assert await cache.get(loader) == "second"
+
+        asyncio.run(main())
+
+    def test_messages_from_other_workers_drop_value(self):
+        cache = AsyncTTLCache(ttl=60)
+
+        async def main():
+            cache.start()
+            assert await cache.get(self.loader("old")) == "old"
+
+            cache._channel._on_message({"data": cache._channel.worker_id})
+            await asyncio.sleep(0)
+            assert await cache.get(self.loader("new")) == "old"
+
+            # Delivered on a Redis thread
+            thread = threading.Thread(
+                target=cache._channel._on_message, args=({"data": "other-worker"},)
+            )
+            thread.start()
+            thread.join()
+            await asyncio.sleep(0)
+            assert await cache.get(self.loader("new")) == "new"
+
+        asyncio.run(main())
+
+    def test_invalidate_publishes_unless_local(self):
+        cache = AsyncTTLCache(ttl=60)
+        published = []
+        cache._channel.publish = lambda: published.append(1)
+
+        cache.invalidate()
+        cache.invalidate(broadcast=False)
+        assert published == [1]
+
+    @staticmethod
+    def loader(value):
+        async def load():
+            return value
+
+        return load
+
+
+class TestVersionedCache:
+    def test_get_loads_once(self):
+        cache = VersionedCache("test")
+        loads = []
+
+        def loader():
+            loads.append(1)
+            return "value"
+
+        assert cache.get("key", loader) == "value"
+        assert cache.get("key", loader) == "value"
+        assert len(loads) == 1
+
+    def test_none_is_not_cached(self):
+        cache = VersionedCache("test")
+        assert cache.get("key", lambda: None) is None
+        assert cache.get("key", lambda: "value") == "value"
+
+    def test_bump_drops_entries(self):
+        cache = VersionedCache("test")
+        cache.get("key", lambda: "old")
+
+        cache.bump()
+        assert cache.version == 1
+        assert cache.get("key", lambda: "new") == "new"
+
+    def test_load_started_before_bump_is_not_stored(self):
+        cache = VersionedCache("test")
+
+        def loader():
+            # Another request changes the row while it is being read
+            cache.bump()
+            return "old"
+
+        assert cache.get("key", loader) == "old"
+        assert cache.get("key", lambda: "new") == "new"
+
+    def test_entries_expire_after_ttl(self, monkeypatch):
+        cache = VersionedCache("test", ttl=30)
+        now = time.monotonic()
+        monkeypatch.setattr(time, "monotonic", lambda: now)
+        cache.get("key", lambda: "old")
+
+        monkeypatch.setattr(time, "monotonic", lambda: now + 29)
+        assert cache.get("key", lambda: "new") == "old"
+
+        monkeypatch.setattr(time, "monotonic", lambda: now + 31)
+        assert cache.get("key", lambda: "new") == "new"
+
+    def test_entries_without_ttl_do_not_expire(self, monkeypatch):
+        cache = VersionedCache("test")
+        now = time.monotonic()
+        cache.get("key", lambda: "old")
+
+        monkeypatch.setattr(time, "monotonic", lambda: now + 86400)
+        assert cache.get("key", lambda: "new") == "old"
+
+    def test_messages_from_other_workers_drop_entries(self):
+        cache = VersionedCache("test")
+        cache.get("key", lambda: "old")
+
+        # A worker ignores its own bumps echoed back by Redis
+        cache._channel._on_message({"data": cache._channel.worker_id})
+        assert cache.get("key", lambda: "new") == "old"
+
+        cache._channel._on_message({"data": "other-worker"})
+        assert cache.get("key", lambda: "new") == "new"
+
+
+class TestTTLCache:
+    def test_entries_expire(self, monkeypatch):
+        cache = TTLCache(ttl=5)
+        now = time.monotonic()
+        monkeypatch.setattr(time, "monotonic", lambda: now)
+        cache.set("user", "value")
+        assert cache.get("user") == "value"
+
+        monkeypatch.setattr(time, "monotonic", lambda: now + 6)
+        assert cache.get("user") is None
+        assert "user" not in cache._entries
+
+    def test_zero_ttl_disables_cache(self):
+        cache = TTLCache(ttl=0)
+        cache.set("user", "value")
+        assert cache.get("user") is None
+
+    def test_full_cache_drops_expired_then_oldest(self, monkeypatch):
+        cache = TTLCache(ttl=5, maxsize=2)
+        now = time.monotonic()
+        monkeypatch.setattr(time, "monotonic", lambda: now)
+        cache.set("a", 1)
+        monkeypatch.setattr(time, "monotonic", lambda: now + 3)
+        cache.set("b", 2)
+
+        # "a" has expired by now and makes room
+        monkeypatch.setattr(time, "monotonic", lambda: now + 6)
+        cache.set("c", 3)
+        assert set(cache._entries) == {"b", "c"}
+
+        # Nothing has expired, so the oldest entry is evicted
+        cache.set("d", 4)
+        assert set(cache._entries) == {"c", "d"}
+
+    def test_delete(self):
+        cache = TTLCache(ttl=5)
+        cache.set("a", {"role": "admin"})
+        cache.set("b", {"role": "user"})
+        cache.set("c", {"role": "user"})
+
+        cache.delete("a")
+        assert cache.get("a") is None
+
+        cache.delete_where(lambda user: user["role"] == "user")
+        assert cache._entries == {}
+
+
+class TestLRUCache:
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        assert cache.get("a") == 1
+
+        cache.set("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+
+    def test_zero_maxsize_disables_cache(self):
+        cache = LRUCache(maxsize=0)
+        cache.set("a", 1)
+        assert cache.get("a") is None
+
+    def test_clear(self):
+        cache = LRUCache(maxsize=2)
+        cache.set("a", 1)
+        cache.clear()
+        assert cache.get("a") is None
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value
+
+
+class TestEmbeddingCache:
+    def test_evicts_least_recently_used(self):
+        cache = EmbeddingCache(maxsize=2)
+        cache.set(("ollama", "m", "a"), [1.0])
+        cache.set(("ollama", "m", "b"), [2.0])
+        assert cache.get(("ollama", "m", "a")) == [1.0]
+        cache.set(("ollama", "m", "c"), [3.0])
+
+        assert cache.get(("ollama", "m", "b")) is None
+        assert cache.get_metrics() == {
+            "size": 2,
+            "maxsize": 2,
+            "redis": False,
+            "hits": 1,
+            "redis_hits": 0,
+            "misses": 1,
+            "hit_rate": 0.5,
+        }
+
+    def test_zero_maxsize_disables_cache(self):
+        cache = EmbeddingCache(maxsize=0)
+        cache.set(("ollama", "m", "a"), [1.0])
+        assert cache.get(("ollama", "m", "a")) is None
+        assert cache.get_metrics()["misses"] == 0
+
+    def test_redis_is_shared_between_workers(self):
+        redis = FakeRedis()
+        worker, other_worker = EmbeddingCache(maxsize=2), EmbeddingCache(maxsize=2)
+        worker._redis = other_worker._redis = redis
+
+        worker.set(("ollama", "m", "a"), [0.5, -1.0])
+        assert other_worker.get(("ollama", "m", "a")) == [0.5, -1.0]
+        assert other_worker.get(("ollama", "m", "a")) == [0.5, -1.0]
+        assert (other_worker.hits, other_worker.redis_hits) == (1, 1)
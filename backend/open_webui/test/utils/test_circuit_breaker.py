@@ -0,0 +1,104 @@
+import time
+
+import pytest
+
+from open_webui.utils.circuit_breaker import CircuitBreaker, CircuitBreakerRegistry
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [time.monotonic()]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    return now
+
+
+class TestCircuitBreaker:
+    def test_opens_after_consecutive_failures(self, clock):
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+
+        assert not breaker.record_failure("error")
+        assert not breaker.record_failure("error")
+        assert not breaker.record_success()
+        assert breaker.consecutive_failures == 0
+
+        assert not breaker.record_failure("error")
+        assert not breaker.record_failure("error")
+        assert breaker.record_failure("timeout")
+        assert breaker.state == "open"
+        assert breaker.times_opened == 1
+        assert breaker.last_error == "timeout"
+        assert not breaker.available()
+        assert not breaker.allow()
+
+    def test_half_open_lets_a_single_trial_through(self, clock):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+        breaker.record_failure()
+
+        clock[0] += 30
+        assert breaker.available()
+        assert breaker.state == "half_open"
+        assert breaker.allow()
+        assert not breaker.available()
+        assert not breaker.allow()
+
+        # A trial that never reports back is given up after reset_timeout
+        clock[0] += 30
+        assert breaker.allow()
+
+    def test_trial_success_closes(self, clock):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+        breaker.record_failure()
+        clock[0] += 30
+        breaker.allow()
+
+        assert breaker.record_success()
+        assert breaker.state == "closed"
+        assert breaker.available()
+
+    def test_trial_failure_reopens(self, clock):
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+        for _ in range(3):
+            breaker.record_failure()
+        clock[0] += 30
+        breaker.allow()
+
+        assert breaker.record_failure()
+        assert breaker.state == "open"
+        assert breaker.times_opened == 2
+
+        clock[0] += 29
+        assert not breaker.available()
+
+    def test_failed_probe_while_open_extends_the_wait(self, clock):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+        breaker.record_failure()
+
+        clock[0] += 20
+        assert not breaker.record_failure("probe")
+        clock[0] += 20
+        assert not breaker.available()
+        clock[0] += 10
+        assert breaker.available()
+
+    def test_probe_success_closes_open_breaker(self, clock):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+        breaker.record_failure()
+
+        assert breaker.record_success()
+        assert breaker.available()
+
+
+class TestCircuitBreakerRegistry:
+    def test_breakers_per_url(self, clock):
+        breakers = CircuitBreakerRegistry(failure_threshold=1, reset_timeout=30)
+        breakers.record_failure("http://a", "error")
+
+        assert not breakers.available("http://a")
+        assert breakers.available("http://b")
+
+        metrics = breakers.get_metrics(["http://a", "http://b"])
+        assert [metric["state"] for metric in metrics] == ["open", "closed"]
+        assert metrics[0]["last_error"] == "error"
+
+        clock[0] += 30
+        assert breakers.get_metrics(["http://a"])[0]["state"] == "half_open"
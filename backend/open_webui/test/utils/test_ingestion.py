@@ -0,0 +1,155 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from open_webui.apps.retrieval.loaders.main import DocumentLoadError
+from open_webui.apps.webui.models.file_jobs import FileJobs
+from open_webui.utils import ingestion
+from open_webui.utils.ingestion import IngestionQueue, is_permanent_error
+
+
+@pytest.fixture
+def queue(file_job_db):
+    return IngestionQueue(max_attempts=2, retry_delay=10, wait_timeout=5)
+
+
+def claim_job(file_id: str = "file-1"):
+    FileJobs.insert_new_job(file_id, "user-1")
+    return FileJobs.claim_next_job()
+
+
+class TestIngestionQueue:
+    def test_run_completes_job(self, queue, monkeypatch):
+        processed = []
+        monkeypatch.setattr(
+            ingestion, "process_file", lambda form: processed.append(form.file_id)
+        )
+
+        job = claim_job()
+        asyncio.run(queue._run(job))
+
+        assert processed == ["file-1"]
+        job = FileJobs.get_job_by_id(job.id)
+        assert job.status == "completed"
+        assert job.error is None
+
+    def test_run_retries_with_backoff_then_fails(self, queue, monkeypatch):
+        def process_file(form):
+            raise HTTPException(status_code=400) from ConnectionError("Timeout")
+
+        monkeypatch.setattr(ingestion, "process_file", process_file)
+
+        job = claim_job()
+        asyncio.run(queue._run(job))
+
+        job = FileJobs.get_job_by_id(job.id)
+        assert job.status == "pending"
+        assert job.error == "Bad Request"
+        assert job.run_after >= int(time.time()) + queue.retry_delay - 1
+        assert FileJobs.claim_next_job() is None
+
+        FileJobs.update_job_status_by_id(job.id, "pending", job.error)
+        job = FileJobs.claim_next_job()
+        assert job.attempts == 2
+        asyncio.run(queue._run(job))
+
+        job = FileJobs.get_job_by_id(job.id)
+        assert job.status == "failed"
+        assert job.error == "Bad Request"
+
+    @pytest.mark.parametrize(
+        "error",
+        [
+            ValueError("The content provided is empty."),
+            HTTPException(status_code=400, detail="Invalid text splitter"),
+        ],
+    )
+    def test_run_fails_right_away_on_permanent_errors(self, queue, monkeypatch, error):
+        def process_file(form):
+            try:
+                raise error
+            except Exception as e:
+                raise HTTPException(status_code=400, detail=str(e)) from e
+
+        monkeypatch.setattr(ingestion, "process_file", process_file)
+
+        job = claim_job()
+        asyncio.run(queue._run(job))
+
+        job = FileJobs.get_job_by_id(job.id)
+        assert job.status == "failed"
+        assert job.attempts == 1
+
+    def test_wait_for_file_returns_finished_job(self, queue):
+        job = claim_job()
+        FileJobs.update_job_status_by_id(job.id, "completed")
+
+        assert queue.wait_for_file("file-1").status == "completed"
+        assert queue.wait_for_file("file-2") is None
+
+    def test_wait_for_file_times_out(self, queue):
+        claim_job()
+
+        start = time.monotonic()
+        assert queue.wait_for_file("file-1", timeout=0.2).status == "processing"
+        assert time.monotonic() - start < 2
+        assert queue._waiters == {}
+
+    def test_wait_for_file_wakes_up_when_job_finishes(self, queue, monkeypatch):
+        monkeypatch.setattr(ingestion, "process_file", lambda form: None)
+        # Long enough that only the wake up can end the wait in time
+        queue.poll_interval = 30
+
+        job = claim_job()
+        waiting = threading.Event()
+        result = {}
+
+        def wait():
+            waiting.set()
+            start = time.monotonic()
+            result["job"] = queue.wait_for_file("file-1", timeout=30)
+            result["elapsed"] = time.monotonic() - start
+
+        thread = threading.Thread(target=wait)
+        thread.start()
+        waiting.wait()
+        time.sleep(0.1)
+        asyncio.run(queue._run(job))
+        thread.join(timeout=10)
+
+        assert result["job"].status == "completed"
+        assert result["elapsed"] < 10
+
+
+class TestIsPermanentError:
+    @pytest.mark.parametrize(
+        "error, permanent",
+        [
+            (ValueError("Invalid text splitter"), True),
+            (UnicodeDecodeError("utf-8", b"", 0, 1, "invalid"), True),
+            (HTTPException(status_code=404), True),
+            (HTTPException(status_code=502), False),
+            (ConnectionError("Connection refused"), False),
+            (TimeoutError(), False),
+            (DocumentLoadError("Parsing a.pdf took longer than 1 seconds"), True),
+        ],
+    )
+    def test_errors(self, error, permanent):
+        assert is_permanent_error(error) == permanent
+
+    def test_wrapped_errors(self):
+        for cause, permanent in [
+            (ValueError("empty"), True),
+            (ConnectionError("Connection refused"), False),
+            (HTTPException(status_code=500), False),
+        ]:
+            try:
+                try:
+                    raise cause
+                except Exception as e:
+                    raise HTTPException(status_code=400, detail=str(e)) from e
+            except HTTPException as e:
+                assert is_permanent_error(e) == permanent
@@ -0,0 +1,70 @@
+import asyncio
+
+from open_webui.utils.middleware import LoadModelsMiddleware
+from open_webui.utils.security_headers import SecurityHeadersMiddleware
+
+
+async def endpoint(scope, receive, send):
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"text/event-stream")],
+        }
+    )
+    for chunk in [b"data: a\n\n", b"data: b\n\n"]:
+        await send({"type": "http.response.body", "body": chunk, "more_body": True})
+    await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+def call(app, scope_type="http"):
+    sent = []
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": scope_type, "path": "/", "headers": []}
+    asyncio.run(app(scope, receive, send))
+    return sent
+
+
+class TestLoadModelsMiddleware:
+    def test_models_are_loaded_while_empty(self):
+        models = {}
+        loads = []
+
+        async def load_models():
+            loads.append(1)
+            models["llama3:latest"] = {}
+
+        app = LoadModelsMiddleware(endpoint, lambda: models, load_models)
+        call(app)
+        call(app)
+        assert loads == [1]
+
+    def test_lifespan_does_not_load_models(self):
+        async def load_models():
+            raise AssertionError("Models loaded")
+
+        async def lifespan(scope, receive, send):
+            pass
+
+        call(LoadModelsMiddleware(lifespan, dict, load_models), "lifespan")
+
+
+class TestSecurityHeadersMiddleware:
+    def test_headers_are_added_and_stream_is_relayed(self, monkeypatch):
+        monkeypatch.setenv("XFRAME_OPTIONS", "DENY")
+        sent = call(SecurityHeadersMiddleware(endpoint))
+
+        headers = dict(sent[0]["headers"])
+        assert headers[b"x-frame-options"] == b"DENY"
+        assert headers[b"content-type"] == b"text/event-stream"
+        assert [m.get("body") for m in sent[1:]] == [
+            b"data: a\n\n",
+            b"data: b\n\n",
+            b"",
+        ]
@@ -0,0 +1,82 @@
+import time
+
+import pytest
+
+from open_webui.utils.circuit_breaker import CircuitBreakerRegistry
+from open_webui.utils.routing import UpstreamRouter
+
+URLS = ["http://a", "http://b", "http://c"]
+
+
+class TestUpstreamRouter:
+    def test_least_outstanding(self):
+        router = UpstreamRouter(strategy="least_outstanding")
+        router.track(URLS[0])
+        router.track(URLS[0])
+        tracker = router.track(URLS[1])
+
+        assert router.pick([0, 1, 2], URLS, "llama") == 2
+        assert router.pick([0, 1], URLS, "llama") == 1
+
+        tracker.finish()
+        tracker.finish()
+        assert router.get_stats(URLS[1]).in_flight == 0
+
+    def test_ewma_prefers_fast_urls(self, monkeypatch):
+        router = UpstreamRouter(strategy="ewma", alpha=0.5)
+        now = time.monotonic()
+        monkeypatch.setattr(time, "monotonic", lambda: now)
+        slow = router.track(URLS[0])
+        fast = router.track(URLS[1])
+
+        monkeypatch.setattr(time, "monotonic", lambda: now + 0.1)
+        fast.first_byte()
+        fast.finish()
+        monkeypatch.setattr(time, "monotonic", lambda: now + 2)
+        slow.first_byte()
+        slow.finish()
+
+        assert router.get_stats(URLS[0]).ewma_latency == pytest.approx(2)
+        assert router.pick([0, 1], URLS, "llama") == 1
+
+        # URLs without samples are probed first
+        assert router.pick([0, 1, 2], URLS, "llama") == 2
+
+    def test_ewma_penalizes_errors(self):
+        router = UpstreamRouter(strategy="ewma")
+        for url in URLS[:2]:
+            tracker = router.track(url)
+            tracker.first_byte()
+            router.get_stats(url).ewma_latency = 1.0
+            tracker.finish(error=url == URLS[0])
+
+        assert router.get_stats(URLS[0]).errors == 1
+        assert router.pick([0, 1], URLS, "llama") == 1
+
+    def test_affinity_prefers_warm_urls_unless_busy(self):
+        router = UpstreamRouter(strategy="affinity", affinity_max_extra_in_flight=1)
+        router.track(URLS[1], "llama").finish()
+        router.get_stats(URLS[1]).ewma_latency = 1.0
+
+        assert router.pick([0, 1], URLS, "llama") == 1
+        assert router.get_table(URLS)[1]["warm_models"] == ["llama"]
+
+        router.track(URLS[1])
+        router.track(URLS[1])
+        assert router.pick([0, 1], URLS, "llama") == 0
+
+    def test_unknown_strategy_falls_back_to_random(self):
+        router = UpstreamRouter()
+        assert router.pick([0, 1], URLS, "llama", strategy="missing") in (0, 1)
+
+    def test_open_breakers_are_skipped(self):
+        breakers = CircuitBreakerRegistry(failure_threshold=1, reset_timeout=30)
+        router = UpstreamRouter(strategy="random", breakers=breakers)
+        router.track(URLS[0]).finish(error=True)
+
+        assert breakers.get(URLS[0]).state == "open"
+        assert all(router.pick([0, 1], URLS, "llama") == 1 for _ in range(10))
+
+        # With every breaker open a URL is still picked
+        assert router.pick([0], URLS, "llama") == 0
+        assert router.get_table(URLS)[0]["breaker"] == "open"
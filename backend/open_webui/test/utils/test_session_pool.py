@@ -0,0 +1,81 @@
+import asyncio
+import threading
+
+import pytest
+
+from open_webui.utils.session_pool import ClientSessionPool
+
+
+def make_pool():
+    return ClientSessionPool(limit_per_host=10, keepalive_timeout=30, ttl_dns_cache=300)
+
+
+class TestClientSessionPool:
+    def test_sessions_are_shared_per_origin(self):
+        pool = make_pool()
+
+        async def main():
+            session = pool.get("http://localhost:11434/api/chat")
+            assert pool.get("http://localhost:11434/api/tags") is session
+            assert pool.get("http://localhost:11435/api/tags") is not session
+            assert pool.get("https://localhost:11434/api/tags") is not session
+            assert session.connector.limit_per_host == 10
+
+            await pool.close()
+            assert session.closed
+            assert pool._sessions == {}
+
+        asyncio.run(main())
+
+    def test_closed_session_is_replaced(self):
+        pool = make_pool()
+
+        async def main():
+            session = pool.get("http://localhost:11434")
+            await session.close()
+            assert pool.get("http://localhost:11434") is not session
+            await pool.close()
+
+        asyncio.run(main())
+
+    def test_run_without_loop_closes_sessions(self):
+        pool = make_pool()
+
+        async def request():
+            return pool.get("http://localhost:11434")
+
+        session = pool.run(request())
+        assert session.closed
+        assert pool._sessions == {}
+
+    def test_run_hands_over_to_application_loop(self):
+        pool = make_pool()
+        pool.loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=pool.loop.run_forever)
+        thread.start()
+
+        async def request():
+            assert asyncio.get_running_loop() is pool.loop
+            return pool.get("http://localhost:11434")
+
+        try:
+            session = pool.run(request())
+            assert not session.closed
+            assert pool.run(request()) is session
+        finally:
+            asyncio.run_coroutine_threadsafe(pool.close(), pool.loop).result()
+            pool.loop.call_soon_threadsafe(pool.loop.stop)
+            thread.join()
+            pool.loop.close()
+
+    def test_run_from_event_loop_is_rejected(self):
+        pool = make_pool()
+
+        async def request():
+            return None
+
+        async def main():
+            with pytest.raises(RuntimeError):
+                pool.run(request())
+
+        asyncio.run(main())
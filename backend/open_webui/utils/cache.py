@@ -0,0 +1,409 @@
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+import uuid
+from array import array
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+import redis
+from open_webui.env import (
+    MODELS_CACHE_TTL,
+    PLUGINS_CACHE_TTL,
+    RAG_EMBEDDING_CACHE_REDIS_TTL,
+    RAG_EMBEDDING_CACHE_REDIS_URL,
+    RAG_EMBEDDING_CACHE_SIZE,
+    RAG_RERANKING_SCORE_CACHE_SIZE,
+    SRC_LOG_LEVELS,
+    USER_CACHE_TTL,
+    WEBSOCKET_MANAGER,
+    WEBSOCKET_REDIS_URL,
+)
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MAIN"])
+
+
+class InvalidationChannel:
+    """
+    Redis pub/sub channel over which workers tell each other to drop a cache.
+    Once `start()` has subscribed, `on_message` is called on a Redis thread
+    for every `publish()` of another worker. Without a Redis URL both are
+    no-ops.
+    """
+
+    def __init__(
+        self, name: str, redis_url: Optional[str], on_message: Callable[[], None]
+    ):
+        self.name = f"open-webui:{name}"
+        self.redis_url = redis_url
+        self.on_message = on_message
+        self.worker_id = str(uuid.uuid4())
+        self._redis = None
+        self._thread = None
+
+    def start(self):
+        if self.redis_url is None or self._thread is not None:
+            return
+
+        self._redis = redis.Redis.from_url(self.redis_url, decode_responses=True)
+        pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{self.name: self._on_message})
+        self._thread = pubsub.run_in_thread(sleep_time=1, daemon=True)
+
+    def stop(self):
+        if self._thread is not None:
+            self._thread.stop()
+            self._thread = None
+
+    def _on_message(self, message: dict):
+        # Workers ignore their own messages echoed back by Redis
+        if message.get("data") != self.worker_id:
+            self.on_message()
+
+    def publish(self):
+        if self._redis is not None:
+            try:
+                self._redis.publish(self.name, self.worker_id)
+            except Exception as e:
+                log.error(f"Failed to broadcast {self.name} invalidation: {e}")
+
+
+class AsyncTTLCache:
+    """
+    Caches the result of an async loader for `ttl` seconds.
+
+    Concurrent callers share a single in-flight load. Once the TTL has elapsed
+    the stale value keeps being served while a refresh runs in the background,
+    so callers only wait when there is no value at all. `invalidate()` drops the
+    value, forcing the next caller to wait for a fresh load. With a Redis URL,
+    invalidations are published to the other workers, which drop their value
+    too once `start()` has subscribed them.
+    """
+
+    def __init__(
+        self, ttl: float, name: str = "async_ttl_cache", redis_url: Optional[str] = None
+    ):
+        self.ttl = ttl
+        self._value: Any = None
+        self._loaded_at = 0.0
+        self._generation = 0
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._channel = InvalidationChannel(name, redis_url, self._on_message)
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._channel.start()
+
+    def stop(self):
+        self._channel.stop()
+
+    def _on_message(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._invalidate)
+
+    def _invalidate(self):
+        # Loads started before the invalidation must neither be reused nor
+        # allowed to store their (possibly outdated) result.
+        self._generation += 1
+        self._value = None
+        self._loaded_at = 0.0
+        self._task = None
+
+    def invalidate(self, broadcast: bool = True):
+        """
+        Drops the value, on the other workers too unless `broadcast` is False
+        for changes only this worker sees.
+        """
+        self._invalidate()
+        if broadcast:
+            self._channel.publish()
+
+    async def _load(self, loader: Callable[[], Awaitable[Any]], generation: int):
+        value = await loader()
+        if generation == self._generation:
+            self._value = value
+            self._loaded_at = time.monotonic()
+        return value
+
+    def _on_background_done(self, task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            log.error(f"Background cache refresh failed: {task.exception()}")
+
+    def _refresh(
+        self, loader: Callable[[], Awaitable[Any]], background: bool = False
+    ) -> asyncio.Task:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._load(loader, self._generation))
+            if background:
+                self._task.add_done_callback(self._on_background_done)
+        return self._task
+
+    async def get(self, loader: Callable[[], Awaitable[Any]]) -> Any:
+        if self._value is not None and self.ttl > 0:
+            if time.monotonic() - self._loaded_at < self.ttl:
+                return self._value
+
+            # Stale while revalidate
+            self._refresh(loader, background=True)
+            return self._value
+
+        # Shield the shared load so one cancelled request does not cancel it
+        # for every other caller waiting on it.
+        return await asyncio.shield(self._refresh(loader))
+
+
+class VersionedCache:
+    """
+    In-process cache of rows that rarely change, such as functions, tools and
+    their valves.
+
+    Writers call `bump()`, which drops every entry and increments the
+    version; a load that started before the bump is not stored. With a Redis
+    URL, bumps are published to the other workers, which drop their entries
+    too once `start()` has subscribed them. Without one, other workers only
+    see changes once their entries are `ttl` seconds old, which is also the
+    fallback for missed messages. A `ttl` of 0 keeps entries until a bump.
+    """
+
+    def __init__(self, name: str, redis_url: Optional[str] = None, ttl: float = 0):
+        self.ttl = ttl
+        self.version = 0
+        # Key -> (version, expiry, value)
+        self._entries: dict[Hashable, tuple[int, float, Any]] = {}
+        self._lock = threading.Lock()
+        self._channel = InvalidationChannel(name, redis_url, self._invalidate)
+
+    def start(self):
+        self._channel.start()
+
+    def stop(self):
+        self._channel.stop()
+
+    def _invalidate(self):
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+
+    def bump(self):
+        self._invalidate()
+        self._channel.publish()
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        version = self.version
+        entry = self._entries.get(key)
+        if (
+            entry is not None
+            and entry[0] == version
+            and (self.ttl <= 0 or entry[1] > time.monotonic())
+        ):
+            return entry[2]
+
+        value = loader()
+        # Failed lookups return None, so they are retried rather than cached
+        if value is not None:
+            with self._lock:
+                if self.version == version:
+                    self._entries[key] = (version, time.monotonic() + self.ttl, value)
+        return value
+
+
+class TTLCache:
+    """
+    Thread-safe keyed cache whose entries expire `ttl` seconds after being
+    set. Once `maxsize` entries are held, expired entries are dropped and, if
+    still full, the oldest entry is evicted.
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 10000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: dict[Hashable, tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            self._entries.pop(key, None)
+            return None
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any):
+        if self.ttl <= 0:
+            return
+
+        with self._lock:
+            if len(self._entries) >= self.maxsize and key not in self._entries:
+                now = time.monotonic()
+                self._entries = {
+                    k: entry for k, entry in self._entries.items() if entry[0] >= now
+                }
+                if len(self._entries) >= self.maxsize:
+                    self._entries.pop(next(iter(self._entries)))
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def delete_where(self, predicate: Callable[[Any], bool]):
+        with self._lock:
+            self._entries = {
+                key: entry
+                for key, entry in self._entries.items()
+                if not predicate(entry[1])
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+
+
+class LRUCache:
+    """
+    Thread-safe keyed cache holding at most `maxsize` entries, evicting the
+    least recently used one first. A `maxsize` of 0 disables it.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: OrderedDict[Hashable, Any] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        if self.maxsize <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class EmbeddingCache:
+    """
+    Thread-safe LRU cache of embeddings keyed by (engine, model, text), holding
+    at most `maxsize` of them. With a Redis URL, embeddings missing from memory
+    are looked up in Redis, where they are shared between workers for
+    `redis_ttl` seconds.
+    """
+
+    def __init__(
+        self, maxsize: int, redis_url: Optional[str] = None, redis_ttl: int = 86400
+    ):
+        self.maxsize = maxsize
+        self.redis_ttl = redis_ttl
+        self._entries = LRUCache(maxsize)
+        self._redis = (
+            redis.Redis.from_url(redis_url) if redis_url and maxsize > 0 else None
+        )
+
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    def _redis_key(self, key: tuple[str, str, str]) -> str:
+        return (
+            "open-webui:embedding:"
+            + hashlib.sha256("\0".join(key).encode()).hexdigest()
+        )
+
+    def get(self, key: tuple[str, str, str]) -> Optional[list[float]]:
+        if self.maxsize <= 0:
+            return None
+
+        embedding = self._entries.get(key)
+        if embedding is not None:
+            self.hits += 1
+            return embedding
+
+        if self._redis is not None:
+            try:
+                value = self._redis.get(self._redis_key(key))
+            except Exception as e:
+                log.error(f"Failed to read embedding from Redis: {e}")
+                value = None
+
+            if value is not None:
+                embedding = array("d", value).tolist()
+                self._entries.set(key, embedding)
+                self.redis_hits += 1
+                return embedding
+
+        self.misses += 1
+        return None
+
+    def set(self, key: tuple[str, str, str], embedding: list[float]):
+        if self.maxsize <= 0:
+            return
+
+        self._entries.set(key, embedding)
+        if self._redis is not None:
+            try:
+                self._redis.set(
+                    self._redis_key(key),
+                    array("d", embedding).tobytes(),
+                    ex=self.redis_ttl,
+                )
+            except Exception as e:
+                log.error(f"Failed to write embedding to Redis: {e}")
+
+    def clear(self):
+        self._entries.clear()
+
+    def get_metrics(self) -> dict:
+        lookups = self.hits + self.redis_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "redis": self._redis is not None,
+            "hits": self.hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_rate": (
+                round((self.hits + self.redis_hits) / lookups, 4) if lookups else None
+            ),
+        }
+
+
+MODELS_CACHE = AsyncTTLCache(
+    ttl=MODELS_CACHE_TTL,
+    name="models_cache",
+    redis_url=WEBSOCKET_REDIS_URL if WEBSOCKET_MANAGER == "redis" else None,
+)
+
+USER_CACHE = TTLCache(ttl=USER_CACHE_TTL)
+
+PLUGINS_CACHE = VersionedCache(
+    "plugins_cache",
+    redis_url=WEBSOCKET_REDIS_URL if WEBSOCKET_MANAGER == "redis" else None,
+    ttl=PLUGINS_CACHE_TTL,
+)
+
+RERANK_SCORE_CACHE = LRUCache(maxsize=RAG_RERANKING_SCORE_CACHE_SIZE)
+
+EMBEDDING_CACHE = EmbeddingCache(
+    maxsize=RAG_EMBEDDING_CACHE_SIZE,
+    redis_url=RAG_EMBEDDING_CACHE_REDIS_URL,
+    redis_ttl=RAG_EMBEDDING_CACHE_REDIS_TTL,
+)
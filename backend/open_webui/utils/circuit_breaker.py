@@ -0,0 +1,182 @@
+import logging
+import time
+from typing import Optional
+
+import aiohttp
+from open_webui.env import (
+    SRC_LOG_LEVELS,
+    UPSTREAM_CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+    UPSTREAM_CIRCUIT_BREAKER_RESET_TIMEOUT,
+    UPSTREAM_HEALTH_CHECK_TIMEOUT,
+)
+from open_webui.utils.cache import MODELS_CACHE
+from open_webui.utils.session_pool import CLIENT_SESSION_POOL
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MAIN"])
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker for one upstream base URL.
+
+    closed: requests flow; `failure_threshold` consecutive failures open it.
+    open: requests are refused until `reset_timeout` seconds have passed.
+    half_open: a single trial request is let through; its outcome closes or
+    re-opens the breaker. Health probes report like requests do, so a probe
+    success closes an open breaker without waiting for user traffic.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.trial_started_at: Optional[float] = None
+
+        self.successes = 0
+        self.failures = 0
+        self.times_opened = 0
+        self.last_error: Optional[str] = None
+
+    def _update_state(self):
+        if (
+            self.state == "open"
+            and time.monotonic() - self.opened_at >= self.reset_timeout
+        ):
+            self.state = "half_open"
+            self.trial_started_at = None
+
+    def available(self) -> bool:
+        """Whether a request may be sent now, without claiming the trial."""
+        self._update_state()
+        if self.state == "half_open":
+            # A trial that never reported back is considered lost
+            return (
+                self.trial_started_at is None
+                or time.monotonic() - self.trial_started_at >= self.reset_timeout
+            )
+        return self.state == "closed"
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now, claiming the trial if half open."""
+        if not self.available():
+            return False
+        if self.state == "half_open":
+            self.trial_started_at = time.monotonic()
+        return True
+
+    def record_success(self) -> bool:
+        """Returns True if the breaker closed as a result."""
+        self.successes += 1
+        self.consecutive_failures = 0
+        self.trial_started_at = None
+
+        changed = self.state != "closed"
+        self.state = "closed"
+        return changed
+
+    def record_failure(self, error: Optional[str] = None) -> bool:
+        """Returns True if the breaker opened as a result."""
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.trial_started_at = None
+        if error is not None:
+            self.last_error = error
+
+        if self.state == "open":
+            # Failed probe while open, keep refusing for another period
+            self.opened_at = time.monotonic()
+            return False
+
+        if (
+            self.state == "half_open"
+            or self.consecutive_failures >= self.failure_threshold
+        ):
+            self.state = "open"
+            self.opened_at = time.monotonic()
+            self.times_opened += 1
+            return True
+        return False
+
+
+class CircuitBreakerRegistry:
+    """
+    Circuit breakers for upstream LLM endpoints, keyed by base URL.
+
+    Opening or closing a breaker changes which models are reachable, so the
+    aggregated model list is invalidated on every transition.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._breakers: dict[str, CircuitBreaker] = {}
+
+    def get(self, url: str) -> CircuitBreaker:
+        breaker = self._breakers.get(url)
+        if breaker is None:
+            breaker = self._breakers[url] = CircuitBreaker(
+                self.failure_threshold, self.reset_timeout
+            )
+        return breaker
+
+    def available(self, url: str) -> bool:
+        return self.get(url).available()
+
+    def allow(self, url: str) -> bool:
+        return self.get(url).allow()
+
+    def record_success(self, url: str):
+        if self.get(url).record_success():
+            log.info(f"Circuit breaker closed for {url}")
+            # Breakers are per worker, so are the models they hide
+            MODELS_CACHE.invalidate(broadcast=False)
+
+    def record_failure(self, url: str, error: Optional[str] = None):
+        if self.get(url).record_failure(error):
+            log.warning(f"Circuit breaker opened for {url}: {error}")
+            MODELS_CACHE.invalidate(broadcast=False)
+
+    async def probe(self, url: str, probe_url: str, headers: Optional[dict] = None):
+        """Health probe for an upstream; any response below 500 counts as up."""
+        try:
+            session = CLIENT_SESSION_POOL.get(probe_url)
+            async with session.get(
+                probe_url,
+                headers=headers,
+                timeout=aiohttp.ClientTimeout(total=UPSTREAM_HEALTH_CHECK_TIMEOUT),
+            ) as response:
+                if response.status >= 500:
+                    self.record_failure(url, f"Health probe: HTTP {response.status}")
+                else:
+                    self.record_success(url)
+        except Exception as e:
+            self.record_failure(url, f"Health probe: {str(e) or type(e).__name__}")
+
+    def get_metrics(self, urls: list[str]) -> list[dict]:
+        metrics = []
+        for idx, url in enumerate(urls):
+            breaker = self.get(url)
+            breaker.available()
+            metrics.append(
+                {
+                    "idx": idx,
+                    "url": url,
+                    "state": breaker.state,
+                    "consecutive_failures": breaker.consecutive_failures,
+                    "successes": breaker.successes,
+                    "failures": breaker.failures,
+                    "times_opened": breaker.times_opened,
+                    "last_error": breaker.last_error,
+                }
+            )
+        return metrics
+
+
+UPSTREAM_BREAKERS = CircuitBreakerRegistry(
+    failure_threshold=UPSTREAM_CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+    reset_timeout=UPSTREAM_CIRCUIT_BREAKER_RESET_TIMEOUT,
+)
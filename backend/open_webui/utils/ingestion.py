@@ -0,0 +1,246 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Optional
+
+from fastapi import HTTPException
+from open_webui.apps.retrieval.loaders.main import DocumentLoadError
+from open_webui.apps.retrieval.main import ProcessFileForm, process_file
+from open_webui.apps.retrieval.main import app as retrieval_app
+from open_webui.apps.socket.main import USER_POOL, sio
+from open_webui.apps.webui.models.file_jobs import FileJobModel, FileJobs
+from open_webui.config import (
+    RAG_FILE_PROCESSING_MAX_ATTEMPTS,
+    RAG_FILE_PROCESSING_RETRY_DELAY,
+    RAG_FILE_PROCESSING_WAIT_TIMEOUT,
+)
+from open_webui.env import SRC_LOG_LEVELS
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+
+def is_permanent_error(e: Exception) -> bool:
+    # process_file reports every failure as a 400, the error it wraps tells
+    # whether retrying could help. Invalid files and requests fail the same
+    # way every time, as do documents whose parsing ran over the time or
+    # memory limit. Anything else (unreachable servers) may not.
+    if isinstance(e, HTTPException) and e.__cause__ is not None:
+        e = e.__cause__
+    if isinstance(e, HTTPException):
+        return 400 <= e.status_code < 500
+    return isinstance(e, (ValueError, DocumentLoadError))
+
+
+class IngestionQueue:
+    """
+    Processes uploaded files in the background.
+
+    Jobs are rows of the file_job table, so they survive restarts and are
+    shared by all workers: each worker runs up to
+    FILE_PROCESSING_MAX_CONCURRENCY of them at a time, claiming pending jobs
+    atomically. Running jobs report in every `heartbeat_interval` seconds;
+    jobs that stop reporting for `stale_timeout` seconds (their worker died)
+    are put back in the queue. Jobs failing on a transient error are retried
+    with exponential backoff until `max_attempts` is reached, jobs failing on
+    the file itself fail right away.
+
+    Job status changes are sent to the owner's sessions as `file-events`, and
+    wake up requests of this worker waiting for the file in `wait_for_file`.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int,
+        retry_delay: int,
+        wait_timeout: float = 30.0,
+        poll_interval: float = 2.0,
+        heartbeat_interval: float = 30.0,
+        stale_timeout: int = 300,
+    ):
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_timeout = stale_timeout
+
+        # Events of the requests waiting in wait_for_file, by file id
+        self._waiters: dict[str, set[threading.Event]] = {}
+        self._waiters_lock = threading.Lock()
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._running: set[asyncio.Task] = set()
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def stop(self):
+        # Jobs still running are picked up again once they turn stale
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            self._dispatcher = None
+
+    def _notify(self):
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def enqueue(self, file_id: str, user_id: str) -> Optional[FileJobModel]:
+        job = FileJobs.insert_new_job(file_id, user_id)
+        self._notify()
+        return job
+
+    def wait_for_file(
+        self, file_id: str, timeout: Optional[float] = None
+    ) -> Optional[FileJobModel]:
+        """
+        Blocks until the latest job of the file is finished, or `timeout`
+        seconds (by default `wait_timeout`) have passed, and returns it. Not
+        to be called from a coroutine.
+        """
+        timeout = self.wait_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+
+        # Registered before the first check, so a job finishing in between
+        # still wakes the wait up
+        finished = threading.Event()
+        with self._waiters_lock:
+            self._waiters.setdefault(file_id, set()).add(finished)
+
+        try:
+            while True:
+                job = FileJobs.get_latest_job_by_file_id(file_id)
+                if job is None or job.status in ("completed", "failed"):
+                    return job
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    log.warning(f"Timed out waiting for file {file_id} to be processed")
+                    return job
+
+                # Jobs run by other workers are only seen by the next check
+                finished.wait(min(remaining, self.poll_interval))
+                finished.clear()
+        finally:
+            with self._waiters_lock:
+                waiters = self._waiters.get(file_id)
+                if waiters is not None:
+                    waiters.discard(finished)
+                    if not waiters:
+                        del self._waiters[file_id]
+
+    def _wake_waiters(self, file_id: str):
+        with self._waiters_lock:
+            for finished in self._waiters.get(file_id, ()):
+                finished.set()
+
+    async def _emit(self, job: FileJobModel):
+        try:
+            for sid in USER_POOL.get(job.user_id, []):
+                await sio.emit(
+                    "file-events",
+                    {
+                        "job_id": job.id,
+                        "file_id": job.file_id,
+                        "status": job.status,
+                        "attempts": job.attempts,
+                        "error": job.error,
+                    },
+                    to=sid,
+                )
+        except Exception as e:
+            log.error(f"Failed to send file job event: {e}")
+
+    async def _dispatch(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                requeued = await asyncio.to_thread(
+                    FileJobs.requeue_stale_jobs, self.stale_timeout
+                )
+                if requeued:
+                    log.warning(f"Requeued {requeued} stale file processing jobs")
+
+                max_concurrency = max(
+                    retrieval_app.state.config.FILE_PROCESSING_MAX_CONCURRENCY, 1
+                )
+                while len(self._running) < max_concurrency:
+                    job = await asyncio.to_thread(FileJobs.claim_next_job)
+                    if job is None:
+                        break
+
+                    task = asyncio.create_task(self._run(job))
+                    self._running.add(task)
+                    task.add_done_callback(self._on_done)
+            except Exception as e:
+                log.exception(f"Error dispatching file processing jobs: {e}")
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def _on_done(self, task: asyncio.Task):
+        self._running.discard(task)
+        self._wakeup.set()
+
+    async def _run(self, job: FileJobModel):
+        log.info(
+            f"Processing file {job.file_id} (job {job.id}, attempt {job.attempts})"
+        )
+        await self._emit(job)
+
+        task = asyncio.create_task(
+            asyncio.to_thread(process_file, ProcessFileForm(file_id=job.file_id))
+        )
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=self.heartbeat_interval)
+            if done:
+                break
+
+            try:
+                await asyncio.to_thread(FileJobs.touch_job_by_id, job.id)
+            except Exception as e:
+                log.error(f"Failed to update file job {job.id}: {e}")
+
+        try:
+            task.result()
+            job = await asyncio.to_thread(
+                FileJobs.update_job_status_by_id, job.id, "completed"
+            )
+        except Exception as e:
+            error = str(e.detail) if hasattr(e, "detail") else str(e)
+            log.error(f"Error processing file {job.file_id}: {error}")
+
+            if job.attempts < self.max_attempts and not is_permanent_error(e):
+                run_after = int(time.time()) + self.retry_delay * 2 ** (
+                    job.attempts - 1
+                )
+                job = await asyncio.to_thread(
+                    FileJobs.update_job_status_by_id,
+                    job.id,
+                    "pending",
+                    error,
+                    run_after,
+                )
+            else:
+                job = await asyncio.to_thread(
+                    FileJobs.update_job_status_by_id, job.id, "failed", error
+                )
+
+        if job is not None:
+            if job.status in ("completed", "failed"):
+                self._wake_waiters(job.file_id)
+            await self._emit(job)
+
+
+INGESTION_QUEUE = IngestionQueue(
+    max_attempts=RAG_FILE_PROCESSING_MAX_ATTEMPTS,
+    retry_delay=RAG_FILE_PROCESSING_RETRY_DELAY,
+    wait_timeout=RAG_FILE_PROCESSING_WAIT_TIMEOUT,
+)
@@ -0,0 +1,26 @@
+from typing import Awaitable, Callable
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+class LoadModelsMiddleware:
+    """
+    Loads the model list of an app before serving a request while the list is
+    empty, as a pure ASGI middleware so that streamed responses pass through
+    as they are.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        get_models: Callable[[], dict],
+        load_models: Callable[[], Awaitable],
+    ):
+        self.app = app
+        self.get_models = get_models
+        self.load_models = load_models
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] == "http" and len(self.get_models()) == 0:
+            await self.load_models()
+        await self.app(scope, receive, send)
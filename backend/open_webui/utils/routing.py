@@ -0,0 +1,232 @@
+import logging
+import random
+import time
+from typing import Callable, Optional
+
+from open_webui.env import SRC_LOG_LEVELS
+from open_webui.utils.circuit_breaker import CircuitBreakerRegistry
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MAIN"])
+
+
+class UpstreamStats:
+    """Load and latency figures for one upstream base URL."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        # Exponentially weighted moving averages of the time to first byte
+        # (seconds) and of the error outcome (0 or 1) of recent requests.
+        self.ewma_latency: Optional[float] = None
+        self.ewma_error_rate = 0.0
+        # Model name -> monotonic time it was last served from this URL.
+        self.models: dict[str, float] = {}
+
+
+class RequestTracker:
+    """
+    Tracks a single request routed to an upstream. `first_byte()` records the
+    time to first byte once the response starts; `finish()` must be called
+    exactly once when the request (or its stream) is over.
+    """
+
+    def __init__(self, router: "UpstreamRouter", url: str, model: Optional[str]):
+        self.router = router
+        self.url = url
+        self.model = model
+        self.started_at = time.monotonic()
+        self.finished = False
+
+        stats = router.get_stats(url)
+        stats.in_flight += 1
+        stats.requests += 1
+
+    def first_byte(self):
+        stats = self.router.get_stats(self.url)
+        latency = time.monotonic() - self.started_at
+        stats.ewma_latency = (
+            latency
+            if stats.ewma_latency is None
+            else self.router.alpha * latency
+            + (1 - self.router.alpha) * stats.ewma_latency
+        )
+
+    def finish(self, error: bool = False):
+        if self.finished:
+            return
+        self.finished = True
+
+        stats = self.router.get_stats(self.url)
+        stats.in_flight = max(stats.in_flight - 1, 0)
+        stats.ewma_error_rate = (
+            self.router.alpha * float(error)
+            + (1 - self.router.alpha) * stats.ewma_error_rate
+        )
+        if error:
+            stats.errors += 1
+        elif self.model:
+            stats.models[self.model] = time.monotonic()
+
+        if self.router.breakers is not None:
+            if error:
+                self.router.breakers.record_failure(self.url, "Request failed")
+            else:
+                self.router.breakers.record_success(self.url)
+
+
+def least_outstanding(
+    router: "UpstreamRouter", candidates: list[int], urls: list[str], model: str
+) -> list[int]:
+    stats = [router.get_stats(urls[idx]) for idx in candidates]
+    lowest = min(s.in_flight for s in stats)
+    return [idx for idx, s in zip(candidates, stats) if s.in_flight == lowest]
+
+
+def ewma_latency(
+    router: "UpstreamRouter", candidates: list[int], urls: list[str], model: str
+) -> list[int]:
+    # Expected wait for a new request: recent latency scaled by the queue it
+    # joins, inflated for URLs that have been failing. URLs without samples
+    # score zero so they get probed.
+    def score(idx: int) -> float:
+        stats = router.get_stats(urls[idx])
+        latency = stats.ewma_latency or 0.0
+        return latency * (stats.in_flight + 1) / max(1 - stats.ewma_error_rate, 0.05)
+
+    scores = {idx: score(idx) for idx in candidates}
+    lowest = min(scores.values())
+    return [idx for idx in candidates if scores[idx] == lowest]
+
+
+def model_affinity(
+    router: "UpstreamRouter", candidates: list[int], urls: list[str], model: str
+) -> list[int]:
+    # Prefer URLs that served the model recently and likely still have it
+    # loaded, unless they are noticeably busier than the idlest URL.
+    now = time.monotonic()
+    warm = [
+        idx
+        for idx in candidates
+        if now - router.get_stats(urls[idx]).models.get(model, float("-inf"))
+        < router.affinity_window
+    ]
+
+    if warm:
+        idlest = min(router.get_stats(urls[idx]).in_flight for idx in candidates)
+        warm = [
+            idx
+            for idx in warm
+            if router.get_stats(urls[idx]).in_flight
+            <= idlest + router.affinity_max_extra_in_flight
+        ]
+
+    return ewma_latency(router, warm or candidates, urls, model)
+
+
+def random_choice(
+    router: "UpstreamRouter", candidates: list[int], urls: list[str], model: str
+) -> list[int]:
+    return candidates
+
+
+class UpstreamRouter:
+    """
+    Picks which of several upstream URLs serving a model receives a request.
+
+    A strategy narrows the candidate URL indices down to the equally good
+    ones; the router then picks one of those at random. Strategies are
+    registered in `strategies` by name and can be switched at runtime.
+    URLs whose circuit breaker is open are skipped while any other URL is
+    available.
+    """
+
+    def __init__(
+        self,
+        strategy: str = "least_outstanding",
+        alpha: float = 0.3,
+        affinity_window: float = 300.0,
+        affinity_max_extra_in_flight: int = 2,
+        breakers: Optional[CircuitBreakerRegistry] = None,
+    ):
+        self.strategies: dict[
+            str, Callable[["UpstreamRouter", list[int], list[str], str], list[int]]
+        ] = {
+            "random": random_choice,
+            "least_outstanding": least_outstanding,
+            "ewma": ewma_latency,
+            "affinity": model_affinity,
+        }
+        self.strategy = strategy
+        self.alpha = alpha
+        self.affinity_window = affinity_window
+        self.affinity_max_extra_in_flight = affinity_max_extra_in_flight
+        self.breakers = breakers
+        self._stats: dict[str, UpstreamStats] = {}
+
+    def get_stats(self, url: str) -> UpstreamStats:
+        stats = self._stats.get(url)
+        if stats is None:
+            stats = self._stats[url] = UpstreamStats()
+        return stats
+
+    def pick(
+        self,
+        candidates: list[int],
+        urls: list[str],
+        model: str,
+        strategy: Optional[str] = None,
+    ) -> int:
+        strategy = strategy or self.strategy
+        if strategy not in self.strategies:
+            log.warning(f"Unknown routing strategy {strategy}, using random")
+            strategy = "random"
+
+        if self.breakers is not None:
+            candidates = [
+                idx for idx in candidates if self.breakers.available(urls[idx])
+            ] or candidates
+
+        if len(candidates) > 1:
+            candidates = self.strategies[strategy](self, candidates, urls, model)
+        url_idx = random.choice(candidates)
+
+        if self.breakers is not None:
+            self.breakers.allow(urls[url_idx])
+        return url_idx
+
+    def track(self, url: str, model: Optional[str] = None) -> RequestTracker:
+        return RequestTracker(self, url, model)
+
+    def get_table(self, urls: list[str]) -> list[dict]:
+        now = time.monotonic()
+        table = []
+        for idx, url in enumerate(urls):
+            stats = self.get_stats(url)
+            table.append(
+                {
+                    "idx": idx,
+                    "url": url,
+                    "in_flight": stats.in_flight,
+                    "requests": stats.requests,
+                    "errors": stats.errors,
+                    "ewma_ttfb_ms": (
+                        round(stats.ewma_latency * 1000, 1)
+                        if stats.ewma_latency is not None
+                        else None
+                    ),
+                    "ewma_error_rate": round(stats.ewma_error_rate, 4),
+                    "breaker": (
+                        self.breakers.get(url).state
+                        if self.breakers is not None
+                        else None
+                    ),
+                    "warm_models": sorted(
+                        model
+                        for model, served_at in stats.models.items()
+                        if now - served_at < self.affinity_window
+                    ),
+                }
+            )
+        return table
@@ -0,0 +1,108 @@
+import asyncio
+import logging
+from typing import Any, Coroutine, Optional
+from urllib.parse import urlparse
+
+import aiohttp
+from open_webui.env import (
+    AIOHTTP_CLIENT_DNS_CACHE_TTL,
+    AIOHTTP_CLIENT_KEEPALIVE_TIMEOUT,
+    AIOHTTP_CLIENT_LIMIT_PER_HOST,
+    SRC_LOG_LEVELS,
+)
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MAIN"])
+
+
+class ClientSessionPool:
+    """
+    One long-lived aiohttp.ClientSession per upstream origin, so requests to
+    the same Ollama/OpenAI host reuse TCP/TLS connections instead of opening a
+    new session per request. Sessions are created lazily on first use and
+    closed together by `close()` on application shutdown.
+    """
+
+    def __init__(
+        self,
+        limit_per_host: int,
+        keepalive_timeout: float,
+        ttl_dns_cache: Optional[int],
+    ):
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.ttl_dns_cache = ttl_dns_cache
+        self._sessions: dict[str, aiohttp.ClientSession] = {}
+        # The application's event loop, bound on startup. Sessions belong to
+        # the loop they were created on, so synchronous callers running in
+        # worker threads hand their requests over to it via `run()`.
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def get(self, url: str) -> aiohttp.ClientSession:
+        parsed_url = urlparse(url)
+        origin = f"{parsed_url.scheme}://{parsed_url.netloc}"
+
+        session = self._sessions.get(origin)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=0,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=self.ttl_dns_cache,
+                use_dns_cache=self.ttl_dns_cache is not None,
+            )
+            session = aiohttp.ClientSession(
+                connector=connector,
+                # Requests from different users share the session, so never
+                # replay cookies set by an upstream.
+                cookie_jar=aiohttp.DummyCookieJar(),
+                timeout=aiohttp.ClientTimeout(total=None),
+                trust_env=True,
+            )
+            self._sessions[origin] = session
+            log.debug(f"Created client session for {origin}")
+        return session
+
+    def run(self, coro: Coroutine[Any, Any, Any]) -> Any:
+        """
+        Run `coro` to completion from synchronous code and return its result.
+
+        Must not be called from a coroutine, as it blocks until `coro` is done;
+        offload the synchronous caller with `asyncio.to_thread` instead.
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            coro.close()
+            raise RuntimeError(
+                "ClientSessionPool.run() cannot be called from a running event loop"
+            )
+
+        if self.loop is not None and self.loop.is_running():
+            return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+        # No application loop (e.g. scripts), so run on a temporary loop and
+        # drop the sessions bound to it afterwards.
+        async def run_and_close():
+            try:
+                return await coro
+            finally:
+                await self.close()
+
+        return asyncio.run(run_and_close())
+
+    async def close(self):
+        sessions = list(self._sessions.values())
+        self._sessions = {}
+        for session in sessions:
+            if not session.closed:
+                await session.close()
+
+
+CLIENT_SESSION_POOL = ClientSessionPool(
+    limit_per_host=AIOHTTP_CLIENT_LIMIT_PER_HOST,
+    keepalive_timeout=AIOHTTP_CLIENT_KEEPALIVE_TIMEOUT,
+    ttl_dns_cache=AIOHTTP_CLIENT_DNS_CACHE_TTL,
+)
@@ -0,0 +1,133 @@
+"""
+Measures BM25 query latency against collection size, for the persistent
+index (kept in memory, and loaded from disk) and for the retriever rebuilt
+from all chunks on every query that it replaced, along with the time to
+create an index, and to add 100 chunks to it or delete the chunks of one
+file until the next search sees the change.
+
+    python scripts/benchmark_bm25.py --chunks 1000 5000 10000 50000
+
+Run from the backend directory with the backend's dependencies installed.
+DATA_DIR is pointed at a temporary directory, so nothing is written to the
+regular data directory.
+"""
+
+import argparse
+import itertools
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def get_items(count: int, tokens: int, start: int = 0) -> list[dict]:
+    # Chunks of words drawn from a Zipf-like vocabulary, 20 chunks per file
+    rng = random.Random(start)
+    vocabulary = [f"word{i}" for i in range(20000)]
+    weights = [1 / (i + 1) for i in range(len(vocabulary))]
+    return [
+        {
+            "id": f"chunk-{i}",
+            "text": " ".join(rng.choices(vocabulary, weights, k=tokens)),
+            "metadata": {"file_id": f"file-{i // 20}"},
+        }
+        for i in range(start, start + count)
+    ]
+
+
+def median_ms(run, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--chunks", type=int, nargs="+", default=[1000, 5000, 10000])
+    parser.add_argument("--tokens", type=int, default=180)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix="open-webui-benchmark-")
+    os.environ["DATA_DIR"] = data_dir
+    sys.path.insert(0, BACKEND_DIR)
+    from langchain_community.retrievers import BM25Retriever
+
+    from open_webui.apps.retrieval.bm25 import BM25IndexStore
+
+    queries = [
+        " ".join(f"word{random.Random(i).randrange(2000)}" for _ in range(6))
+        for i in range(args.repeat)
+    ]
+
+    print(
+        f"{'chunks':>8} {'rebuild/query':>14} {'index warm':>11} {'index cold':>11} "
+        f"{'create':>9} {'add 100':>9} {'del file':>9}"
+    )
+    try:
+        for chunks in args.chunks:
+            items = get_items(chunks, args.tokens)
+            texts = [item["text"] for item in items]
+            metadatas = [item["metadata"] for item in items]
+            store = BM25IndexStore(os.path.join(data_dir, "bm25", str(chunks)))
+            queries_left = itertools.cycle(queries)
+
+            def rebuild():
+                retriever = BM25Retriever.from_texts(texts=texts, metadatas=metadatas)
+                retriever.k = args.k
+                retriever.invoke(next(queries_left))
+
+            def search():
+                store.search("benchmark", next(queries_left), args.k, lambda: None)
+
+            def search_cold():
+                # Another worker's first search, which loads the snapshot
+                store._loaded.clear()
+                search()
+
+            rebuild_time = median_ms(rebuild, args.repeat)
+            create_time = median_ms(
+                lambda: store.create("benchmark", items), args.repeat
+            )
+            search()
+            warm_time = median_ms(search, args.repeat)
+            cold_time = median_ms(search_cold, args.repeat)
+
+            def add():
+                store.add("benchmark", next(added))
+                search()
+
+            def delete():
+                store.delete("benchmark", filter={"file_id": next(files)})
+                search()
+
+            added = iter(
+                [
+                    get_items(100, args.tokens, start=chunks + 100 * i)
+                    for i in range(args.repeat)
+                ]
+            )
+            files = iter(f"file-{i}" for i in range(args.repeat))
+            add_time = median_ms(add, args.repeat)
+            delete_time = median_ms(delete, args.repeat)
+
+            print(
+                f"{chunks:>8} {rebuild_time:>12.1f}ms {warm_time:>9.2f}ms "
+                f"{cold_time:>9.1f}ms {create_time:>7.0f}ms {add_time:>7.1f}ms "
+                f"{delete_time:>7.1f}ms"
+            )
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
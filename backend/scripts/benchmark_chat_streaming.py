@@ -0,0 +1,262 @@
+"""
+Load test of streamed chat completions through the full app: measures the
+tokens per second delivered to clients and the time to the first token
+with many concurrent streams.
+
+    python scripts/benchmark_chat_streaming.py --streams 500 --tokens 200
+
+The app is served by uvicorn in a subprocess, in front of a fake Ollama
+server streaming `--tokens` tokens per chat with `--delay` seconds between
+them, so the numbers measure the app's own overhead (middleware, auth and
+response relaying) rather than a model. Streams go through
+/api/chat/completions, which passes the chat completion middleware, and
+through the /ollama/api/chat proxy. Run from the backend directory with the
+backend's dependencies and uvicorn installed. DATA_DIR is pointed at a
+temporary directory, so nothing is written to the regular data directory.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+from aiohttp import web
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL = "bench:latest"
+
+
+def get_free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def serve_ollama(port: int, tokens: int, delay: float):
+    async def version(request):
+        return web.json_response({"version": "0.3.14"})
+
+    async def tags(request):
+        return web.json_response(
+            {
+                "models": [
+                    {
+                        "name": MODEL,
+                        "model": MODEL,
+                        "modified_at": "2024-01-01T00:00:00Z",
+                        "size": 0,
+                        "digest": "0" * 64,
+                        "details": {},
+                    }
+                ]
+            }
+        )
+
+    async def chat(request):
+        await request.json()
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await response.prepare(request)
+        for _ in range(tokens):
+            line = {
+                "model": MODEL,
+                "message": {"role": "assistant", "content": "token "},
+                "done": False,
+            }
+            await response.write(json.dumps(line).encode() + b"\n")
+            if delay:
+                await asyncio.sleep(delay)
+        line = {"model": MODEL, "message": {"content": ""}, "done": True}
+        await response.write(json.dumps(line).encode() + b"\n")
+        await response.write_eof()
+        return response
+
+    app = web.Application()
+    app.router.add_get("/api/version", version)
+    app.router.add_get("/api/tags", tags)
+    app.router.add_post("/api/chat", chat)
+    web.run_app(app, host="127.0.0.1", port=port, print=None, backlog=4096)
+
+
+def count_tokens(line: bytes) -> int:
+    line = line.strip()
+    if line.startswith(b"data:"):
+        line = line[len(b"data:") :].strip()
+    if not line or line == b"[DONE]":
+        return 0
+
+    data = json.loads(line)
+    if "choices" in data:
+        content = data["choices"][0].get("delta", {}).get("content")
+    else:
+        content = data.get("message", {}).get("content")
+    return 1 if content else 0
+
+
+async def stream_chat(session, url: str, headers: dict) -> tuple[int, float]:
+    payload = {
+        "model": MODEL,
+        "messages": [{"role": "user", "content": "Hello"}],
+        "stream": True,
+    }
+    start = time.perf_counter()
+    first_token = None
+    tokens = 0
+    async with session.post(url, json=payload, headers=headers) as r:
+        r.raise_for_status()
+        async for line in r.content:
+            count = count_tokens(line)
+            if count and first_token is None:
+                first_token = time.perf_counter() - start
+            tokens += count
+    return tokens, first_token
+
+
+async def run_streams(url: str, headers: dict, streams: int) -> dict:
+    connector = aiohttp.TCPConnector(limit=0)
+    timeout = aiohttp.ClientTimeout(total=None)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        # Warm up connections and the model list
+        await stream_chat(session, url, headers)
+
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *[stream_chat(session, url, headers) for _ in range(streams)]
+        )
+        elapsed = time.perf_counter() - start
+
+    tokens = sum(count for count, _ in results)
+    first_tokens = sorted(first for _, first in results)
+    return {
+        "tokens": tokens,
+        "seconds": elapsed,
+        "tokens_per_second": tokens / elapsed,
+        "ttft_p50": statistics.median(first_tokens),
+        "ttft_p99": first_tokens[int(len(first_tokens) * 0.99) - 1],
+    }
+
+
+async def wait_for(url: str, timeout: float = 120):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while True:
+            try:
+                async with session.get(url) as r:
+                    if r.status < 500:
+                        return
+            except aiohttp.ClientError:
+                pass
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"{url} did not start")
+            await asyncio.sleep(0.5)
+
+
+async def get_token(base_url: str) -> str:
+    # The first user to sign up becomes an admin
+    async with aiohttp.ClientSession() as session:
+        async with session.post(
+            f"{base_url}/api/v1/auths/signup",
+            json={"name": "Bench", "email": "bench@localhost", "password": "bench"},
+        ) as r:
+            r.raise_for_status()
+            return (await r.json())["token"]
+
+
+async def benchmark(args, base_url: str):
+    await wait_for(f"{base_url}/health")
+    headers = {"Authorization": f"Bearer {await get_token(base_url)}"}
+
+    print(
+        f"{args.streams} concurrent streams of {args.tokens} tokens, "
+        f"{args.delay * 1000:g}ms between tokens"
+    )
+    print(
+        f"{'endpoint':<24} {'tokens':>8} {'seconds':>8} {'tokens/s':>10} "
+        f"{'ttft p50 ms':>12} {'ttft p99 ms':>12}"
+    )
+    for path in ["/api/chat/completions", "/ollama/api/chat"]:
+        for _ in range(args.repeat):
+            result = await run_streams(f"{base_url}{path}", headers, args.streams)
+            print(
+                f"{path:<24} {result['tokens']:>8} {result['seconds']:>8.2f} "
+                f"{result['tokens_per_second']:>10.0f} "
+                f"{result['ttft_p50'] * 1000:>12.1f} "
+                f"{result['ttft_p99'] * 1000:>12.1f}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--streams", type=int, default=500)
+    parser.add_argument("--tokens", type=int, default=200)
+    parser.add_argument("--delay", type=float, default=0.005)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--serve-ollama", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve_ollama:
+        serve_ollama(args.serve_ollama, args.tokens, args.delay)
+        return
+
+    data_dir = tempfile.mkdtemp(prefix="open-webui-bench-")
+    ollama_port, app_port = get_free_port(), get_free_port()
+    env = {
+        **os.environ,
+        "DATA_DIR": data_dir,
+        "OLLAMA_BASE_URL": f"http://127.0.0.1:{ollama_port}",
+        "ENABLE_OPENAI_API": "False",
+        # Lets every stream hold its own upstream connection
+        "AIOHTTP_CLIENT_LIMIT_PER_HOST": str(args.streams + 1),
+        "GLOBAL_LOG_LEVEL": "WARNING",
+    }
+    processes = [
+        subprocess.Popen(
+            [
+                sys.executable,
+                os.path.abspath(__file__),
+                "--serve-ollama",
+                str(ollama_port),
+                "--tokens",
+                str(args.tokens),
+                "--delay",
+                str(args.delay),
+            ]
+        ),
+        subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "uvicorn",
+                "open_webui.main:app",
+                "--host",
+                "127.0.0.1",
+                "--port",
+                str(app_port),
+                "--log-level",
+                "warning",
+                "--no-access-log",
+                "--backlog",
+                "4096",
+            ],
+            cwd=BACKEND_DIR,
+            env=env,
+        ),
+    ]
+    try:
+        asyncio.run(benchmark(args, f"http://127.0.0.1:{app_port}"))
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
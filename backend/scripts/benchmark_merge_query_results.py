@@ -0,0 +1,94 @@
+"""
+Compares the time merge_and_sort_query_results takes to merge the results of
+several collections with the full sort it replaced, and counts the top k
+slots the full sort gives to chunks found in more than one collection.
+
+    python scripts/benchmark_merge_query_results.py --repeat 50
+
+Run from the backend directory with the backend's dependencies installed.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (collections, results per collection, k)
+CASES = [(5, 10, 5), (20, 50, 10), (50, 200, 50), (100, 1000, 100)]
+
+
+def merge_by_sorting(query_results: list[dict], k: int, reverse: bool = False):
+    # The merge before the partial selection: sort everything, keep k
+    combined = [
+        entry
+        for data in query_results
+        for entry in zip(
+            data["distances"][0], data["documents"][0], data["metadatas"][0]
+        )
+    ]
+    combined.sort(key=lambda x: x[0], reverse=reverse)
+    distances, documents, metadatas = zip(*combined[:k]) if combined else ([], [], [])
+    return {
+        "distances": [list(distances)],
+        "documents": [list(documents)],
+        "metadatas": [list(metadatas)],
+    }
+
+
+def get_query_results(collections: int, results: int) -> list[dict]:
+    # Every chunk is found in two collections at the same distance, as
+    # chunks of a file in a knowledge base and in the file's own collection
+    rng = random.Random(0)
+    chunks = [(f"chunk {i}", rng.random()) for i in range(collections * results // 2)]
+    entries = chunks * 2
+    rng.shuffle(entries)
+
+    query_results = []
+    for c in range(collections):
+        batch = sorted(entries[c * results : (c + 1) * results], key=lambda x: x[1])
+        query_results.append(
+            {
+                "distances": [[distance for _, distance in batch]],
+                "documents": [[document for document, _ in batch]],
+                "metadatas": [[{"collection": c} for _ in batch]],
+            }
+        )
+    return query_results
+
+
+def measure(merge, query_results: list[dict], k: int, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        merge(query_results, k)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    sys.path.insert(0, BACKEND_DIR)
+    from open_webui.apps.retrieval.utils import merge_and_sort_query_results
+
+    print(f"{'collections x results, k':<26} {'sort':>10} {'select':>10} {'dup':>5}")
+    for collections, results, k in CASES:
+        query_results = get_query_results(collections, results)
+        documents = merge_by_sorting(query_results, k)["documents"][0]
+
+        sort_time = measure(merge_by_sorting, query_results, k, args.repeat)
+        select_time = measure(
+            merge_and_sort_query_results, query_results, k, args.repeat
+        )
+        print(
+            f"{f'{collections} x {results}, k={k}':<26} "
+            f"{sort_time * 1000:>7.2f} ms {select_time * 1000:>7.2f} ms "
+            f"{len(documents) - len(set(documents)):>5}"
+        )
+
+
+if __name__ == "__main__":
+    main()
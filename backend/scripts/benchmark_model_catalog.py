@@ -0,0 +1,169 @@
+"""
+Measures the time to build the model catalog (get_all_models) against the
+number of models, and the time of its custom model merge compared with the
+scan over all models per custom model it replaced.
+
+    python scripts/benchmark_model_catalog.py --models 250 1000 2000 4000
+
+Upstream model lists and the custom models are generated, so no servers or
+database rows are needed: a quarter of the models get a preset and an
+eighth a custom model overriding them. Run from the backend directory with
+the backend's dependencies installed. DATA_DIR is pointed at a temporary
+directory, so nothing is written to the regular data directory.
+"""
+
+import argparse
+import asyncio
+import copy
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def merge_by_scanning(models: list[dict], custom_models: list):
+    # The merge before the model index: every custom model scans all models
+    for custom_model in custom_models:
+        if custom_model.base_model_id is None:
+            for model in models:
+                if (
+                    custom_model.id == model["id"]
+                    or custom_model.id == model["id"].split(":")[0]
+                ):
+                    model["name"] = custom_model.name
+                    model["info"] = custom_model.model_dump()
+                    model["action_ids"] = list(
+                        model["info"]["meta"].get("actionIds", [])
+                    )
+        else:
+            owned_by = "openai"
+            pipe = None
+            for model in models:
+                if (
+                    custom_model.base_model_id == model["id"]
+                    or custom_model.base_model_id == model["id"].split(":")[0]
+                ):
+                    owned_by = model["owned_by"]
+                    pipe = model.get("pipe")
+                    break
+
+            models.append(
+                {
+                    "id": custom_model.id,
+                    "name": custom_model.name,
+                    "object": "model",
+                    "created": custom_model.created_at,
+                    "owned_by": owned_by,
+                    "info": custom_model.model_dump(),
+                    "preset": True,
+                    **({"pipe": pipe} if pipe is not None else {}),
+                    "action_ids": [],
+                }
+            )
+
+
+def get_models(count: int):
+    from open_webui.apps.webui.models.models import ModelMeta, ModelModel, ModelParams
+
+    # Half Ollama models with tags, half OpenAI models
+    ollama = [
+        {"model": f"model-{i}:latest", "name": f"model-{i}:latest"}
+        for i in range(count // 2)
+    ]
+    openai = [
+        {"id": f"gpt-{i}", "name": f"gpt-{i}", "object": "model", "owned_by": "openai"}
+        for i in range(count - count // 2)
+    ]
+    ids = [f"model-{i}" for i in range(count // 2)] + [
+        f"gpt-{i}" for i in range(count - count // 2)
+    ]
+
+    def custom_model(id, base_model_id=None):
+        return ModelModel(
+            id=id,
+            user_id="benchmark",
+            base_model_id=base_model_id,
+            name=id,
+            params=ModelParams(),
+            meta=ModelMeta(),
+            updated_at=0,
+            created_at=0,
+        )
+
+    custom_models = [custom_model(f"preset-{id}", id) for id in ids[::4]]
+    custom_models += [custom_model(id) for id in ids[::8]]
+    return ollama, openai, custom_models
+
+
+def median_ms(run, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--models", type=int, nargs="+", default=[250, 1000, 2000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix="open-webui-benchmark-")
+    os.environ["DATA_DIR"] = data_dir
+    sys.path.insert(0, BACKEND_DIR)
+    from open_webui import main as webui
+
+    webui.app.state.config.ENABLE_OLLAMA_API = True
+    webui.app.state.config.ENABLE_OPENAI_API = True
+
+    print(f"{'models':>8} {'scan merge':>11} {'merge':>9} {'catalog':>9}")
+    try:
+        for count in args.models:
+            ollama, openai, custom_models = get_models(count)
+
+            async def get_ollama_models():
+                return {"models": copy.deepcopy(ollama)}
+
+            async def get_openai_models():
+                return {"data": copy.deepcopy(openai)}
+
+            async def get_open_webui_models():
+                return []
+
+            webui.get_ollama_models = get_ollama_models
+            webui.get_openai_models = get_openai_models
+            webui.get_open_webui_models = get_open_webui_models
+            webui.Models.get_all_models = lambda: custom_models
+
+            models = [
+                {"id": model["model"], "owned_by": "ollama"} for model in ollama
+            ] + openai
+
+            scan_time = median_ms(
+                lambda: merge_by_scanning(copy.deepcopy(models), custom_models),
+                args.repeat,
+            ) - median_ms(lambda: copy.deepcopy(models), args.repeat)
+            merge_time = median_ms(
+                lambda: webui.merge_custom_models(copy.deepcopy(models), custom_models),
+                args.repeat,
+            ) - median_ms(lambda: copy.deepcopy(models), args.repeat)
+            build_time = median_ms(
+                lambda: asyncio.run(webui.build_all_models()), args.repeat
+            )
+
+            print(
+                f"{count:>8} {scan_time:>9.1f}ms {merge_time:>7.1f}ms "
+                f"{build_time:>7.1f}ms"
+            )
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Compares the insert throughput, query latency, recall and disk usage of the
+vector database clients on synthetic embeddings.
+
+    python scripts/benchmark_vector_db.py --chunks 100000 --stores chroma local local-ivf
+
+Run from the backend directory with the backend's dependencies installed.
+DATA_DIR is pointed at a temporary directory, so nothing is written to the
+regular data directory.
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def get_client(store: str, data_dir: str, chunks: int, quantization: str):
+    # Returns the client and the directory it stores its data in
+    if store == "chroma":
+        from open_webui.apps.retrieval.vector.dbs.chroma import ChromaClient
+        from open_webui.config import CHROMA_DATA_PATH
+
+        return ChromaClient(), CHROMA_DATA_PATH
+
+    from open_webui.apps.retrieval.vector.dbs.local import LocalClient
+
+    client = LocalClient()
+    client.path = os.path.join(data_dir, "local", store)
+    client.quantization = quantization
+    # Index the collection once all chunks are in
+    client.ivf_threshold = chunks if store == "local-ivf" else 0
+    return client, client.path
+
+
+def get_size(path: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(directory, name))
+        for directory, _, names in os.walk(path)
+        for name in names
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=10000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument(
+        "--stores",
+        nargs="+",
+        choices=["chroma", "local", "local-ivf"],
+        default=["chroma", "local", "local-ivf"],
+    )
+    parser.add_argument("--quantization", choices=["", "float16", "int8"], default="")
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix="open-webui-benchmark-")
+    os.environ["DATA_DIR"] = data_dir
+    sys.path.insert(0, BACKEND_DIR)
+
+    # Clustered vectors, as chunks of similar documents are
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(1000, args.dim)).astype(np.float32)
+
+    def get_vectors(count: int, *seed: int) -> np.ndarray:
+        rng = np.random.default_rng(seed)
+        vectors = centers[rng.integers(0, len(centers), count)]
+        return vectors + rng.normal(scale=0.6, size=vectors.shape).astype(np.float32)
+
+    queries = get_vectors(args.queries, 1)
+    batches = range(0, args.chunks, args.batch_size)
+
+    # Exact top k, to measure recall against
+    vectors = np.concatenate(
+        [get_vectors(min(args.batch_size, args.chunks - s), 0, s) for s in batches]
+    )
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    expected = [
+        set(np.argsort(-(vectors @ (query / np.linalg.norm(query))))[: args.k])
+        for query in queries
+    ]
+    del vectors
+
+    try:
+        for store in args.stores:
+            client, path = get_client(store, data_dir, args.chunks, args.quantization)
+
+            start = time.perf_counter()
+            for s in batches:
+                batch = get_vectors(min(args.batch_size, args.chunks - s), 0, s)
+                client.insert(
+                    "benchmark",
+                    [
+                        {
+                            "id": str(s + i),
+                            "text": f"chunk {s + i}",
+                            "vector": vector,
+                            "metadata": {"file_id": f"file-{(s + i) % 100}"},
+                        }
+                        for i, vector in enumerate(batch)
+                    ],
+                )
+            insert_time = time.perf_counter() - start
+
+            # The first search loads the collection
+            client.search("benchmark", [queries[0].tolist()], args.k)
+            start = time.perf_counter()
+            results = [
+                client.search("benchmark", [query.tolist()], args.k).ids[0]
+                for query in queries
+            ]
+            query_time = (time.perf_counter() - start) / len(queries)
+
+            recall = np.mean(
+                [
+                    len({int(id) for id in ids} & found) / args.k
+                    for ids, found in zip(results, expected)
+                ]
+            )
+            size = get_size(path)
+            print(
+                f"{store:<10} {args.chunks:>8} chunks  "
+                f"insert {args.chunks / insert_time:>8.0f}/s  "
+                f"query {query_time * 1000:>7.1f} ms  "
+                f"recall@{args.k} {recall:.2f}  "
+                f"disk {size / 2**20:>6.0f} MB"
+            )
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
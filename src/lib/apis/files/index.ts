@@ -1,3 +1,4 @@
+import type { Socket } from 'socket.io-client';
 import { WEBUI_API_BASE_URL } from '$lib/constants';
 
 export const uploadFile = async (token: string, file: File) => {
@@ -118,6 +119,80 @@ export const getFileById = async (token: string, id: string) => {
 	return res;
 };
 
+export const getFileJobById = async (token: string, id: string) => {
+	let error = null;
+
+	const res = await fetch(`${WEBUI_API_BASE_URL}/files/${id}/job`, {
+		method: 'GET',
+		headers: {
+			Accept: 'application/json',
+			'Content-Type': 'application/json',
+			authorization: `Bearer ${token}`
+		}
+	})
+		.then(async (res) => {
+			if (!res.ok) throw await res.json();
+			return res.json();
+		})
+		.then((json) => {
+			return json;
+		})
+		.catch((err) => {
+			error = err.detail;
+			console.log(err);
+			return null;
+		});
+
+	if (error) {
+		throw error;
+	}
+
+	return res;
+};
+
+// Resolves with the file's processing job once it has completed or failed.
+// Jobs report their status as file-events on the socket; the job is also
+// polled, in case an event is missed or the socket is not connected.
+export const waitForFileJob = async (
+	token: string,
+	id: string,
+	socket: Socket | null = null,
+	pollInterval: number = 5000
+) => {
+	return new Promise((resolve, reject) => {
+		let interval = null;
+
+		const finish = (job) => {
+			clearInterval(interval);
+			socket?.off('file-events', eventHandler);
+			resolve(job);
+		};
+
+		const eventHandler = (event) => {
+			if (event.file_id === id && ['completed', 'failed'].includes(event.status)) {
+				finish(event);
+			}
+		};
+
+		const poll = async () => {
+			try {
+				const job = await getFileJobById(token, id);
+				if (!job || ['completed', 'failed'].includes(job.status)) {
+					finish(job);
+				}
+			} catch (e) {
+				clearInterval(interval);
+				socket?.off('file-events', eventHandler);
+				reject(e);
+			}
+		};
+
+		socket?.on('file-events', eventHandler);
+		interval = setInterval(poll, pollInterval);
+		poll();
+	});
+};
+
 export const updateFileDataContentById = async (token: string, id: string, content: string) => {
 	let error = null;
 